@@ -6,6 +6,9 @@ from .models import (
     EcoViolation, ConstructionMission, ConstructionSite, LightROI,
     LightPole, Bus, ResponsibleOrg, CallRequest, CallRequestTimeline,
     Notification, ReportEntry, UtilityNode, DeviceHealth, IoTDevice,
+    SensorReading, SensorRollup, PendingSensorReading, CameraFrameCache,
+    CameraAnalysisJob, SchedulerLease, ScheduledTaskRun, ChangeLogEntry,
+    WasteBinFillObservation, DashboardCounters,
     WasteTask, RouteOptimization, AlertNotification, ClimateSchedule,
     EnergyReport, WastePrediction, MaintenanceSchedule, DriverPerformance
 )
@@ -240,6 +243,21 @@ class UtilityNodeAdmin(admin.ModelAdmin):
     search_fields = ['name', 'mfy', 'id']
 
 
+@admin.register(CameraFrameCache)
+class CameraFrameCacheAdmin(admin.ModelAdmin):
+    list_display = ['waste_bin', 'frame_hash', 'analyzed_at', 'checked_at', 'hits', 'misses']
+    search_fields = ['waste_bin__address', 'frame_hash']
+    readonly_fields = ['analyzed_at', 'checked_at', 'hits', 'misses']
+
+
+@admin.register(CameraAnalysisJob)
+class CameraAnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'waste_bin', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['id', 'waste_bin__address', 'image_url']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+
 @admin.register(IoTDevice)
 class IoTDeviceAdmin(admin.ModelAdmin):
     list_display = ['id', 'device_id', 'device_type', 'is_active', 'last_seen', 'room', 'boiler', 'current_temperature', 'current_humidity']
@@ -247,6 +265,29 @@ class IoTDeviceAdmin(admin.ModelAdmin):
     search_fields = ['device_id', 'id']
 
 
+@admin.register(SensorReading)
+class SensorReadingAdmin(admin.ModelAdmin):
+    list_display = ['id', 'device', 'timestamp', 'temperature', 'humidity']
+    list_filter = ['timestamp']
+    search_fields = ['device__device_id']
+    raw_id_fields = ['device']
+
+
+@admin.register(SensorRollup)
+class SensorRollupAdmin(admin.ModelAdmin):
+    list_display = ['id', 'device', 'resolution', 'bucket_start', 'sample_count', 'temperature_min', 'temperature_max', 'humidity_min', 'humidity_max']
+    list_filter = ['resolution', 'bucket_start']
+    search_fields = ['device__device_id']
+    raw_id_fields = ['device']
+
+
+@admin.register(PendingSensorReading)
+class PendingSensorReadingAdmin(admin.ModelAdmin):
+    list_display = ['id', 'device_id', 'timestamp', 'temperature', 'humidity', 'received_at']
+    search_fields = ['device_id']
+    readonly_fields = ['received_at']
+
+
 # ==================== NEW ADMIN INTERFACES ====================
 
 @admin.register(WasteTask)
@@ -307,4 +348,40 @@ class MaintenanceScheduleAdmin(admin.ModelAdmin):
 class DriverPerformanceAdmin(admin.ModelAdmin):
     list_display = ['id', 'truck', 'date', 'bins_collected', 'total_distance', 'rating']
     list_filter = ['date', 'truck']
-    search_fields = ['truck__driver_name']
\ No newline at end of file
+    search_fields = ['truck__driver_name']
+
+
+@admin.register(SchedulerLease)
+class SchedulerLeaseAdmin(admin.ModelAdmin):
+    list_display = ['name', 'owner', 'expires_at']
+    search_fields = ['name', 'owner']
+
+
+@admin.register(ScheduledTaskRun)
+class ScheduledTaskRunAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'status', 'owner', 'started_at', 'duration_seconds']
+    list_filter = ['task', 'status', 'started_at']
+    search_fields = ['task', 'owner']
+    readonly_fields = ['started_at', 'finished_at', 'duration_seconds']
+
+
+@admin.register(ChangeLogEntry)
+class ChangeLogEntryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'entity', 'object_id', 'action', 'changed_at']
+    list_filter = ['entity', 'action']
+    search_fields = ['object_id']
+    readonly_fields = ['changed_at']
+
+
+@admin.register(WasteBinFillObservation)
+class WasteBinFillObservationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'waste_bin', 'fill_level', 'source', 'observed_at']
+    list_filter = ['source']
+    search_fields = ['waste_bin__id', 'waste_bin__address']
+    raw_id_fields = ['waste_bin']
+
+
+@admin.register(DashboardCounters)
+class DashboardCountersAdmin(admin.ModelAdmin):
+    list_display = ['scope', 'total_bins', 'full_bins', 'total_trucks', 'busy_trucks', 'computed_at']
+    readonly_fields = ['computed_at']
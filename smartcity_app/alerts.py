@@ -0,0 +1,114 @@
+"""
+Delivery of AlertNotification messages over their channel
+
+  APP       - in-app only; the stored alert is the delivery
+  TELEGRAM  - Bot API sendMessage to the recipient chat id (TELEGRAM_BOT_TOKEN)
+  SMS, PUSH - JSON POST to the gateway at ALERT_SMS_WEBHOOK_URL / ALERT_PUSH_WEBHOOK_URL
+  EMAIL     - JSON POST to ALERT_EMAIL_WEBHOOK_URL if set, otherwise Django's send_mail
+
+send_alert() is a coroutine using the pooled client from async_http.py; the
+async /api/alerts/send/ view awaits it directly. Alerts created through the
+sync /api/alerts/ view are only stored; the scheduler's send_alerts task
+delivers unsent alerts with send_pending_alerts(), all of a batch
+concurrently, and retries them until they are ALERT_RETRY_WINDOW old.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from . import async_http
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_URL = 'https://api.telegram.org/bot{token}/sendMessage'
+TIMEOUT = httpx.Timeout(getattr(settings, 'ALERT_SEND_TIMEOUT', 10), connect=5)
+RETRY_WINDOW = timedelta(seconds=getattr(settings, 'ALERT_RETRY_WINDOW', 60 * 60))
+
+
+class AlertDeliveryError(Exception):
+    """The alert could not be handed to its channel"""
+
+
+def _text(alert):
+    return f"[{alert.severity}] {alert.title}\n{alert.message}"
+
+
+async def _post(client, url, payload):
+    try:
+        response = await client.post(url, json=payload, timeout=TIMEOUT)
+    except httpx.HTTPError as e:
+        raise AlertDeliveryError(f'{url} request failed: {e}') from e
+    if response.status_code >= 300:
+        raise AlertDeliveryError(f'{url} returned {response.status_code}: {response.text[:200]}')
+
+
+async def deliver(alert, client=None):
+    """Send one alert over its channel; raises AlertDeliveryError"""
+    client = client or async_http.get_client()
+    channel = alert.channel
+
+    if channel == 'APP':
+        return
+    if channel == 'TELEGRAM':
+        token = getattr(settings, 'TELEGRAM_BOT_TOKEN', None)
+        if not token:
+            raise AlertDeliveryError('TELEGRAM_BOT_TOKEN is not set')
+        await _post(client, TELEGRAM_URL.format(token=token), {'chat_id': alert.recipient, 'text': _text(alert)})
+        return
+
+    webhook = getattr(settings, f'ALERT_{channel}_WEBHOOK_URL', None)
+    if webhook:
+        await _post(client, webhook, {
+            'id': str(alert.id),
+            'channel': channel,
+            'recipient': alert.recipient,
+            'severity': alert.severity,
+            'title': alert.title,
+            'message': alert.message,
+        })
+    elif channel == 'EMAIL':
+        await sync_to_async(send_mail, thread_sensitive=False)(
+            alert.title, alert.message, None, [alert.recipient]
+        )
+    else:
+        raise AlertDeliveryError(f'No gateway configured for {channel} (ALERT_{channel}_WEBHOOK_URL)')
+
+
+async def send_alert(alert, client=None):
+    """Deliver a saved alert and record the outcome; returns True if it was sent"""
+    try:
+        await deliver(alert, client)
+    except Exception as e:
+        logger.warning(f"⚠️ Alert {alert.id} ({alert.channel} -> {alert.recipient}) not sent: {e}")
+        return False
+
+    alert.is_sent = True
+    alert.sent_at = timezone.now()
+    await sync_to_async(alert.save)(update_fields=['is_sent', 'sent_at'])
+    return True
+
+
+async def _send_all(alerts):
+    # async_to_sync runs every call on a fresh event loop, so the client can't be pooled
+    async with async_http.new_client() as client:
+        return await asyncio.gather(*(send_alert(alert, client) for alert in alerts))
+
+
+def send_pending_alerts(limit=100):
+    """Deliver up to `limit` unsent alerts younger than RETRY_WINDOW, oldest first; returns (sent, failed)"""
+    from .models import AlertNotification
+
+    alerts = list(
+        AlertNotification.objects.filter(is_sent=False, created_at__gte=timezone.now() - RETRY_WINDOW)
+        .order_by('created_at')[:limit]
+    )
+    if not alerts:
+        return 0, 0
+    sent = sum(async_to_sync(_send_all)(alerts))
+    return sent, len(alerts) - sent
@@ -1,7 +1,4 @@
 from django.apps import AppConfig
-import threading
-import time
-from django.core.management import call_command
 
 
 class SmartcityAppConfig(AppConfig):
@@ -12,30 +9,5 @@ class SmartcityAppConfig(AppConfig):
         # Import signals to register them
         import smartcity_app.signals  # noqa
         
-        # Start the background task to analyze waste bins every 30 minutes
-        from django.conf import settings
-        if settings.DEBUG:  # Only run in development
-            thread = threading.Thread(target=self.run_periodic_analysis, daemon=True)
-            thread.start()
-
-    def run_periodic_analysis(self):
-        """Run waste bin analysis every 30 minutes"""
-        import time
-        from django.utils import timezone
-        
-        print("Starting automated waste bin analysis service...")
-        
-        while True:
-            try:
-                # Wait for 30 minutes (30 * 60 seconds)
-                time.sleep(30 * 60)
-                
-                # Run the analysis command
-                print(f"[{timezone.now()}] Running automated waste bin analysis...")
-                call_command('analyze_waste_bins')
-                print(f"[{timezone.now()}] Waste bin analysis completed.")
-                
-            except Exception as e:
-                print(f"Error in periodic analysis: {e}")
-                # Wait for a shorter time before retrying
-                time.sleep(5 * 60)  # Wait 5 minutes before retrying
\ No newline at end of file
+        # Periodic work (waste bin analysis every 30 minutes, predictions, reports)
+        # runs in the single-leader `manage.py run_scheduler` process, not in here
@@ -0,0 +1,259 @@
+"""
+Batch assignment of waste bins to idle trucks
+
+assign_bins() takes every full bin without an open task (or the given bins),
+matches them to idle trucks of the same toza hudud so that the total
+truck->bin distance is minimal, and writes all tasks and truck status
+changes in one transaction.
+
+Matching is per toza hudud. Each truck takes up to `capacity` bins (its
+column is repeated `capacity` times in the cost matrix). When a hudud has
+more bins than truck slots, the fullest bins are matched first and the rest
+are reported as unassigned.
+
+Solvers:
+  hungarian - optimal (minimum total distance), O(n^2 m); used up to
+              ASSIGNMENT_HUNGARIAN_MAX_BINS bins per hudud by 'auto'
+  greedy    - repeatedly takes the closest remaining bin/truck pair; bounded
+              time for large batches, but 10-40% longer in total when
+              trucks are scarce (it strands late bins far away)
+
+Concurrency: lock_trucks() is called before the trucks and bins are read,
+so concurrent batches, auto_assign_task and route planning wait for each
+other instead of handing one truck two bins. SQLite has no row locks
+(select_for_update is a no-op there), so it takes the database write lock;
+other databases lock the idle truck rows (SELECT ... FOR UPDATE). As a
+last check the trucks are only set BUSY while still IDLE, and the batch is
+rolled back with AssignmentConflict if one of them was taken anyway.
+"""
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import sync
+from .models import Truck, WasteBin, WasteTask
+
+EARTH_RADIUS_KM = 6371
+METHODS = ('auto', 'hungarian', 'greedy')
+OPEN_TASK_STATUSES = ('PENDING', 'ASSIGNED', 'IN_PROGRESS')
+
+class AssignmentConflict(Exception):
+    """A truck of the batch was claimed by a concurrent assignment; nothing was written"""
+
+
+DEFAULT_CAPACITY = getattr(settings, 'ASSIGNMENT_TRUCK_CAPACITY', 1)
+HUNGARIAN_MAX_BINS = getattr(settings, 'ASSIGNMENT_HUNGARIAN_MAX_BINS', 500)
+
+
+def distance_matrix(from_lat, from_lng, to_lat, to_lng):
+    """Haversine distances (km) between every `from` point (rows) and every `to` point (columns)"""
+    lat1 = np.radians(np.asarray(from_lat, dtype=float))[:, None]
+    lng1 = np.radians(np.asarray(from_lng, dtype=float))[:, None]
+    lat2 = np.radians(np.asarray(to_lat, dtype=float))[None, :]
+    lng2 = np.radians(np.asarray(to_lng, dtype=float))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def solve_hungarian(cost):
+    """
+    Minimum-cost assignment of every row to a distinct column (rows <= columns)
+
+    Shortest augmenting path form of the Hungarian algorithm with potentials;
+    the inner scan over columns is vectorized. Returns the column of each row.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=int)  # owner[j]: 1-based row matched to column j, 0 if free
+    way = np.zeros(m + 1, dtype=int)
+    for row in range(1, n + 1):
+        owner[0] = row
+        col = 0
+        min_reduced = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[col] = True
+            current = owner[col]
+            free = ~used
+            free[0] = False
+            reduced = cost[current - 1] - u[current] - v[1:]
+            better = free[1:] & (reduced < min_reduced[1:])
+            min_reduced[1:][better] = reduced[better]
+            way[1:][better] = col
+            candidates = np.where(free, min_reduced, np.inf)
+            next_col = int(np.argmin(candidates))
+            delta = candidates[next_col]
+            u[owner[used]] += delta
+            v[used] -= delta
+            min_reduced[free] -= delta
+            col = next_col
+            if owner[col] == 0:
+                break
+        # Flip the augmenting path
+        while col:
+            previous = way[col]
+            owner[col] = owner[previous]
+            col = previous
+
+    columns = np.empty(n, dtype=int)
+    for col in range(1, m + 1):
+        if owner[col]:
+            columns[owner[col] - 1] = col - 1
+    return columns
+
+
+def solve_greedy(cost):
+    """Closest remaining row/column pair first (rows <= columns); returns the column of each row"""
+    n, m = cost.shape
+    columns = np.full(n, -1, dtype=int)
+    row_done = np.zeros(n, dtype=bool)
+    col_done = np.zeros(m, dtype=bool)
+    remaining = n
+    for flat in np.argsort(cost, axis=None, kind='stable'):
+        row, col = divmod(int(flat), m)
+        if row_done[row] or col_done[col]:
+            continue
+        columns[row] = col
+        row_done[row] = col_done[col] = True
+        remaining -= 1
+        if not remaining:
+            break
+    return columns
+
+
+def match(bins, trucks, capacity=DEFAULT_CAPACITY, method='auto'):
+    """
+    Match bins to trucks (lists of dicts with 'lat'/'lng'; bins also 'fill_level')
+
+    Returns ([(bin, truck, distance_km)], unassigned_bins, solver_name).
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    slots = [truck for truck in trucks for _ in range(capacity)]
+    if not bins or not slots:
+        return [], list(bins), None
+
+    bins = sorted(bins, key=lambda b: -b['fill_level'])
+    matched_bins, unassigned = bins[:len(slots)], bins[len(slots):]
+    cost = distance_matrix(
+        [b['lat'] for b in matched_bins], [b['lng'] for b in matched_bins],
+        [t['lat'] for t in slots], [t['lng'] for t in slots],
+    )
+    if method == 'auto':
+        method = 'hungarian' if len(matched_bins) <= HUNGARIAN_MAX_BINS else 'greedy'
+    columns = solve_hungarian(cost) if method == 'hungarian' else solve_greedy(cost)
+
+    pairs = [(b, slots[col], float(cost[row, col])) for row, (b, col) in enumerate(zip(matched_bins, columns))]
+    return pairs, unassigned, method
+
+
+def _open_bins(bin_ids, organization_id):
+    bins = WasteBin.objects.exclude(tasks__status__in=OPEN_TASK_STATUSES)
+    bins = bins.filter(pk__in=bin_ids) if bin_ids else bins.filter(is_full=True)
+    if organization_id:
+        bins = bins.filter(organization_id=organization_id)
+    return [
+        {'id': str(row['id']), 'toza_hudud': row['toza_hudud'], 'fill_level': row['fill_level'],
+         'lat': row['location__lat'], 'lng': row['location__lng']}
+        for row in bins.values('id', 'toza_hudud', 'fill_level', 'location__lat', 'location__lng').distinct()
+    ]
+
+
+def lock_trucks(trucks):
+    """
+    Serialize truck assignment until the end of the transaction; returns `trucks` to read
+
+    SQLite takes the database write lock before anything is read (any UPDATE
+    does, even one matching no rows), so a concurrent assignment waits on the
+    busy timeout instead of failing with "database is locked" on its first
+    write or working from a stale snapshot.
+    """
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {connection.ops.quote_name(Truck._meta.db_table)} SET id = id WHERE 0')
+        return trucks
+    return trucks.select_for_update(of=('self',))
+
+
+def assign_bins(bin_ids=None, organization_id=None, capacity=DEFAULT_CAPACITY, method='auto', dry_run=False):
+    """
+    Assign full bins (or `bin_ids`) to idle trucks in one transaction
+
+    Returns a report: the assignments, unassigned bin ids, total distance
+    and solver time. With dry_run nothing is written (and nothing locked).
+    Raises AssignmentConflict if a truck was claimed concurrently.
+    """
+    if capacity < 1:
+        raise ValueError('capacity must be at least 1')
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    with transaction.atomic():
+        trucks = Truck.objects.filter(status='IDLE').order_by('pk')
+        if not dry_run:
+            trucks = lock_trucks(trucks)
+        if organization_id:
+            trucks = trucks.filter(organization_id=organization_id)
+        trucks = [
+            {'id': str(row['id']), 'toza_hudud': row['toza_hudud'], 'lat': row['location__lat'], 'lng': row['location__lng']}
+            for row in trucks.values('id', 'toza_hudud', 'location__lat', 'location__lng')
+        ]
+        bins = _open_bins(bin_ids, organization_id)
+
+        trucks_by_hudud, bins_by_hudud = {}, {}
+        for truck in trucks:
+            trucks_by_hudud.setdefault(truck['toza_hudud'], []).append(truck)
+        for b in bins:
+            bins_by_hudud.setdefault(b['toza_hudud'], []).append(b)
+
+        started = time.perf_counter()
+        pairs, unassigned, solvers = [], [], set()
+        for hudud, hudud_bins in bins_by_hudud.items():
+            hudud_pairs, hudud_unassigned, solver = match(hudud_bins, trucks_by_hudud.get(hudud, []), capacity, method)
+            pairs += hudud_pairs
+            unassigned += hudud_unassigned
+            if solver:
+                solvers.add(solver)
+        solver_ms = (time.perf_counter() - started) * 1000
+
+        tasks = []
+        if pairs and not dry_run:
+            now = timezone.now()
+            tasks = WasteTask.objects.bulk_create([
+                WasteTask(
+                    waste_bin_id=b['id'],
+                    assigned_truck_id=truck['id'],
+                    status='ASSIGNED',
+                    assigned_at=now,
+                    priority='HIGH' if b['fill_level'] > 90 else 'MEDIUM',
+                )
+                for b, truck, _ in pairs
+            ])
+            busy = sorted({truck['id'] for _, truck, _ in pairs})
+            if Truck.objects.filter(pk__in=busy, status='IDLE').update(status='BUSY', updated_at=now) != len(busy):
+                raise AssignmentConflict('A truck was assigned concurrently, retry the batch')
+            sync.record(Truck, busy)
+
+    total = sum(distance for _, _, distance in pairs)
+    return {
+        'assigned': [
+            {
+                'task_id': str(tasks[i].id) if tasks else None,
+                'bin_id': b['id'],
+                'truck_id': truck['id'],
+                'distance_km': round(distance, 3),
+            }
+            for i, (b, truck, distance) in enumerate(pairs)
+        ],
+        'unassigned_bin_ids': [b['id'] for b in unassigned],
+        'bins_considered': len(bins),
+        'trucks_considered': len(trucks),
+        'total_distance_km': round(total, 3),
+        'mean_distance_km': round(total / len(pairs), 3) if pairs else None,
+        'solver': '+'.join(sorted(solvers)) or None,
+        'solver_ms': round(solver_ms, 2),
+        'dry_run': dry_run,
+    }
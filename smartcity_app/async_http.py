@@ -0,0 +1,52 @@
+"""
+Pooled async HTTP client (httpx) for the async views and alert delivery
+
+Each event loop gets one long-lived httpx.AsyncClient, so connections to
+the camera hosts, the vision API and the alert gateways are reused across
+requests. Under the ASGI server there is a single loop and so a single
+pool of at most ASYNC_HTTP_MAX_CONNECTIONS connections.
+"""
+import asyncio
+import weakref
+
+import httpx
+from django.conf import settings
+
+MAX_CONNECTIONS = getattr(settings, 'ASYNC_HTTP_MAX_CONNECTIONS', 200)
+DEFAULT_TIMEOUT = httpx.Timeout(
+    getattr(settings, 'ASYNC_HTTP_READ_TIMEOUT', 15),
+    connect=getattr(settings, 'ASYNC_HTTP_CONNECT_TIMEOUT', 5),
+)
+
+_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncClient
+
+
+def new_client():
+    return httpx.AsyncClient(
+        timeout=DEFAULT_TIMEOUT,
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS // 2),
+        follow_redirects=True,
+    )
+
+
+def get_client():
+    """The pooled client of the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = new_client()
+    return client
+
+
+async def fetch_bytes(url, max_bytes, timeout=None, client=None):
+    """GET `url` and return the body; raises RuntimeError on a non-200 or oversized response"""
+    client = client or get_client()
+    async with client.stream('GET', url, timeout=timeout or DEFAULT_TIMEOUT) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} returned {response.status_code}')
+        content = bytearray()
+        async for chunk in response.aiter_bytes(64 * 1024):
+            content += chunk
+            if len(content) > max_bytes:
+                raise RuntimeError(f'response is larger than {max_bytes} bytes')
+        return bytes(content)
@@ -0,0 +1,163 @@
+"""
+Background camera-image analysis jobs
+
+update_bin_with_camera_image only records the image and enqueues a
+CameraAnalysisJob; the process_camera_jobs command downloads and analyzes
+the images concurrently and writes fill_level/is_full back to the bin.
+
+Workers claim jobs with a conditional UPDATE (PENDING -> RUNNING), so
+several workers can run side by side without processing a job twice. Jobs
+left RUNNING by a crashed worker are claimed again after JOB_STALE_AFTER.
+A failed attempt puts the job back to PENDING with a not_before time that
+doubles with every attempt (CAMERA_JOB_RETRY_BACKOFF, capped at
+RETRY_BACKOFF_MAX), so a broken camera URL isn't hammered in a tight loop.
+"""
+import base64
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import fill_history, sync
+from .models import CameraAnalysisJob, WasteBin
+from .vision import VisionBackendUnavailable, get_backend
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'CAMERA_JOB_MAX_ATTEMPTS', 3)
+JOB_STALE_AFTER = timedelta(seconds=getattr(settings, 'CAMERA_JOB_STALE_AFTER', 300))
+RETRY_BACKOFF = getattr(settings, 'CAMERA_JOB_RETRY_BACKOFF', 30)
+RETRY_BACKOFF_MAX = 3600
+DOWNLOAD_TIMEOUT = (
+    getattr(settings, 'CAMERA_CONNECT_TIMEOUT', 5),
+    getattr(settings, 'CAMERA_READ_TIMEOUT', 15),
+)
+# Camera images bigger than this are rejected instead of being held in memory
+MAX_IMAGE_BYTES = getattr(settings, 'CAMERA_MAX_IMAGE_BYTES', 10 * 1024 * 1024)
+
+_local = threading.local()
+
+
+def enqueue(waste_bin, image_url):
+    """Queue an analysis of `image_url` for a bin"""
+    return CameraAnalysisJob.objects.create(waste_bin=waste_bin, image_url=image_url)
+
+
+def claim_jobs(limit):
+    """Atomically move up to `limit` runnable jobs to RUNNING and return them"""
+    now = timezone.now()
+    runnable = (
+        Q(status='PENDING') & (Q(not_before__isnull=True) | Q(not_before__lte=now))
+        | Q(status='RUNNING', started_at__lt=now - JOB_STALE_AFTER)
+    )
+    candidates = list(
+        CameraAnalysisJob.objects.filter(runnable).order_by('created_at').values_list('id', 'status', 'started_at')[:limit]
+    )
+
+    claimed = []
+    for job_id, job_status, started_at in candidates:
+        # Only one worker wins the update for a given job
+        won = CameraAnalysisJob.objects.filter(id=job_id, status=job_status, started_at=started_at).update(
+            status='RUNNING', started_at=now, attempts=F('attempts') + 1
+        )
+        if won:
+            claimed.append(job_id)
+    return list(CameraAnalysisJob.objects.filter(id__in=claimed).select_related('waste_bin'))
+
+
+def _session():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def _download(url):
+    response = _session().get(url, timeout=DOWNLOAD_TIMEOUT, stream=True)
+    try:
+        if response.status_code != 200:
+            raise RuntimeError(f'image URL returned {response.status_code}')
+        content = bytearray()  # Appending to bytes would copy the whole image for every chunk
+        for chunk in response.iter_content(64 * 1024):
+            content += chunk
+            if len(content) > MAX_IMAGE_BYTES:
+                raise RuntimeError(f'image is larger than {MAX_IMAGE_BYTES} bytes')
+        return content
+    finally:
+        response.close()
+
+
+def store_result(waste_bin_id, ai_result):
+    """Write an AI result to the bin"""
+    WasteBin.objects.filter(pk=waste_bin_id).update(
+        fill_level=ai_result['fillLevel'],
+        is_full=ai_result['isFull'],
+        last_analysis=(
+            f"AI tahlili: {ai_result['notes']}, IsFull: {ai_result['isFull']}, "
+            f"FillLevel: {ai_result['fillLevel']}%, Conf: {ai_result['confidence']}%"
+        )[:200],
+        updated_at=timezone.now(),
+    )
+    fill_history.record_by_id(waste_bin_id, ai_result['fillLevel'], 'CCTV')
+    sync.record(WasteBin, [waste_bin_id])
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt of a job that has failed `attempts` times"""
+    return min(RETRY_BACKOFF * 2 ** max(attempts - 1, 0), RETRY_BACKOFF_MAX)
+
+
+def process_job(job):
+    """Download, analyze and store the result of one claimed job; returns the final status"""
+    try:
+        return _process(job)
+    finally:
+        connection.close()  # Worker threads don't go through Django's request cycle
+
+
+def _process(job):
+    try:
+        content = _download(job.image_url)
+        ai_result = get_backend().analyze(base64.b64encode(content).decode('utf-8'))
+        with transaction.atomic():
+            store_result(job.waste_bin_id, ai_result)
+            CameraAnalysisJob.objects.filter(id=job.id).update(
+                status='DONE', result=ai_result, error='', finished_at=timezone.now(), not_before=None
+            )
+    except Exception as e:
+        now = timezone.now()
+        changes = {'error': str(e)[:1000]}
+        if isinstance(e, VisionBackendUnavailable):
+            # Upstream outages don't count against the job; it is simply retried
+            changes['attempts'] = F('attempts') - 1
+            changes['not_before'] = now + timedelta(seconds=RETRY_BACKOFF)
+            job_status = 'PENDING'
+        elif job.attempts < MAX_ATTEMPTS:
+            changes['not_before'] = now + timedelta(seconds=retry_delay(job.attempts))
+            job_status = 'PENDING'
+        else:
+            changes['finished_at'] = now
+            job_status = 'FAILED'
+        CameraAnalysisJob.objects.filter(id=job.id, status='RUNNING').update(status=job_status, **changes)
+        logger.warning(f"⚠️ Camera job {job.id} failed (attempt {job.attempts}): {e}")
+        return job_status
+
+    return 'DONE'
+
+
+def run_batch(concurrency, batch_size):
+    """Claim and process one batch of jobs; returns {status: count}"""
+    jobs = claim_jobs(batch_size)
+    counts = {}
+    if not jobs:
+        return counts
+    with ThreadPoolExecutor(max(1, concurrency), thread_name_prefix='camera-job') as pool:
+        for job_status in pool.map(process_job, jobs):
+            counts[job_status] = counts.get(job_status, 0) + 1
+    return counts
@@ -0,0 +1,253 @@
+"""
+Concurrent camera-analysis pipeline for waste bins
+
+Used by the analyze_waste_bins and simulate_camera_screenshots commands.
+Each bin goes through two stages with their own thread pools:
+
+  download  - fetch the camera frame (pooled HTTP sessions, connect/read
+              timeouts, at most CAMERA_PER_HOST_LIMIT requests per camera host)
+  analysis  - send the frame to the vision model
+
+Only a bounded number of frames wait between the stages, so a slow model
+throttles the downloads instead of piling images up in memory. The bin
+changes are collected and written with a single bulk_update at the end.
+
+Frames that are perceptually identical to the last analyzed frame of a bin
+reuse its cached result instead of calling the model (see frame_cache.py).
+"""
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from . import fill_history, sync
+from .frame_cache import FrameCache, HASH_THRESHOLD, dhash
+from .models import WasteBin, WasteBinFillObservation
+
+DEFAULT_CONCURRENCY = getattr(settings, 'CAMERA_ANALYSIS_CONCURRENCY', 4)
+PER_HOST_LIMIT = getattr(settings, 'CAMERA_PER_HOST_LIMIT', 2)
+DOWNLOAD_TIMEOUT = (
+    getattr(settings, 'CAMERA_CONNECT_TIMEOUT', 5),
+    getattr(settings, 'CAMERA_READ_TIMEOUT', 15),
+)
+
+# bulk_update skips auto_now, so updated_at is set explicitly
+UPDATE_FIELDS = ['fill_level', 'is_full', 'last_analysis', 'image_source', 'image_url', 'updated_at'] + fill_history.STATE_FIELDS
+
+
+class PipelineStats:
+    """Counters and failures of one pipeline run"""
+
+    def __init__(self):
+        self.total = 0
+        self.skipped = 0
+        self.downloaded = 0
+        self.analyzed = 0
+        self.changed = 0
+        self.cache_hits = 0
+        self.failures = []  # (bin_id, stage, error)
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        """Analyzed bins per second"""
+        return self.analyzed / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (
+            f"{self.analyzed}/{self.total} bins analyzed in {self.elapsed:.1f}s "
+            f"({self.throughput:.2f} bins/s), {self.changed} changed, "
+            f"{self.cache_hits} unchanged frames (model calls saved), "
+            f"{self.skipped} skipped, {len(self.failures)} failed"
+        )
+
+
+def has_real_camera(bin):
+    """Placeholder images are never analyzed"""
+    return bool(bin.camera_url) and 'placeholder' not in bin.camera_url.lower()
+
+
+def apply_analysis(bin, ai_result):
+    """Copy an AI result onto a bin (in memory); returns True if fill state changed"""
+    old_state = (bin.fill_level, bin.is_full)
+    bin.fill_level = ai_result.get('fillLevel', bin.fill_level)
+    bin.is_full = ai_result.get('isFull', bin.is_full)
+    bin.last_analysis = (
+        f"AI tahlili (CCTV): {ai_result.get('notes', 'Tahlil amalga oshirildi')}, IsFull: {ai_result.get('isFull')}, "
+        f"FillLevel: {ai_result.get('fillLevel')}%, Conf: {ai_result.get('confidence')}%"
+    )[:200]
+    bin.image_source = 'CCTV'
+    bin.image_url = bin.camera_url
+    return old_state != (bin.fill_level, bin.is_full)
+
+
+class CameraPipeline:
+    """
+    Download and analyze camera frames for many bins concurrently.
+
+    `analyze` receives a base64 encoded frame and returns the AI result dict;
+    `log` is called from the calling thread only. `hash_threshold=None`
+    disables the frame cache.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, download_concurrency=None,
+                 per_host_limit=PER_HOST_LIMIT, timeout=DOWNLOAD_TIMEOUT, analyze=None, log=print,
+                 hash_threshold=HASH_THRESHOLD):
+        self.concurrency = max(1, concurrency)
+        self.download_concurrency = max(1, download_concurrency or self.concurrency * 2)
+        self.per_host_limit = max(1, per_host_limit)
+        self.timeout = timeout
+        self.analyze = analyze or _default_analyze
+        self.log = log
+        self.hash_threshold = hash_threshold
+        self.frame_cache = None
+
+        self._local = threading.local()
+        self._host_lock = threading.Lock()
+        self._host_slots = {}
+        # Frames downloaded but not analyzed yet
+        self._buffer = threading.BoundedSemaphore(self.concurrency * 2)
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.per_host_limit)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def _download(self, bin):
+        self._buffer.acquire()
+        try:
+            with self._host_slot(bin.camera_url):
+                response = self._session().get(bin.camera_url, timeout=self.timeout)
+            if response.status_code != 200:
+                raise RuntimeError(f'camera URL returned {response.status_code}')
+            return response.content
+        except BaseException:
+            self._buffer.release()
+            raise
+
+    def _analyze(self, bin, content):
+        """Returns (ai_result, from_cache)"""
+        try:
+            frame_hash = None
+            if self.frame_cache is not None:
+                frame_hash = dhash(content)
+                cached = self.frame_cache.lookup(bin, frame_hash)
+                if cached is not None:
+                    return cached, True
+            ai_result = self.analyze(base64.b64encode(content).decode('utf-8'))
+            if self.frame_cache is not None:
+                self.frame_cache.store(bin, frame_hash, ai_result)
+            return ai_result, False
+        finally:
+            self._buffer.release()
+
+    def run(self, bins):
+        """Analyze `bins` and bulk_update the ones that got a result; returns PipelineStats"""
+        stats = PipelineStats()
+        ready = []
+        for bin in bins:
+            stats.total += 1
+            if has_real_camera(bin):
+                ready.append(bin)
+            else:
+                stats.skipped += 1
+                self.log(f"⚠️ Bin {bin.id} ({bin.address}) has no real camera_url - skipping")
+
+        if self.hash_threshold is not None:
+            self.frame_cache = FrameCache(ready, self.hash_threshold)
+
+        analyzed_bins = []
+        unchanged_bins = []
+        with ThreadPoolExecutor(self.download_concurrency, thread_name_prefix='camera-download') as downloads, \
+                ThreadPoolExecutor(self.concurrency, thread_name_prefix='camera-analysis') as analyses:
+            pending = {downloads.submit(self._download, bin): bin for bin in ready}
+            running = {}
+            for future in as_completed(list(pending)):
+                # Drop the future (and the frame it holds) once the frame is handed over
+                bin = pending.pop(future)
+                try:
+                    content = future.result()
+                except Exception as e:
+                    stats.failures.append((bin.id, 'download', str(e)))
+                    self.log(f"❌ Bin {bin.id} ({bin.address}) download failed: {e}")
+                    continue
+                stats.downloaded += 1
+                running[analyses.submit(self._analyze, bin, content)] = bin
+                del content, future
+
+            for future in as_completed(list(running)):
+                bin = running.pop(future)
+                try:
+                    ai_result, from_cache = future.result()
+                except Exception as e:
+                    stats.failures.append((bin.id, 'analysis', str(e)))
+                    self.log(f"❌ Bin {bin.id} ({bin.address}) analysis failed: {e}")
+                    continue
+                stats.analyzed += 1
+                if from_cache:
+                    # The bin already reflects this result; it is still an observation of its fill level
+                    stats.cache_hits += 1
+                    self.log(f"♻️ Bin {bin.id} ({bin.address}) frame unchanged - cached result reused")
+                    unchanged_bins.append(bin)
+                    continue
+                old_fill_level, old_is_full = bin.fill_level, bin.is_full
+                if apply_analysis(bin, ai_result):
+                    stats.changed += 1
+                    self.log(
+                        f"✅ Bin {bin.id} ({bin.address}) analyzed: fill level {old_fill_level}% -> {bin.fill_level}%, "
+                        f"full status: {old_is_full} -> {bin.is_full} (AI confidence: {ai_result.get('confidence')}%)"
+                    )
+                else:
+                    self.log(
+                        f"ℹ️ Bin {bin.id} ({bin.address}) analyzed: no change "
+                        f"(fill level: {bin.fill_level}%, AI confidence: {ai_result.get('confidence')}%)"
+                    )
+                analyzed_bins.append(bin)
+
+        if analyzed_bins or unchanged_bins:
+            now = timezone.now()
+            observations = []
+            for bin in analyzed_bins + unchanged_bins:
+                bin.updated_at = now
+                observations.append(fill_history.observe(bin, bin.fill_level, 'CCTV', now))
+            WasteBin.objects.bulk_update(analyzed_bins, UPDATE_FIELDS, batch_size=200)
+            WasteBin.objects.bulk_update(unchanged_bins, ['updated_at'] + fill_history.STATE_FIELDS, batch_size=200)
+            WasteBinFillObservation.objects.bulk_create(observations, batch_size=500)
+            sync.record(WasteBin, [bin.pk for bin in analyzed_bins + unchanged_bins])
+        if self.frame_cache is not None:
+            self.frame_cache.save()
+        stats.elapsed = time.monotonic() - stats.started
+        return stats
+
+
+def _default_analyze(base64_image):
+    # Errors propagate so a failed analysis never overwrites the bin
+    from .vision import get_backend
+    return get_backend().analyze(base64_image)
+
+
+def camera_bins(limit=None):
+    """Bins that have a camera URL, least recently updated first (so a `limit` rotates through them)"""
+    bins = WasteBin.objects.exclude(camera_url__isnull=True).exclude(camera_url='').order_by('updated_at', 'id')
+    if limit:
+        bins = bins[:limit]
+    return list(bins)
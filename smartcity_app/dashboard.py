@@ -0,0 +1,151 @@
+"""
+Materialized counters for dashboard_stats, get_waste_statistics and
+get_climate_statistics
+
+Each scope (an organization id, or DashboardCounters.GLOBAL_SCOPE for
+superadmins) has one DashboardCounters row. The endpoints read that row;
+when it is older than DASHBOARD_COUNTERS_TTL seconds it is recomputed with
+one conditional-aggregation query per table (COUNT(*) FILTER (WHERE ...)),
+plus one grouped query each for the per-hudud and per-facility-type
+breakdowns, and upserted, so the counts lag writes by at most the TTL.
+
+The rows are recomputed rather than incremented from signals: the bulk
+write paths (camera analysis, batch assignment, route planning) use
+bulk_update()/update() and send no signals. `manage.py
+reconcile_dashboard_counters` recomputes every scope and reports drift.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+
+from .models import Boiler, DashboardCounters, Facility, Organization, Room, Truck, WasteBin, WasteTask
+
+TTL = getattr(settings, 'DASHBOARD_COUNTERS_TTL', 30)
+TASK_WINDOW_DAYS = 30
+
+FACILITY_TYPES = [ftype for ftype, _ in Facility.FACILITY_TYPE_CHOICES]
+
+# Fields compared by reconcile()
+COUNTER_FIELDS = [
+    field.name for field in DashboardCounters._meta.fields if field.name not in ('scope', 'computed_at')
+]
+
+
+def scope_for(org_id):
+    return str(org_id) if org_id else DashboardCounters.GLOBAL_SCOPE
+
+
+def compute(scope):
+    """Fresh, unsaved counters for a scope"""
+    bins = WasteBin.objects.all()
+    trucks = Truck.objects.all()
+    tasks = WasteTask.objects.filter(created_at__gte=timezone.now() - timedelta(days=TASK_WINDOW_DAYS))
+    if scope != DashboardCounters.GLOBAL_SCOPE:
+        bins = bins.filter(organization_id=scope)
+        trucks = trucks.filter(organization_id=scope)
+        tasks = tasks.filter(waste_bin__organization_id=scope)
+
+    bin_counts = bins.aggregate(
+        total=Count('id'), full=Count('id', filter=Q(is_full=True)), avg_fill=Avg('fill_level'),
+    )
+    truck_counts = trucks.aggregate(total=Count('id'), busy=Count('id', filter=Q(status='BUSY')))
+    task_counts = tasks.aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='COMPLETED')),
+        pending=Count('id', filter=Q(status='PENDING')),
+        in_progress=Count('id', filter=Q(status='IN_PROGRESS')),
+    )
+    room_counts = Room.objects.aggregate(
+        total=Count('id'),
+        avg_temperature=Avg('temperature'),
+        avg_humidity=Avg('humidity'),
+        critical=Count('id', filter=Q(status='CRITICAL')),
+        warning=Count('id', filter=Q(status='WARNING')),
+        optimal=Count('id', filter=Q(status='OPTIMAL')),
+    )
+
+    # One grouped query each, covering every hudud and facility type that exists
+    by_hudud = {
+        row['toza_hudud']: {'total': row['total'], 'full': row['full'], 'avg_fill': round(row['avg_fill'] or 0, 2)}
+        for row in bins.order_by('toza_hudud').values('toza_hudud').annotate(
+            total=Count('id'), full=Count('id', filter=Q(is_full=True)), avg_fill=Avg('fill_level'),
+        )
+    }
+    by_facility_type = {ftype: {'count': 0, 'avg_efficiency': 0} for ftype in FACILITY_TYPES}
+    for row in Facility.objects.order_by('type').values('type').annotate(
+        count=Count('id'), avg_efficiency=Avg('efficiency_score'),
+    ):
+        by_facility_type[row['type']] = {'count': row['count'], 'avg_efficiency': round(row['avg_efficiency'] or 0, 2)}
+    total_facilities = sum(counts['count'] for counts in by_facility_type.values())
+
+    return DashboardCounters(
+        scope=scope,
+        total_bins=bin_counts['total'],
+        full_bins=bin_counts['full'],
+        average_fill_level=bin_counts['avg_fill'] or 0,
+        total_trucks=truck_counts['total'],
+        busy_trucks=truck_counts['busy'],
+        tasks_total=task_counts['total'],
+        tasks_completed=task_counts['completed'],
+        tasks_pending=task_counts['pending'],
+        tasks_in_progress=task_counts['in_progress'],
+        by_hudud=by_hudud,
+        total_facilities=total_facilities,
+        total_rooms=room_counts['total'],
+        total_boilers=Boiler.objects.count(),
+        average_temperature=round(room_counts['avg_temperature'] or 0, 2),
+        average_humidity=round(room_counts['avg_humidity'] or 0, 2),
+        critical_rooms=room_counts['critical'],
+        warning_rooms=room_counts['warning'],
+        optimal_rooms=room_counts['optimal'],
+        by_facility_type=by_facility_type,
+        computed_at=timezone.now(),
+    )
+
+
+def save(counters):
+    """Insert or replace the rows of the given counters"""
+    DashboardCounters.objects.bulk_create(
+        counters,
+        update_conflicts=True,
+        unique_fields=['scope'],
+        update_fields=COUNTER_FIELDS + ['computed_at'],
+    )
+
+
+def get_counters(org_id=None, max_age=TTL):
+    """The scope's counters, recomputed if they are older than `max_age` seconds"""
+    scope = scope_for(org_id)
+    counters = DashboardCounters.objects.filter(scope=scope).first()
+    if counters is None or timezone.now() - counters.computed_at > timedelta(seconds=max_age):
+        counters = compute(scope)
+        save([counters])
+    return counters
+
+
+def reconcile():
+    """
+    Recompute the counters of every scope and drop those of deleted organizations
+
+    Returns {scope: {field: (stored, actual)}} for the rows that had drifted
+    (a missing row shows stored values of None).
+    """
+    scopes = [DashboardCounters.GLOBAL_SCOPE] + [str(pk) for pk in Organization.objects.values_list('pk', flat=True)]
+    stored = {counters.scope: counters for counters in DashboardCounters.objects.all()}
+    fresh = [compute(scope) for scope in scopes]
+
+    drift = {}
+    for counters in fresh:
+        old = stored.get(counters.scope)
+        changed = {
+            field: (getattr(old, field) if old else None, getattr(counters, field))
+            for field in COUNTER_FIELDS
+            if old is None or getattr(old, field) != getattr(counters, field)
+        }
+        if changed:
+            drift[counters.scope] = changed
+    save(fresh)
+    DashboardCounters.objects.exclude(scope__in=scopes).delete()
+    return drift
@@ -0,0 +1,126 @@
+"""
+In-process IoTDevice registry
+
+Telemetry endpoints resolve a device_id to (pk, device_id, room_id, boiler_id)
+on every POST. The registry keeps those lookups in memory, keyed by the
+normalized device_id, so a steady stream of readings costs no lookup queries.
+
+Unknown device_ids are cached as well (with a shorter TTL), so a sensor with
+a misconfigured id can't force a database query on every request.
+
+Entries are dropped when an IoTDevice is saved or deleted (see signals.py)
+and when a device is linked to a room or boiler. Other worker processes
+pick up changes once the TTL expires.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import CharField
+from django.db.models.functions import Lower
+
+from .models import IoTDevice
+
+# Seconds a resolved / unknown device_id stays cached
+REGISTRY_TTL = getattr(settings, 'IOT_DEVICE_REGISTRY_TTL', 300)
+NEGATIVE_TTL = getattr(settings, 'IOT_DEVICE_REGISTRY_NEGATIVE_TTL', 30)
+
+# Upper bound on cached keys; random ids from a broken sensor can't grow it forever
+MAX_ENTRIES = getattr(settings, 'IOT_DEVICE_REGISTRY_MAX_ENTRIES', 10000)
+
+_lock = threading.Lock()
+_entries = {}  # normalized device_id -> (expires_at, rows)
+
+
+def normalize_device_id(device_id):
+    """Canonical registry key for a device_id; the form IoTDevice.save() stores"""
+    return IoTDevice.normalize_device_id(device_id)
+
+
+def _pick(device_id, rows):
+    """Exact match wins over a case-insensitive one, like the old lookup"""
+    if not rows:
+        return None
+    for row in rows:
+        if row[1] == device_id:
+            return row
+    return rows[0]
+
+
+def _store(entries, now):
+    """Add entries to the cache, trimming it if it grew past MAX_ENTRIES"""
+    with _lock:
+        if len(_entries) + len(entries) > MAX_ENTRIES:
+            for key in [key for key, (expires_at, _) in _entries.items() if expires_at <= now]:
+                del _entries[key]
+            if len(_entries) + len(entries) > MAX_ENTRIES:
+                _entries.clear()
+        _entries.update(entries)
+
+
+def resolve_many(device_ids):
+    """
+    Resolve many device_ids, querying the database only for cache misses.
+
+    Returns {requested_device_id: (pk, device_id, room_id, boiler_id)};
+    unknown device_ids are left out.
+    """
+    requested = {str(device_id) for device_id in device_ids}
+    if not requested:
+        return {}
+
+    now = time.monotonic()
+    cached = {}
+    missing = set()
+    with _lock:
+        for device_id in requested:
+            key = normalize_device_id(device_id)
+            entry = _entries.get(key)
+            if entry and entry[0] > now:
+                cached[key] = entry[1]
+            else:
+                missing.add(key)
+
+    if missing:
+        found = {key: [] for key in missing}
+        # A single probe of the unique Lower(device_id) index per key. Stored ids are
+        # normalized (DeviceIdField), so lowering the normalized key compares like with like;
+        # the plain CharField output keeps DeviceIdField from upper-casing the lowered keys
+        rows = (
+            IoTDevice.objects
+            .annotate(device_id_lower=Lower('device_id', output_field=CharField()))
+            .filter(device_id_lower__in={key.lower() for key in missing})
+            .values_list('pk', 'device_id', 'room_id', 'boiler_id')
+        )
+        for row in rows:
+            key = normalize_device_id(row[1])
+            if key in found:
+                found[key].append(row)
+
+        fresh = {}
+        for key, rows in found.items():
+            rows = tuple(rows)
+            fresh[key] = (now + (REGISTRY_TTL if rows else NEGATIVE_TTL), rows)
+            cached[key] = rows
+        _store(fresh, now)
+
+    resolved = {}
+    for device_id in requested:
+        row = _pick(device_id, cached[normalize_device_id(device_id)])
+        if row:
+            resolved[device_id] = row
+    return resolved
+
+
+def resolve(device_id):
+    """Resolve a single device_id; returns the row tuple or None"""
+    return resolve_many([device_id]).get(str(device_id))
+
+
+def invalidate(device_id=None):
+    """Drop one device_id from the registry, or everything when no id is given"""
+    with _lock:
+        if device_id is None:
+            _entries.clear()
+        else:
+            _entries.pop(normalize_device_id(device_id), None)
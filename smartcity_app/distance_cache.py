@@ -0,0 +1,195 @@
+"""
+Persistent bin-to-bin distance matrices for the route optimizer
+
+Bins hardly ever move, so the pairwise haversine distances of each toza
+hudud are kept on disk (DISTANCE_CACHE_DIR) as a float32 .npy matrix that
+every worker memory-maps read-only. A route request slices the rows and
+columns of its bins out of the matrix instead of recomputing the trig for
+every pair.
+
+Files per hudud:
+  <key>.json       bin ids and coordinates in matrix order, and the name of
+                   the current matrix file
+  <key>.<gen>.npy  float32 matrix; a new generation is written for every
+                   update and the index is switched to it with os.replace,
+                   so readers never see a half-written file
+
+The cache is brought up to date on use: when a requested bin is missing or
+its coordinates differ from the stored ones (a bin was added or moved), the
+hudud's bins are reloaded and only the rows of new and moved bins are
+computed; rows of deleted bins are dropped at the same time.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from hashlib import sha1
+
+import numpy as np
+from django.conf import settings
+from django.utils.text import slugify
+
+from .assignment import distance_matrix
+from .models import WasteBin
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = getattr(settings, 'DISTANCE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'distances'))
+# Hudud sizes above this are computed per request instead: the matrix grows with the square
+# (5000 bins: 100 MB of float32 per file, and an update rewrites the whole file)
+MAX_BINS = getattr(settings, 'DISTANCE_CACHE_MAX_BINS', 5000)
+# Superseded matrix files are removed once they are this old (other workers may still be switching)
+STALE_FILE_AGE = 60
+
+
+def _key(hudud):
+    return f"{slugify(hudud) or 'hudud'}-{sha1(hudud.encode()).hexdigest()[:8]}"
+
+
+class DistanceCache:
+    def __init__(self, directory=CACHE_DIR, max_bins=MAX_BINS):
+        self.directory = directory
+        self.max_bins = max_bins
+        self._lock = threading.Lock()
+        self._loaded = {}  # hudud -> (index mtime, {bin id: row}, coordinates, matrix)
+        self.hits = 0
+        self.updates = 0
+
+    def _index_path(self, hudud):
+        return os.path.join(self.directory, f'{_key(hudud)}.json')
+
+    def _load(self, hudud):
+        """Current (positions, coordinates, matrix) of a hudud, or None if it isn't cached"""
+        path = self._index_path(hudud)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        loaded = self._loaded.get(hudud)
+        if loaded and loaded[0] == mtime:
+            return loaded[1:]
+        try:
+            with open(path) as f:
+                index = json.load(f)
+            matrix = np.load(os.path.join(self.directory, index['matrix']), mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return None  # Replaced while we were reading; the caller updates it
+        if matrix.shape != (len(index['ids']),) * 2:
+            return None
+        positions = {bin_id: row for row, bin_id in enumerate(index['ids'])}
+        coordinates = np.asarray(index['coords'], dtype=float).reshape(-1, 2)
+        self._loaded[hudud] = (mtime, positions, coordinates, matrix)
+        return positions, coordinates, matrix
+
+    def distances(self, hudud, bin_ids, lat, lng):
+        """
+        Distance matrix (km, float32) between the given bins, in the given order
+
+        `lat` and `lng` are the bins' current coordinates; a bin that isn't
+        cached or has moved triggers an incremental update of the hudud.
+        """
+        bin_ids = [str(bin_id) for bin_id in bin_ids]
+        requested = np.column_stack([np.asarray(lat, dtype=float), np.asarray(lng, dtype=float)])
+        with self._lock:
+            cached = self._load(hudud)
+            if not self._covers(cached, bin_ids, requested):
+                cached = self._update(hudud, cached)
+                if not self._covers(cached, bin_ids, requested):
+                    # Too large to cache, or the bins changed again meanwhile
+                    return distance_matrix(lat, lng, lat, lng)
+            else:
+                self.hits += 1
+        positions, _, matrix = cached
+        rows = np.asarray([positions[bin_id] for bin_id in bin_ids], dtype=int)
+        return matrix[np.ix_(rows, rows)]  # float32 copy; plan_routes widens it
+
+    @staticmethod
+    def _covers(cached, bin_ids, requested):
+        if cached is None:
+            return False
+        positions, coordinates, _ = cached
+        rows = [positions.get(bin_id) for bin_id in bin_ids]
+        if None in rows:
+            return False
+        return np.allclose(coordinates[rows], requested, rtol=0, atol=1e-9)
+
+    def _update(self, hudud, cached):
+        """Rebuild the hudud's matrix, reusing the rows of bins that haven't moved"""
+        bins = list(
+            WasteBin.objects.filter(toza_hudud=hudud).order_by('pk')
+            .values_list('id', 'location__lat', 'location__lng')
+        )
+        if not bins or len(bins) > self.max_bins:
+            return None
+        started = time.perf_counter()
+        ids = [str(bin_id) for bin_id, _, _ in bins]
+        coordinates = np.asarray([(lat, lng) for _, lat, lng in bins], dtype=float)
+        matrix = np.empty((len(ids), len(ids)), dtype=np.float32)
+
+        kept_new, kept_old = [], []
+        if cached is not None:
+            positions, old_coordinates, old_matrix = cached
+            for row, bin_id in enumerate(ids):
+                old_row = positions.get(bin_id)
+                if old_row is not None and np.allclose(old_coordinates[old_row], coordinates[row], rtol=0, atol=1e-9):
+                    kept_new.append(row)
+                    kept_old.append(old_row)
+        if kept_new:
+            matrix[np.ix_(kept_new, kept_new)] = old_matrix[np.ix_(kept_old, kept_old)]
+        changed = np.setdiff1d(np.arange(len(ids)), kept_new)
+        if len(changed):
+            rows = distance_matrix(coordinates[changed, 0], coordinates[changed, 1], coordinates[:, 0], coordinates[:, 1])
+            matrix[changed, :] = rows
+            matrix[:, changed] = rows.T
+
+        self._write(hudud, ids, coordinates, matrix)
+        self.updates += 1
+        logger.info(
+            f"📐 Distance cache for {hudud}: {len(ids)} bins, {len(changed)} rows computed, "
+            f"{len(kept_new)} reused in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return self._load(hudud)
+
+    def _write(self, hudud, ids, coordinates, matrix):
+        os.makedirs(self.directory, exist_ok=True)
+        key = _key(hudud)
+        matrix_name = f'{key}.{uuid.uuid4().hex[:12]}.npy'
+        np.save(os.path.join(self.directory, matrix_name), matrix)
+
+        path = self._index_path(hudud)
+        temporary = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'matrix': matrix_name, 'ids': ids, 'coords': coordinates.tolist()}, f)
+        os.replace(temporary, path)
+
+        cutoff = time.time() - STALE_FILE_AGE
+        for name in os.listdir(self.directory):
+            if name.startswith(f'{key}.') and name.endswith('.npy') and name != matrix_name:
+                file_path = os.path.join(self.directory, name)
+                try:
+                    if os.path.getmtime(file_path) < cutoff:
+                        os.remove(file_path)
+                except OSError:
+                    pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_distance_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DistanceCache()
+    return _cache
+
+
+def bin_distances(hudud, bin_ids, lat, lng):
+    """Cached bin-to-bin distances, or a fresh computation if DISTANCE_CACHE_ENABLED is off"""
+    if not getattr(settings, 'DISTANCE_CACHE_ENABLED', True):
+        return distance_matrix(lat, lng, lat, lng)
+    return get_distance_cache().distances(hudud, bin_ids, lat, lng)
@@ -0,0 +1,287 @@
+"""
+Live update stream for dashboards (/api/events/stream/, Server-Sent Events)
+
+Served by the ASGI entry point (smartcity_backend/asgi.py), e.g.
+
+    uvicorn smartcity_backend.asgi:application
+
+Writes happen in any process (WSGI workers, the IoT queue flusher, camera
+workers), so the stream doesn't hook into saves directly. One ChangeFeed
+thread per ASGI process tails the sync change log (ChangeLogEntry, see
+sync.py) and SensorReading every EVENTS_POLL_INTERVAL seconds and publishes
+the new rows to the in-process EventBroker. The database work is therefore
+a couple of queries per tick no matter how many clients are connected.
+
+Each client gets a Subscription with a bounded buffer: when a slow client
+falls EVENTS_CLIENT_BUFFER events behind, the oldest events are dropped and
+it receives an 'overflow' event telling it to resync through /api/sync/.
+
+Event types: truck, bus, waste_bin (position/status/fill changes) and
+iot_reading. Trucks and bins carry their organization_id and only reach
+subscribers of that organization (or unscoped ones); buses and readings
+have no organization and go to every subscriber of the type. A deleted
+truck or bin has no row left to read the organization from, so the feed
+remembers the owners of the objects it has published; the deletion of an
+object it never saw only reaches unscoped subscribers.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Max
+
+from .models import Bus, ChangeLogEntry, SensorReading, Truck, WasteBin
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('truck', 'bus', 'waste_bin', 'iot_reading')
+
+POLL_INTERVAL = getattr(settings, 'EVENTS_POLL_INTERVAL', 1.0)
+POLL_BATCH = getattr(settings, 'EVENTS_POLL_BATCH', 1000)
+CLIENT_BUFFER = getattr(settings, 'EVENTS_CLIENT_BUFFER', 100)
+MAX_CLIENTS = getattr(settings, 'EVENTS_MAX_CLIENTS', 500)
+KEEPALIVE = getattr(settings, 'EVENTS_KEEPALIVE', 15)
+# Streams are closed after this long; EventSource reconnects on its own
+MAX_STREAM_SECONDS = getattr(settings, 'EVENTS_MAX_STREAM_SECONDS', 300)
+
+# change log entity -> event type
+ENTITY_EVENTS = {'trucks': 'truck', 'buses': 'bus', 'waste_bins': 'waste_bin'}
+# Event types that belong to an organization
+ORGANIZATION_TYPES = ('truck', 'waste_bin')
+# Owners remembered for deletion events, per process
+OWNER_CACHE_SIZE = 50000
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """Events for one client; put() may be called from any thread"""
+
+    def __init__(self, types, organization_id=None, buffer_size=CLIENT_BUFFER):
+        self.types = set(types)
+        self.organization_id = str(organization_id) if organization_id else None
+        self.dropped = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+    def matches(self, event):
+        if event['type'] not in self.types:
+            return False
+        if self.organization_id is None or event['type'] not in ORGANIZATION_TYPES:
+            return True
+        owner = event.get('organization_id')
+        return owner is not None and str(owner) == self.organization_id
+
+    def put(self, event):
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1  # deque drops the oldest event
+            self._buffer.append(event)
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def get(self, timeout):
+        """Buffered events and the number dropped since the last call; waits up to `timeout`"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+
+class EventBroker:
+    """In-process fan-out of events to the matching subscriptions"""
+
+    def __init__(self, max_clients=MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, types=EVENT_TYPES, organization_id=None, buffer_size=CLIENT_BUFFER):
+        subscription = Subscription(types, organization_id, buffer_size)
+        with self._lock:
+            if len(self._subscriptions) >= self.max_clients:
+                raise TooManySubscribers(f'{self.max_clients} clients are already connected')
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+    def publish(self, event_type, data, organization_id=None):
+        event = {'id': next(self._ids), 'type': event_type, 'organization_id': organization_id, 'data': data}
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.matches(event):
+                subscription.put(event)
+
+
+def _entity_rows(event_type, pks):
+    """Slim payloads of changed trucks, buses and bins: {pk: row}"""
+    if event_type == 'truck':
+        rows = Truck.objects.filter(pk__in=pks).values(
+            'id', 'organization_id', 'plate_number', 'status', 'fuel_level', 'location__lat', 'location__lng'
+        )
+    elif event_type == 'bus':
+        rows = Bus.objects.filter(pk__in=pks).values(
+            'id', 'route_number', 'status', 'speed', 'bearing', 'passengers', 'location__lat', 'location__lng'
+        )
+    else:
+        rows = WasteBin.objects.filter(pk__in=pks).values('id', 'organization_id', 'fill_level', 'is_full')
+    return {str(row['id']): row for row in rows}
+
+
+class ChangeFeed:
+    """Tails the change log and sensor readings and publishes them to a broker"""
+
+    def __init__(self, broker, interval=POLL_INTERVAL, batch_size=POLL_BATCH):
+        self.broker = broker
+        self.interval = interval
+        self.batch_size = batch_size
+        self._thread = None
+        self._stop = threading.Event()
+        self._change_version = None
+        self._reading_id = None
+        self._owners = {}  # (event type, object id) -> organization id, oldest first
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='event-change-feed', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    busy = self.poll()
+                except Exception:
+                    logger.error("❌ Event change feed poll failed", exc_info=True)
+                    connection.close()
+                    busy = False
+                if not busy:
+                    self._stop.wait(self.interval)
+        finally:
+            connection.close()
+
+    def poll(self):
+        """Publish everything written since the last poll; returns True if a batch was full"""
+        if not self.broker.subscriber_count:
+            self._change_version = None  # Nobody listening; restart from "now" for the next client
+            return False
+        if self._change_version is None:
+            # There is no replay, streams start at the current position
+            self._change_version = ChangeLogEntry.objects.aggregate(v=Max('id'))['v'] or 0
+            self._reading_id = SensorReading.objects.aggregate(v=Max('id'))['v'] or 0
+            return False
+        return self._poll_changes() | self._poll_readings()
+
+    def _poll_changes(self):
+        entries = list(
+            ChangeLogEntry.objects.filter(id__gt=self._change_version, entity__in=list(ENTITY_EVENTS))
+            .order_by('id').values_list('id', 'entity', 'object_id', 'action')[:self.batch_size]
+        )
+        if not entries:
+            return False
+        self._change_version = entries[-1][0]
+
+        # Objects in order of their last change; each is published as it is now (a row, or deleted),
+        # since a DELETE entry from a rolled back block can name an object that still exists
+        latest = {}
+        for _, entity, object_id, _ in entries:
+            latest.pop((entity, object_id), None)
+            latest[(entity, object_id)] = True
+        changed = {}
+        for entity, object_id in latest:
+            changed.setdefault(ENTITY_EVENTS[entity], []).append(object_id)
+        rows = {event_type: _entity_rows(event_type, pks) for event_type, pks in changed.items()}
+
+        for entity, object_id in latest:
+            event_type = ENTITY_EVENTS[entity]
+            row = rows.get(event_type, {}).get(object_id)
+            if row is None:
+                owner = self._owners.pop((event_type, object_id), None)
+                self.broker.publish(event_type, {'id': object_id, 'deleted': True}, organization_id=owner)
+            else:
+                self._remember_owner(event_type, object_id, row.get('organization_id'))
+                self.broker.publish(event_type, row, organization_id=row.get('organization_id'))
+        return len(entries) == self.batch_size
+
+    def _remember_owner(self, event_type, object_id, organization_id):
+        if event_type not in ORGANIZATION_TYPES:
+            return
+        self._owners.pop((event_type, object_id), None)
+        if organization_id is not None:
+            self._owners[(event_type, object_id)] = organization_id
+            if len(self._owners) > OWNER_CACHE_SIZE:
+                del self._owners[next(iter(self._owners))]
+
+    def _poll_readings(self):
+        readings = list(
+            SensorReading.objects.filter(id__gt=self._reading_id).order_by('id').values(
+                'id', 'device__device_id', 'device__room_id', 'device__boiler_id', 'timestamp', 'temperature', 'humidity'
+            )[:self.batch_size]
+        )
+        if not readings:
+            return False
+        self._reading_id = readings[-1]['id']
+        for reading in readings:
+            self.broker.publish('iot_reading', {
+                'device_id': reading['device__device_id'],
+                'room_id': reading['device__room_id'],
+                'boiler_id': reading['device__boiler_id'],
+                'timestamp': reading['timestamp'],
+                'temperature': reading['temperature'],
+                'humidity': reading['humidity'],
+            })
+        return len(readings) == self.batch_size
+
+
+_broker = None
+_feed = None
+_lock = threading.Lock()
+
+
+def get_broker():
+    """Process-wide broker; starts the change feed on first use"""
+    global _broker, _feed
+    if _broker is None:
+        with _lock:
+            if _broker is None:
+                _feed = ChangeFeed(EventBroker())
+                _feed.start()
+                _broker = _feed.broker
+    return _broker
+
+
+def format_sse(event_type, data, event_id=None):
+    """One Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,103 @@
+"""
+Fill-level history and the online fill-rate estimator
+
+Every fill level written to a bin - camera analysis, the Telegram bot,
+manual edits - is appended to WasteBinFillObservation, and a completed
+collection task adds a 0% observation.
+
+WasteBin.fill_rate (percent per day) is learned from these observations
+without reading the history back. Each bin keeps its baseline observation
+(fill_observed_level / fill_observed_at) and a sample count; a new
+observation gives the rate sample (level - baseline) / elapsed days, which
+is folded into fill_rate with an exponentially weighted average:
+
+    alpha = 1 - 0.5 ** (elapsed / FILL_RATE_HALF_LIFE_DAYS)
+
+so the old rate loses half its weight per half-life, however irregular the
+observations are. The first samples get at least 1 / (samples + 1) weight,
+so the 1.5 default is forgotten quickly. A collection - a completed task,
+or a drop of FILL_RESET_DROP points or more - only moves the baseline to
+the new level; the rate carries over into the next fill cycle.
+Observations closer than MIN_INTERVAL to the baseline don't update the
+rate (too noisy), and readings at 100% are censored (the bin may have been
+full for a while), so neither feeds a sample.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import sync
+from .models import WasteBin, WasteBinFillObservation
+
+HALF_LIFE_DAYS = getattr(settings, 'FILL_RATE_HALF_LIFE_DAYS', 3.0)
+RESET_DROP = getattr(settings, 'FILL_RESET_DROP', 20)
+RETENTION_DAYS = getattr(settings, 'FILL_HISTORY_RETENTION_DAYS', 90)
+MIN_INTERVAL = timedelta(hours=1)
+MAX_RATE = 100.0  # percent per day
+
+# Estimator fields to save along with fill_level
+STATE_FIELDS = ['fill_rate', 'fill_observed_level', 'fill_observed_at', 'fill_rate_samples']
+
+SOURCES = {source for source, _ in WasteBinFillObservation.SOURCE_CHOICES}
+
+
+def source_for(image_source):
+    """Observation source for a WasteBin.image_source value"""
+    return image_source if image_source in SOURCES else 'BOT'
+
+
+def _clamp_level(level):
+    return max(0, min(100, int(level)))
+
+
+def observe(waste_bin, level, source, at=None):
+    """
+    Fold one observation into the bin's estimator state (in memory only)
+
+    Returns the unsaved WasteBinFillObservation; the caller saves both,
+    the bin with STATE_FIELDS.
+    """
+    at = at or timezone.now()
+    level = _clamp_level(level)
+    baseline, since = waste_bin.fill_observed_level, waste_bin.fill_observed_at
+
+    if baseline is None or since is None or source == 'COLLECTION' or level <= baseline - RESET_DROP:
+        waste_bin.fill_observed_level, waste_bin.fill_observed_at = level, at  # New fill cycle
+    elif at - since >= MIN_INTERVAL:
+        if level < 100:
+            days = (at - since).total_seconds() / 86400
+            sample = min(max(level - baseline, 0) / days, MAX_RATE)
+            alpha = max(1 - 0.5 ** (days / HALF_LIFE_DAYS), 1 / (waste_bin.fill_rate_samples + 1))
+            waste_bin.fill_rate = round(alpha * sample + (1 - alpha) * waste_bin.fill_rate, 4)
+            waste_bin.fill_rate_samples += 1
+        waste_bin.fill_observed_level, waste_bin.fill_observed_at = level, at
+
+    return WasteBinFillObservation(waste_bin_id=waste_bin.pk, fill_level=level, source=source, observed_at=at)
+
+
+def record(waste_bin, level, source, at=None):
+    """Observe, then store the observation and the bin's estimator state"""
+    observation = observe(waste_bin, level, source, at)
+    observation.save()
+    # update() skips auto_now and signals, so updated_at and the sync log are handled here
+    waste_bin.updated_at = timezone.now()
+    WasteBin.objects.filter(pk=waste_bin.pk).update(
+        updated_at=waste_bin.updated_at, **{field: getattr(waste_bin, field) for field in STATE_FIELDS}
+    )
+    sync.record(WasteBin, [waste_bin.pk])
+    return observation
+
+
+def record_by_id(waste_bin_id, level, source, at=None):
+    """record() for callers that only have the bin id"""
+    waste_bin = WasteBin.objects.only('id', *STATE_FIELDS).filter(pk=waste_bin_id).first()
+    if waste_bin is not None:
+        return record(waste_bin, level, source, at)
+
+
+def prune(retention_days=RETENTION_DAYS):
+    """Delete observations older than the retention period; returns the number deleted"""
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = WasteBinFillObservation.objects.filter(observed_at__lt=cutoff).delete()
+    return deleted
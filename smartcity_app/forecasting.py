@@ -0,0 +1,154 @@
+"""
+Waste bin fill-level forecasts
+
+Used by the generate_waste_prediction endpoint and by the scheduler's
+periodic prediction refresh.
+
+Forecasts for any number of bins are computed in one numpy pass: each bin
+fills linearly from its current level at its estimated rate (percent per
+day), capped at 100. The rate is, in order of preference:
+  - WasteBin.fill_rate once fill_history.py has learned it from observations
+  - the level reached since the bin's last completed collection task
+  - the WasteBin.fill_rate default
+
+Rows are upserted on (waste_bin, prediction_date), so recomputing replaces
+the previous forecast for a day instead of adding another row, and
+predictions older than WASTE_PREDICTION_RETENTION_DAYS are pruned.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import WastePrediction, WasteBin, WasteTask
+
+FULL_THRESHOLD = 80
+MAX_DAYS_AHEAD = getattr(settings, 'WASTE_PREDICTION_MAX_DAYS', 30)
+RETENTION_DAYS = getattr(settings, 'WASTE_PREDICTION_RETENTION_DAYS', 30)
+# A collection more recent than this says too little about the rate
+MIN_HISTORY_DAYS = 0.5
+
+LEARNED_CONFIDENCE = 90.0
+HISTORY_CONFIDENCE = 85.0
+FALLBACK_CONFIDENCE = 60.0
+
+UPDATE_FIELDS = [
+    'predicted_fill_level', 'confidence', 'will_be_full', 'recommended_collection_date',
+    'based_on_data_points', 'created_at',
+]
+
+
+def last_collections(bin_ids=None):
+    """{bin id: completed_at of its last completed collection task}; bin_ids may be a subquery"""
+    tasks = WasteTask.objects.filter(status='COMPLETED', completed_at__isnull=False)
+    if bin_ids is not None:
+        tasks = tasks.filter(waste_bin_id__in=bin_ids)
+    return dict(tasks.values('waste_bin_id').annotate(last=Max('completed_at')).values_list('waste_bin_id', 'last'))
+
+
+def estimate_rates(levels, fill_rates, learned, days_since_collection):
+    """
+    Fill rates in percent per day and whether each came from the last collection
+
+    `learned` marks bins whose fill_rate was learned from observations;
+    days_since_collection is NaN for bins never collected.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        observed = levels / days_since_collection
+        from_history = ~learned & (days_since_collection >= MIN_HISTORY_DAYS) & (levels > 0)
+    rates = np.where(from_history, np.clip(observed, 0, 100), fill_rates)
+    return rates, from_history
+
+
+def forecast_levels(levels, rates, days_ahead):
+    """(bins x days) predicted fill levels for days 1..days_ahead"""
+    days = np.arange(1, days_ahead + 1, dtype=float)
+    return np.minimum(100, levels[:, None] + rates[:, None] * days[None, :])
+
+
+def build_bulk_predictions(bins, days_ahead=7, today=None):
+    """Unsaved WastePrediction rows for the next `days_ahead` days of every bin in the queryset"""
+    today = today or timezone.localdate()
+    now = timezone.now()
+    rows = list(bins.values_list('id', 'fill_level', 'fill_rate', 'fill_rate_samples'))
+    if not rows:
+        return []
+    ids = [row[0] for row in rows]
+    collected = last_collections(bins.values('id'))
+
+    levels = np.asarray([row[1] for row in rows], dtype=float)
+    fill_rates = np.asarray([row[2] for row in rows], dtype=float)
+    learned = np.asarray([row[3] > 0 for row in rows], dtype=bool)
+    days_since = np.asarray([
+        (now - collected[bin_id]).total_seconds() / 86400 if bin_id in collected else np.nan
+        for bin_id in ids
+    ])
+    rates, from_history = estimate_rates(levels, fill_rates, learned, days_since)
+    predicted = forecast_levels(levels, rates, days_ahead)
+    full = predicted >= FULL_THRESHOLD
+
+    dates = [today + timedelta(days=day) for day in range(1, days_ahead + 1)]
+    predictions = []
+    for i, bin_id in enumerate(ids):
+        if learned[i]:
+            confidence, data_points = LEARNED_CONFIDENCE, rows[i][3] + 1  # rate samples + current level
+        elif from_history[i]:
+            confidence, data_points = HISTORY_CONFIDENCE, 2  # level + last collection
+        else:
+            confidence, data_points = FALLBACK_CONFIDENCE, 1
+        for day, prediction_date in enumerate(dates):
+            predictions.append(WastePrediction(
+                waste_bin_id=bin_id,
+                prediction_date=prediction_date,
+                predicted_fill_level=int(predicted[i, day]),
+                confidence=confidence,
+                will_be_full=bool(full[i, day]),
+                recommended_collection_date=prediction_date if full[i, day] else None,
+                based_on_data_points=data_points,
+            ))
+    return predictions
+
+
+def upsert_predictions(predictions):
+    """Insert, or replace the existing prediction for the same bin and date"""
+    WastePrediction.objects.bulk_create(
+        predictions,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['waste_bin', 'prediction_date'],
+        update_fields=UPDATE_FIELDS,
+    )
+
+
+def predict_bins(bins, days_ahead=7):
+    """Forecast and store the bins of a queryset; returns the number of rows written"""
+    predictions = build_bulk_predictions(bins, days_ahead)
+    with transaction.atomic():
+        upsert_predictions(predictions)
+    return len(predictions)
+
+
+def predict_bin(waste_bin, days_ahead=7):
+    """Forecast one bin and return its stored predictions"""
+    today = timezone.localdate()
+    predict_bins(WasteBin.objects.filter(pk=waste_bin.pk), days_ahead)
+    return list(WastePrediction.objects.filter(
+        waste_bin=waste_bin, prediction_date__gt=today, prediction_date__lte=today + timedelta(days=days_ahead)
+    ).order_by('prediction_date'))
+
+
+def prune_predictions(retention_days=RETENTION_DAYS):
+    """Delete predictions for dates more than `retention_days` in the past"""
+    cutoff = timezone.localdate() - timedelta(days=retention_days)
+    deleted, _ = WastePrediction.objects.filter(prediction_date__lt=cutoff).delete()
+    return deleted
+
+
+def refresh_predictions(days_ahead=7):
+    """Recompute the forecasts of every bin and prune old ones; returns the number of rows written"""
+    written = predict_bins(WasteBin.objects.all(), days_ahead)
+    prune_predictions()
+    return written
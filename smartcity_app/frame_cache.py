@@ -0,0 +1,130 @@
+"""
+Perceptual-hash cache of camera frames
+
+CCTV frames of a bin barely change between analysis runs. Each frame gets a
+64-bit difference hash (dHash, computed with Pillow); when it is within
+CAMERA_HASH_THRESHOLD bits of the last analyzed frame of that bin, the stored
+AI result is reused and the vision model isn't called.
+
+Hit/miss counters are kept per bin on CameraFrameCache, see cache_stats().
+"""
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from PIL import Image
+
+from .models import CameraFrameCache
+
+HASH_THRESHOLD = getattr(settings, 'CAMERA_HASH_THRESHOLD', 5)
+
+COUNTER_FIELDS = ['frame_hash', 'ai_result', 'analyzed_at', 'checked_at', 'hits', 'misses']
+
+
+def dhash(image_bytes, size=8):
+    """64-bit difference hash of an image as a hex string (None if it can't be decoded)"""
+    try:
+        with Image.open(BytesIO(image_bytes)) as image:
+            pixels = list(image.convert('L').resize((size + 1, size), Image.LANCZOS).getdata())
+    except (OSError, ValueError):
+        return None
+
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return f'{value:0{size * size // 4}x}'
+
+
+def hamming(a, b):
+    """Number of differing bits between two hex hashes"""
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def is_cacheable(ai_result):
+    """Only keep results the model was actually confident about"""
+    return bool(ai_result.get('confidence'))
+
+
+class FrameCache:
+    """
+    Cache entries for one analysis run.
+
+    Entries for all bins are loaded with one query; lookups and stores are
+    thread-safe and the changes are written back by save() in two bulk queries.
+    """
+
+    def __init__(self, bins, threshold=HASH_THRESHOLD):
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {
+            entry.waste_bin_id: entry
+            for entry in CameraFrameCache.objects.filter(waste_bin__in=[bin.pk for bin in bins])
+        }
+        self._dirty = set()
+
+    def lookup(self, bin, frame_hash):
+        """Return the cached AI result if `frame_hash` matches the bin's last frame"""
+        with self._lock:
+            entry = self._entries.get(bin.pk)
+            if entry is not None and frame_hash and hamming(entry.frame_hash, frame_hash) <= self.threshold:
+                entry.hits += 1
+                entry.checked_at = timezone.now()
+                self._dirty.add(bin.pk)
+                self.hits += 1
+                return entry.ai_result
+            self.misses += 1
+            if entry is not None:
+                entry.misses += 1
+                self._dirty.add(bin.pk)
+            return None
+
+    def store(self, bin, frame_hash, ai_result):
+        """Remember the result of a fresh model call"""
+        if not frame_hash or not is_cacheable(ai_result):
+            return
+        now = timezone.now()
+        with self._lock:
+            entry = self._entries.get(bin.pk)
+            if entry is None:
+                entry = CameraFrameCache(waste_bin_id=bin.pk, misses=1)
+                self._entries[bin.pk] = entry
+            entry.frame_hash = frame_hash
+            entry.ai_result = ai_result
+            entry.analyzed_at = now
+            entry.checked_at = now
+            self._dirty.add(bin.pk)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def save(self):
+        """Write new and changed entries back"""
+        entries = [self._entries[pk] for pk in self._dirty]
+        CameraFrameCache.objects.bulk_update(
+            [entry for entry in entries if not entry._state.adding], COUNTER_FIELDS, batch_size=200
+        )
+        created = [entry for entry in entries if entry._state.adding]
+        CameraFrameCache.objects.bulk_create(created, batch_size=200)
+        for entry in created:
+            entry._state.adding = False
+        self._dirty.clear()
+
+
+def cache_stats():
+    """All-time hits, misses and hit rate across every bin"""
+    totals = CameraFrameCache.objects.aggregate(hits=Sum('hits'), misses=Sum('misses'))
+    hits, misses = totals['hits'] or 0, totals['misses'] or 0
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+    }
@@ -0,0 +1,164 @@
+"""
+Write-behind queue for IoT readings
+
+In async mode update_iot_sensor_data only validates a reading and appends it
+to the PendingSensorReading table, so the device gets its 202 without waiting
+for the IoTDevice/Room/Boiler writes. The flush_iot_queue management command
+drains the table in batches through the regular telemetry helpers.
+
+Enqueueing is idempotent on (device_id, timestamp): a device that retries a
+POST after a timeout doesn't produce a second reading. The backlog is bounded
+by IOT_QUEUE_MAX_BACKLOG; once it is reached new readings are refused with
+QueueFull and the view answers 503 with Retry-After. The check uses the id
+span of the queue (two primary key lookups) rather than COUNT(*), which
+scans the table on every POST.
+
+Flushers take the queue one at a time: on SQLite each flush takes the
+database write lock before reading its batch, elsewhere the batch is
+selected with SKIP LOCKED so concurrent flushers work on disjoint rows.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import device_registry
+from .models import PendingSensorReading, SensorReading
+from .telemetry import apply_readings, record_readings
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKLOG = getattr(settings, 'IOT_QUEUE_MAX_BACKLOG', 50000)
+RETRY_AFTER = getattr(settings, 'IOT_QUEUE_RETRY_AFTER', 30)
+FLUSH_BATCH_SIZE = getattr(settings, 'IOT_QUEUE_FLUSH_BATCH_SIZE', 500)
+
+# Counters of this (web) process only, reported by the queue stats endpoint.
+# Flushing runs in the flush_iot_queue process, which reports its own totals
+_counters_lock = threading.Lock()
+_counters = {'received': 0, 'rejected': 0}
+
+
+class QueueFull(Exception):
+    """Raised when the pending backlog has reached IOT_QUEUE_MAX_BACKLOG"""
+
+
+def _count(name, value=1):
+    with _counters_lock:
+        _counters[name] += value
+
+
+def backlog():
+    """Number of readings waiting to be flushed"""
+    return PendingSensorReading.objects.count()
+
+
+def approximate_backlog():
+    """
+    Upper bound of backlog() from the ids of the oldest and newest queued readings
+
+    Flushing deletes the oldest ids first, so the span only overcounts ids
+    skipped by the sequence (ignored duplicates on some databases).
+    """
+    ids = PendingSensorReading.objects.values_list('id', flat=True)
+    oldest = ids.order_by('id').first()
+    if oldest is None:
+        return 0
+    return ids.order_by('-id').first() - oldest + 1
+
+
+def enqueue(readings):
+    """
+    Append normalized readings to the queue.
+
+    Raises QueueFull when there is no room for the batch; duplicates of
+    already queued (device_id, timestamp) pairs are silently ignored.
+    """
+    if approximate_backlog() + len(readings) > MAX_BACKLOG:
+        _count('rejected', len(readings))
+        raise QueueFull(f'IoT ingest backlog is full ({MAX_BACKLOG} readings)')
+
+    PendingSensorReading.objects.bulk_create([
+        PendingSensorReading(
+            device_id=device_registry.normalize_device_id(reading['device_id']),
+            timestamp=reading['timestamp'],
+            temperature=reading['temperature'],
+            humidity=reading['humidity'],
+        )
+        for reading in readings
+    ], ignore_conflicts=True)
+    _count('received', len(readings))  # Ignored duplicates included: bulk_create can't tell them apart
+
+
+def flush(batch_size=FLUSH_BATCH_SIZE):
+    """
+    Apply the oldest `batch_size` queued readings and remove them from the queue.
+
+    Returns {'flushed': n, 'dropped': n} where dropped counts readings whose
+    device no longer exists. Flushing is safe to repeat: history writes are
+    idempotent on (device, timestamp).
+    """
+    with transaction.atomic():
+        queued = PendingSensorReading.objects.order_by('id')
+        if connection.vendor == 'sqlite':
+            # Take the write lock before reading the batch, so a second flusher waits
+            # for this one to commit instead of applying the same readings again
+            with connection.cursor() as cursor:
+                table = connection.ops.quote_name(PendingSensorReading._meta.db_table)
+                cursor.execute(f'UPDATE {table} SET id = id WHERE 0')
+        else:
+            queued = queued.select_for_update(skip_locked=True)
+        pending = list(queued[:batch_size])
+        if not pending:
+            return {'flushed': 0, 'dropped': 0}
+
+        resolved = device_registry.resolve_many({item.device_id for item in pending})
+        readings = [
+            {
+                'device_id': item.device_id,
+                'temperature': item.temperature,
+                'humidity': item.humidity,
+                'timestamp': item.timestamp,
+            }
+            for item in pending if item.device_id in resolved
+        ]
+        if readings:
+            # A reading that arrived late must not overwrite newer current values
+            latest = dict(
+                SensorReading.objects
+                .filter(device_id__in={row[0] for row in resolved.values()})
+                .values('device_id')
+                .annotate(latest=Max('timestamp'))
+                .values_list('device_id', 'latest')
+            )
+            current = [
+                reading for reading in readings
+                if reading['timestamp'] >= latest.get(resolved[reading['device_id']][0], reading['timestamp'])
+            ]
+            if current:
+                apply_readings(current, resolved)
+            record_readings(readings, resolved)
+        PendingSensorReading.objects.filter(id__in=[item.id for item in pending]).delete()
+
+    result = {'flushed': len(readings), 'dropped': len(pending) - len(readings)}
+    if result['dropped']:
+        logger.warning(f"⚠️ Dropped {result['dropped']} queued readings from unknown devices")
+    return result
+
+
+def stats():
+    """Backpressure metrics: backlog depth, oldest pending age and this process's counters"""
+    summary = PendingSensorReading.objects.aggregate(oldest=Min('received_at'))
+    depth = backlog()
+    oldest = summary['oldest']
+    with _counters_lock:
+        counters = dict(_counters)
+    return {
+        'backlog': depth,
+        'max_backlog': MAX_BACKLOG,
+        'utilization': round(depth / MAX_BACKLOG, 4) if MAX_BACKLOG else None,
+        'oldest_pending_seconds': round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0,
+        'process_counters': counters,
+    }
@@ -1,87 +1,59 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from smartcity_app.models import WasteBin
-import random
-import time
-from datetime import datetime, timedelta
+from django.conf import settings
+from smartcity_app.camera_pipeline import CameraPipeline, camera_bins
+from smartcity_app.frame_cache import cache_stats
 
 
 class Command(BaseCommand):
     help = 'Automatically analyze waste bins via camera every 30 minutes'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'CAMERA_ANALYSIS_CONCURRENCY', 4),
+            help='Parallel AI analyses (downloads use twice as many workers)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Analyze at most this many bins',
+        )
+        parser.add_argument(
+            '--hash-threshold',
+            type=int,
+            default=getattr(settings, 'CAMERA_HASH_THRESHOLD', 5),
+            help='Max perceptual-hash distance (bits) to reuse the previous result',
+        )
+        parser.add_argument(
+            '--no-frame-cache',
+            action='store_true',
+            help='Always call the vision model, even for unchanged frames',
+        )
+
     def handle(self, *args, **options):
+        self.hash_threshold = None if options['no_frame_cache'] else options['hash_threshold']
         self.stdout.write(
             self.style.SUCCESS('Starting automatic waste bin analysis...')
         )
         
         # For demo purposes, we'll just update the bins once
         # In a real system, this would run continuously or be scheduled with cron
-        self.analyze_bins()
+        self.analyze_bins(options['concurrency'], options['limit'])
         
         self.stdout.write(
             self.style.SUCCESS('Waste bin analysis completed')
         )
     
-    def analyze_bins(self):
-        """Analyze all waste bins using REAL camera images only - NO random generation"""
-        bins = WasteBin.objects.all()
+    def analyze_bins(self, concurrency, limit=None):
+        """Analyze waste bins using REAL camera images only - NO random generation"""
+        pipeline = CameraPipeline(hash_threshold=self.hash_threshold, concurrency=concurrency, log=self.stdout.write)
+        stats = pipeline.run(camera_bins(limit))
         
-        for bin in bins:
-            # CRITICAL: Only analyze if there's a REAL camera URL
-            if not bin.camera_url:
-                self.stdout.write(f"⚠️ Bin {bin.id} ({bin.address}) has no camera_url - skipping analysis")
-                continue
-            
-            # CRITICAL: Only analyze if camera URL is valid (not placeholder)
-            if 'placeholder' in bin.camera_url.lower() or 'via.placeholder' in bin.camera_url.lower():
-                self.stdout.write(f"⚠️ Bin {bin.id} ({bin.address}) has placeholder image URL - skipping analysis")
-                continue
-            
-            old_fill_level = bin.fill_level
-            old_is_full = bin.is_full
-            
-            # Try to download and analyze the REAL image from camera_url
-            try:
-                import requests as req
-                import base64
-                from io import BytesIO
-                from smartcity_app.views import analyze_bin_image_backend
-                
-                # Download image from camera URL
-                response = req.get(bin.camera_url, timeout=10)
-                if response.status_code == 200:
-                    # Convert image to base64 for AI analysis
-                    image_bytes = BytesIO(response.content).read()
-                    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-                    
-                    # Call REAL AI analysis (no simulation)
-                    ai_result = analyze_bin_image_backend(image_base64)
-                    
-                    # Update bin status based on REAL AI analysis
-                    bin.fill_level = ai_result['fillLevel']
-                    bin.is_full = ai_result['isFull']
-                    bin.last_analysis = f"AI tahlili (CCTV): {ai_result['notes']}, IsFull: {ai_result['isFull']}, FillLevel: {ai_result['fillLevel']}%, Conf: {ai_result['confidence']}%"
-                    bin.image_source = 'CCTV'
-                    bin.image_url = bin.camera_url  # Save the camera image URL
-                    
-                    bin.save()
-                    
-                    # Log the change
-                    if old_fill_level != bin.fill_level or old_is_full != bin.is_full:
-                        self.stdout.write(
-                            f"✅ Bin {bin.id} ({bin.address}) analyzed: fill level {old_fill_level}% -> {bin.fill_level}%, "
-                            f"full status: {old_is_full} -> {bin.is_full} (AI confidence: {ai_result['confidence']}%)"
-                        )
-                    else:
-                        self.stdout.write(
-                            f"ℹ️ Bin {bin.id} ({bin.address}) analyzed: no change (fill level: {bin.fill_level}%, AI confidence: {ai_result['confidence']}%)"
-                        )
-                else:
-                    self.stdout.write(
-                        f"❌ Bin {bin.id} ({bin.address}) camera URL returned {response.status_code} - cannot analyze"
-                    )
-            except Exception as e:
-                self.stdout.write(
-                    f"❌ Error analyzing bin {bin.id} ({bin.address}): {str(e)}"
-                )
-                # Don't update bin if analysis fails - keep existing values
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f"📊 {stats.summary()}"))
+        totals = cache_stats()
+        self.stdout.write(f"♻️ Frame cache all-time: {totals['hits']} hits / {totals['misses']} misses ({totals['hit_rate']:.0%} hit rate)")
+        for bin_id, stage, error in stats.failures:
+            self.stdout.write(self.style.WARNING(f"   {bin_id}: {stage} failed - {error}"))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from smartcity_app.assignment import METHODS, AssignmentConflict, assign_bins
+
+
+class Command(BaseCommand):
+    help = 'Assign all full waste bins (or the given bins) to the nearest idle trucks in one batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'bin_ids',
+            nargs='*',
+            help='Bins to assign (default: every full bin without an open task)',
+        )
+        parser.add_argument(
+            '--organization',
+            default=None,
+            help='Only bins and trucks of this organization id',
+        )
+        parser.add_argument(
+            '--method',
+            choices=METHODS,
+            default='auto',
+            help='Matching algorithm (default: auto)',
+        )
+        parser.add_argument(
+            '--capacity',
+            type=int,
+            default=getattr(settings, 'ASSIGNMENT_TRUCK_CAPACITY', 1),
+            help='Bins each truck may take',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the assignment without creating tasks',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = assign_bins(
+                bin_ids=options['bin_ids'] or None,
+                organization_id=options['organization'],
+                capacity=options['capacity'],
+                method=options['method'],
+                dry_run=options['dry_run'],
+            )
+        except (ValueError, AssignmentConflict) as e:
+            raise CommandError(str(e))
+
+        for item in report['assigned']:
+            self.stdout.write(f"   🗑️ {item['bin_id']} -> 🚛 {item['truck_id']} ({item['distance_km']} km)")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(report['assigned'])} bins assigned{' (dry run)' if report['dry_run'] else ''}, "
+            f"{len(report['unassigned_bin_ids'])} unassigned, "
+            f"total {report['total_distance_km']} km, solver {report['solver']} in {report['solver_ms']} ms"
+        ))
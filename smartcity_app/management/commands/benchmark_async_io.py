@@ -0,0 +1,165 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from smartcity_app import alerts, async_http
+from smartcity_app.camera_jobs import MAX_IMAGE_BYTES, _download
+from smartcity_app.models import AlertNotification
+from asgiref.sync import async_to_sync
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+import asyncio
+import threading
+import time
+
+
+class SlowUpstream:
+    """Local HTTP server answering every request after `delay` seconds"""
+
+    def __init__(self, delay):
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('L', (320, 240), color=90).save(buffer, format='JPEG')
+        upstream = self
+        self.image = buffer.getvalue()
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, content_type, body):
+                with upstream._lock:
+                    upstream.active += 1
+                    upstream.peak = max(upstream.peak, upstream.active)
+                try:
+                    time.sleep(upstream.delay)
+                    self.send_response(200)
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with upstream._lock:
+                        upstream.active -= 1
+
+            def do_GET(self):
+                self._reply('image/jpeg', upstream.image)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._reply('application/json', b'{"ok": true}')
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 1024
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self):
+        self.peak = 0
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class Command(BaseCommand):
+    help = 'Compare sync workers with the async (httpx) path under many concurrent slow upstream calls'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Concurrent calls per scenario (default: 200)',
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=0.5,
+            help='Upstream response time in seconds (default: 0.5)',
+        )
+        parser.add_argument(
+            '--sync-workers',
+            type=int,
+            default=8,
+            help='Sync workers (e.g. gunicorn sync workers) serving the blocking path (default: 8)',
+        )
+
+    def handle(self, *args, **options):
+        total, workers = options['requests'], options['sync_workers']
+        upstream = SlowUpstream(options['delay'])
+        settings.ALERT_SMS_WEBHOOK_URL = f'{upstream.url}/sms'
+        self.stdout.write(self.style.SUCCESS(
+            f"🚀 {total} calls per scenario, upstream delay {options['delay']}s, {workers} sync workers"
+        ))
+
+        image_url = f'{upstream.url}/frame.jpg'
+        alert = AlertNotification(
+            alert_type='WASTE_BIN_FULL', title='Benchmark', message='Konteyner to\'la',
+            channel='SMS', recipient='+998000000000',
+        )
+
+        def sync_download(_):
+            return _download(image_url)
+
+        def sync_alert(_):
+            # Blocking delivery from a sync worker: a fresh event loop and client per call
+            async_to_sync(deliver_with_own_client)(alert)
+
+        async def async_download(client):
+            return await async_http.fetch_bytes(image_url, MAX_IMAGE_BYTES, client=client)
+
+        async def async_alert(client):
+            return await alerts.deliver(alert, client)
+
+        try:
+            for name, sync_call, async_call in [
+                ('camera download', sync_download, async_download),
+                ('alert delivery', sync_alert, async_alert),
+            ]:
+                self.report(f'{name} / sync', upstream, total, lambda: self.run_sync(sync_call, total, workers))
+                self.report(f'{name} / async', upstream, total, lambda: self.run_async(async_call, total))
+        finally:
+            upstream.stop()
+
+    def run_sync(self, call, total, workers):
+        with ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(self._safe(call), range(total)))
+        return sum(1 for ok in results if not ok)
+
+    def run_async(self, call, total):
+        async def main():
+            async with async_http.new_client() as client:
+                results = await asyncio.gather(*(call(client) for _ in range(total)), return_exceptions=True)
+            return sum(1 for result in results if isinstance(result, Exception))
+        return asyncio.run(main())
+
+    def _safe(self, call):
+        def wrapped(arg):
+            try:
+                call(arg)
+                return True
+            except Exception:
+                return False
+        return wrapped
+
+    def report(self, label, upstream, total, run):
+        upstream.reset()
+        started = time.monotonic()
+        failures = run()
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"📊 {label:<24} {elapsed:6.2f}s  {total / elapsed:7.1f} calls/s  "
+            f"peak in-flight {upstream.peak:4d}  failures {failures}"
+        )
+
+
+async def deliver_with_own_client(alert):
+    async with async_http.new_client() as client:
+        await alerts.deliver(alert, client)
@@ -0,0 +1,92 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from smartcity_app.models import (
+    Bus, CallRequest, DriverPerformance, EcoViolation, Notification, Truck, WasteBin, WastePrediction, WasteTask
+)
+
+
+def hot_queries():
+    """(label, queryset, leading columns of the index it should use)"""
+    since = timezone.now() - timedelta(days=30)
+    today = timezone.localdate()
+    return [
+        ('bins by hudud', WasteBin.objects.filter(toza_hudud='1-sonli Toza Hudud'), ['toza_hudud']),
+        ('full bins of hudud', WasteBin.objects.filter(toza_hudud='1-sonli Toza Hudud', is_full=True),
+         ['toza_hudud', 'is_full']),
+        ('full bins', WasteBin.objects.filter(is_full=True), ['organization_id', 'toza_hudud']),
+        ('full bins of organization', WasteBin.objects.filter(organization_id=0, is_full=True),
+         ['organization_id', 'toza_hudud']),
+        ('idle trucks of hudud', Truck.objects.filter(toza_hudud='1-sonli Toza Hudud', status='IDLE'),
+         ['toza_hudud', 'status']),
+        ('buses by status', Bus.objects.filter(status='ACTIVE'), ['status']),
+        ('call requests by status', CallRequest.objects.filter(status='NEW'), ['status']),
+        ('eco violations since', EcoViolation.objects.filter(timestamp__gte=since), ['timestamp']),
+        ('unread notifications', Notification.objects.filter(read=False), ['user_id', 'timestamp']),
+        ('unread notifications of user', Notification.objects.filter(user_id=0, read=False), ['user_id', 'timestamp']),
+        ('tasks by status in window', WasteTask.objects.filter(status='COMPLETED', created_at__gte=since),
+         ['status', 'created_at']),
+        ('recent tasks', WasteTask.objects.filter(created_at__gte=since), ['created_at']),
+        ('driver performance', DriverPerformance.objects.filter(truck_id=0, date__gte=today), ['truck_id', 'date']),
+        ('bin predictions', WastePrediction.objects.filter(waste_bin_id=0, prediction_date__gte=today),
+         ['waste_bin_id', 'prediction_date']),
+    ]
+
+
+def index_names(table, columns):
+    """Names of the indexes (including unique ones) of `table` whose leading columns are `columns`"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # Unique constraints declared in CREATE TABLE are served by sqlite_autoindex_<table>_<n>
+            # indexes, which introspection reports under the constraint name; PRAGMA has the real ones
+            table = connection.ops.quote_name(table)
+            cursor.execute(f'PRAGMA index_list({table})')
+            names = set()
+            for name in [row[1] for row in cursor.fetchall()]:
+                cursor.execute(f'PRAGMA index_info({connection.ops.quote_name(name)})')
+                if [row[2] for row in sorted(cursor.fetchall())][:len(columns)] == columns:
+                    names.add(name)
+            return names
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return {
+        name for name, info in constraints.items()
+        if (info['index'] or info['unique']) and not info['primary_key'] and info['columns'][:len(columns)] == columns
+    }
+
+
+def plan_indexes(plan):
+    """Names of the indexes an EXPLAIN output uses (SQLite and PostgreSQL plans)"""
+    return set(re.findall(r'(?:USING (?:COVERING )?INDEX|Index (?:Only )?Scan using|Bitmap Index Scan on) "?(\w+)', plan))
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot filter queries and check that each one uses its index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the full query plans',
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+        for label, queryset, columns in hot_queries():
+            plan = queryset.explain()
+            names = index_names(queryset.model._meta.db_table, columns)
+            used = sorted(plan_indexes(plan) & names)
+            if used:
+                self.stdout.write(f"   ✅ {label}: {', '.join(used)}")
+            else:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f"   ❌ {label}: no index on ({', '.join(columns)}) used"))
+            if options['verbose_plans'] or not used:
+                for line in plan.splitlines():
+                    self.stdout.write(f"      {line}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries don't use their index: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('✅ All hot queries use their indexes'))
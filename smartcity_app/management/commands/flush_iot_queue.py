@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from smartcity_app.ingest_queue import flush, backlog
+import time
+
+
+class Command(BaseCommand):
+    help = 'Drain queued IoT readings into IoTDevice/Room/Boiler and the sensor history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'IOT_QUEUE_FLUSH_BATCH_SIZE', 500),
+            help='Readings applied per transaction (default: IOT_QUEUE_FLUSH_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and flush whenever new readings arrive',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the queue is empty in --loop mode (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        self.stdout.write(self.style.SUCCESS(f'Flushing IoT queue ({backlog()} pending)...'))
+        try:
+            while True:
+                flushed, dropped = self.drain(batch_size)
+                if flushed or dropped:
+                    self.stdout.write(f'✅ Flushed {flushed} readings, dropped {dropped} from unknown devices')
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted'))
+
+        self.stdout.write(self.style.SUCCESS(f'IoT queue flush finished ({backlog()} pending)'))
+
+    def drain(self, batch_size):
+        """Flush batches until the queue is empty"""
+        flushed = dropped = 0
+        while True:
+            result = flush(batch_size)
+            flushed += result['flushed']
+            dropped += result['dropped']
+            if result['flushed'] + result['dropped'] < batch_size:
+                return flushed, dropped
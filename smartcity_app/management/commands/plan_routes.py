@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from smartcity_app import route_planning, routing
+from smartcity_app.forecasting import FULL_THRESHOLD
+from datetime import date as date_type
+import time
+
+
+class Command(BaseCommand):
+    help = "Plan the next day's collection routes for every truck, in parallel per toza hudud"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            default=None,
+            help='Planning date YYYY-MM-DD (default: tomorrow)',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=int,
+            default=FULL_THRESHOLD,
+            help=f'Collect bins predicted at or above this fill level (default: {FULL_THRESHOLD})',
+        )
+        parser.add_argument(
+            '--hudud',
+            action='append',
+            default=None,
+            help='Only plan this toza hudud (repeatable)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=route_planning.WORKERS,
+            help='Worker processes (default: ROUTE_PLANNING_WORKERS or the CPU count)',
+        )
+        parser.add_argument(
+            '--capacity',
+            type=float,
+            default=routing.default_capacity(),
+            help='Truck capacity in full-bin equivalents (default: ROUTE_TRUCK_CAPACITY, unlimited)',
+        )
+        parser.add_argument(
+            '--time-budget',
+            type=float,
+            default=getattr(settings, 'ROUTE_OPTIMIZATION_TIME_BUDGET', 1.0),
+            help='Optimization seconds per hudud',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Plan and report without saving routes or tasks',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            date = date_type.fromisoformat(options['date']) if options['date'] else route_planning.default_date()
+        except ValueError:
+            raise CommandError('--date must be YYYY-MM-DD')
+
+        started = time.perf_counter()
+        jobs = route_planning.build_jobs(
+            date, options['threshold'], options['hudud'], options['capacity'], options['time_budget']
+        )
+        if not jobs:
+            self.stdout.write(self.style.WARNING(f'No bins need collection on {date}'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"🗓️ Planning {date}: {sum(len(job['bins']) for job in jobs)} bins in {len(jobs)} hududs, "
+            f"{options['workers']} workers"
+        ))
+
+        solve_started = time.perf_counter()
+        results = route_planning.solve_all(jobs, options['workers'])
+        solve_elapsed = time.perf_counter() - solve_started
+
+        for job, result in zip(jobs, results):
+            quality = result['quality']
+            line = (
+                f"   {result['hudud']:<24} {len(job['bins']):5d} bins {len(job['trucks']):3d} trucks "
+                f"{len(result['routes']):3d} routes {quality['total_distance_km']:9.2f} km "
+                f"(-{quality['improvement_pct']}% vs NN) {result['elapsed_ms']:8.1f} ms [pid {result['pid']}]"
+            )
+            if result['unserved']:
+                line += f" {len(result['unserved'])} unserved"
+            self.stdout.write(self.style.WARNING(line) if not job['trucks'] else line)
+
+        if options['dry_run']:
+            routes = sum(len(result['routes']) for result in results)
+            tasks = sum(len(route['stops']) for result in results for route in result['routes'])
+        else:
+            routes, tasks, taken = route_planning.save_plans(results, date)
+            routes, tasks = len(routes), len(tasks)
+            if taken:
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ {len(taken)} bins got a task while planning, left out: {', '.join(taken)}"
+                ))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {routes} routes, {tasks} tasks{' (dry run)' if options['dry_run'] else ''}; "
+            f"solve {solve_elapsed:.2f}s (sum of hududs {sum(r['elapsed_ms'] for r in results) / 1000:.2f}s), "
+            f"total {time.perf_counter() - started:.2f}s"
+        ))
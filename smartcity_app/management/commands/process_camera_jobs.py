@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from smartcity_app.camera_jobs import run_batch
+import time
+
+
+class Command(BaseCommand):
+    help = 'Process queued camera-image analysis jobs and write the results back to the bins'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'CAMERA_ANALYSIS_CONCURRENCY', 4),
+            help='Jobs processed in parallel',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Jobs claimed at a time (default: 20)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and wait for new jobs',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait when there is nothing to do in --loop mode (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Processing camera analysis jobs...'))
+        totals = {}
+        try:
+            while True:
+                counts = run_batch(options['concurrency'], options['batch_size'])
+                for job_status, count in counts.items():
+                    totals[job_status] = totals.get(job_status, 0) + count
+                if counts:
+                    self.stdout.write(f"✅ Batch: {', '.join(f'{count} {job_status}' for job_status, count in counts.items())}")
+                if not counts.get('DONE'):
+                    # Nothing left, or only retries (e.g. vision backend down): back off
+                    if not options['loop']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted'))
+
+        summary = ', '.join(f'{count} {job_status}' for job_status, count in totals.items()) or 'no jobs'
+        self.stdout.write(self.style.SUCCESS(f'Camera job processing finished: {summary}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from smartcity_app.dashboard import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized dashboard counters of every organization and report drift'
+
+    def handle(self, *args, **options):
+        drift = reconcile()
+        for scope, fields in drift.items():
+            self.stdout.write(f"   📊 {scope}:")
+            for field, (stored, actual) in fields.items():
+                self.stdout.write(f"      {field}: {stored} -> {actual}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Dashboard counters reconciled, {len(drift)} scopes had drifted"))
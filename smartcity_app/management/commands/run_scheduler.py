@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from smartcity_app.scheduler import (
+    TASKS, LEADER_LEASE, Scheduler, Heartbeat, acquire_lease, release_lease
+)
+import signal
+import time
+
+
+class Command(BaseCommand):
+    help = 'Run periodic tasks (bin analysis, prediction refresh, reports); only one leader runs them at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the tasks that are due (if this process is the leader) and exit',
+        )
+        parser.add_argument(
+            '--task',
+            choices=sorted(TASKS),
+            help='Run this task right now (still protected by its lease) and exit',
+        )
+        parser.add_argument(
+            '--tick',
+            type=float,
+            default=15.0,
+            help='Seconds between schedule checks (default: 15)',
+        )
+        parser.add_argument(
+            '--lease-ttl',
+            type=int,
+            default=getattr(settings, 'SCHEDULER_LEASE_TTL', 60),
+            help='Seconds a lease stays valid without a heartbeat',
+        )
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler(ttl=options['lease_ttl'])
+        self.stdout.write(self.style.SUCCESS(f'Scheduler {scheduler.owner} starting...'))
+
+        if options['task']:
+            run = scheduler.run_task(TASKS[options['task']])
+            if run is None:
+                raise CommandError(f"{options['task']} is already running in another process")
+            self.report(run)
+            return
+
+        # Treat SIGTERM (systemd/supervisor stop) like Ctrl+C so the leader lease is released
+        signal.signal(signal.SIGTERM, self.interrupt)
+
+        heartbeat = None
+        try:
+            while True:
+                if acquire_lease(LEADER_LEASE, scheduler.owner, scheduler.ttl):
+                    if heartbeat is None:
+                        self.stdout.write(self.style.SUCCESS('👑 Acquired scheduler leadership'))
+                        scheduler.load_schedule()
+                        heartbeat = Heartbeat(scheduler.owner, scheduler.ttl)
+                        heartbeat.start()
+                    for task in scheduler.due_tasks():
+                        if heartbeat.lost.is_set():
+                            break
+                        self.stdout.write(f'▶️ Running {task.name}...')
+                        run = scheduler.run_task(task, heartbeat)
+                        if run is not None:
+                            self.report(run)
+                if heartbeat is not None and heartbeat.lost.is_set():
+                    self.stdout.write(self.style.WARNING('Lost scheduler leadership'))
+                    heartbeat.stop()
+                    heartbeat = None
+                if options['once']:
+                    break
+                time.sleep(options['tick'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted'))
+        finally:
+            if heartbeat is not None:
+                heartbeat.stop()
+                release_lease(LEADER_LEASE, scheduler.owner)
+
+    def interrupt(self, signum, frame):
+        raise KeyboardInterrupt
+
+    def report(self, run):
+        line = f'{run.task}: {run.status} in {run.duration_seconds:.1f}s'
+        if run.status == 'SUCCESS':
+            self.stdout.write(self.style.SUCCESS(f'✅ {line}'))
+        else:
+            self.stdout.write(self.style.ERROR(f'❌ {line}'))
@@ -40,6 +40,6 @@ class Command(BaseCommand):
 
         # Set up default settings if needed
         from django.conf import settings
-        if not hasattr(settings, 'TELEGRAM_BOT_TOKEN'):
+        if not getattr(settings, 'TELEGRAM_BOT_TOKEN', None):
             self.stdout.write(self.style.WARNING('TELEGRAM_BOT_TOKEN is not set in settings'))
             self.stdout.write(self.style.WARNING('Please add TELEGRAM_BOT_TOKEN to your .env file'))
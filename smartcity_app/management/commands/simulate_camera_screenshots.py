@@ -1,12 +1,9 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from smartcity_app.models import WasteBin
-import random
-import requests
-from datetime import datetime, timedelta
-import base64
-import io
-from PIL import Image
+from django.conf import settings
+from smartcity_app.camera_pipeline import CameraPipeline, camera_bins
+from smartcity_app.frame_cache import cache_stats
+from datetime import timedelta
 
 
 class Command(BaseCommand):
@@ -18,8 +15,34 @@ class Command(BaseCommand):
             action='store_true',
             help='Run the simulation once instead of continuously',
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'CAMERA_ANALYSIS_CONCURRENCY', 4),
+            help='Parallel AI analyses (downloads use twice as many workers)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Process at most this many bins per cycle',
+        )
+        parser.add_argument(
+            '--hash-threshold',
+            type=int,
+            default=getattr(settings, 'CAMERA_HASH_THRESHOLD', 5),
+            help='Max perceptual-hash distance (bits) to reuse the previous result',
+        )
+        parser.add_argument(
+            '--no-frame-cache',
+            action='store_true',
+            help='Always call the vision model, even for unchanged frames',
+        )
 
     def handle(self, *args, **options):
+        self.concurrency = options['concurrency']
+        self.limit = options['limit']
+        self.hash_threshold = None if options['no_frame_cache'] else options['hash_threshold']
         self.stdout.write(
             self.style.SUCCESS('Starting camera screenshot simulation...')
         )
@@ -46,56 +69,14 @@ class Command(BaseCommand):
 
     def simulate_screenshots(self):
         """Capture REAL camera screenshots for all waste bins with REAL AI analysis - NO simulation"""
-        bins = WasteBin.objects.all()
+        pipeline = CameraPipeline(hash_threshold=self.hash_threshold, concurrency=self.concurrency, log=self.stdout.write)
+        stats = pipeline.run(camera_bins(self.limit))
         
-        for bin in bins:
-            # CRITICAL: Only process bins with REAL camera URLs
-            if not bin.camera_url:
-                self.stdout.write(f"⚠️ Bin {bin.id} ({bin.address}) has no camera_url - skipping")
-                continue
-            
-            # CRITICAL: Skip placeholder URLs
-            if 'placeholder' in bin.camera_url.lower() or 'via.placeholder' in bin.camera_url.lower():
-                self.stdout.write(f"⚠️ Bin {bin.id} ({bin.address}) has placeholder camera URL - skipping")
-                continue
-            
-            try:
-                # Download REAL image from camera URL
-                import requests as req
-                import base64
-                from io import BytesIO
-                from smartcity_app.views import analyze_bin_image_backend
-                
-                response = req.get(bin.camera_url, timeout=10)
-                if response.status_code == 200:
-                    # Convert image to base64 for REAL AI analysis
-                    image_bytes = BytesIO(response.content).read()
-                    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-                    
-                    # Call REAL AI analysis (no simulation)
-                    ai_analysis = analyze_bin_image_backend(image_base64)
-                    
-                    # Update bin status based on REAL AI analysis
-                    bin.image_url = bin.camera_url  # Use real camera URL
-                    bin.image_source = 'CCTV'
-                    bin.last_analysis = f"AI tahlili (CCTV): {ai_analysis.get('notes', 'Tahlil amalga oshirildi')}, IsFull: {ai_analysis.get('isFull')}, FillLevel: {ai_analysis.get('fillLevel')}%, Conf: {ai_analysis.get('confidence')}%"
-                    bin.fill_level = ai_analysis.get('fillLevel', bin.fill_level)
-                    bin.is_full = ai_analysis.get('isFull', bin.is_full)
-                    
-                    bin.save()
-                    
-                    self.stdout.write(
-                        f"✅ Bin {bin.id} ({bin.address}) analyzed with REAL camera image: fill level {bin.fill_level}%, "
-                        f"full status: {bin.is_full}, confidence: {ai_analysis.get('confidence')}%"
-                    )
-                else:
-                    self.stdout.write(
-                        f"❌ Bin {bin.id} ({bin.address}) camera URL returned {response.status_code} - cannot capture screenshot"
-                    )
-            except Exception as e:
-                self.stdout.write(
-                    f"❌ Error capturing screenshot for bin {bin.id} ({bin.address}): {str(e)}"
-                )
+        self.stdout.write(self.style.SUCCESS(f"📊 {stats.summary()}"))
+        totals = cache_stats()
+        self.stdout.write(f"♻️ Frame cache all-time: {totals['hits']} hits / {totals['misses']} misses ({totals['hit_rate']:.0%} hit rate)")
+        for bin_id, stage, error in stats.failures:
+            self.stdout.write(self.style.WARNING(f"   {bin_id}: {stage} failed - {error}"))
 
     # REMOVED: generate_simulated_image - we only use REAL camera URLs
-    # REMOVED: analyze_image_with_ai - we use analyze_bin_image_backend from views.py for REAL AI analysis
\ No newline at end of file
+    # REMOVED: analyze_image_with_ai - analysis goes through the vision backend (vision.get_backend)
\ No newline at end of file
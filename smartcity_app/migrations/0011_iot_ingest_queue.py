@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0010_sensor_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingSensorReading',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('device_id', models.CharField(max_length=100)),
+                ('timestamp', models.DateTimeField()),
+                ('temperature', models.FloatField(blank=True, null=True)),
+                ('humidity', models.FloatField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pendingsensorreading',
+            constraint=models.UniqueConstraint(fields=('device_id', 'timestamp'), name='pending_reading_device_ts_uniq'),
+        ),
+    ]
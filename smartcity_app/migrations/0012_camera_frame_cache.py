@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0011_iot_ingest_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CameraFrameCache',
+            fields=[
+                ('waste_bin', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='frame_cache', serialize=False, to='smartcity_app.wastebin')),
+                ('frame_hash', models.CharField(max_length=16)),
+                ('ai_result', models.JSONField(default=dict)),
+                ('analyzed_at', models.DateTimeField()),
+                ('checked_at', models.DateTimeField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('misses', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0012_camera_frame_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CameraAnalysisJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('image_url', models.URLField(max_length=1000)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('waste_bin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='camera_jobs', to='smartcity_app.wastebin')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='camera_job_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0015_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(max_length=30)),
+                ('object_id', models.CharField(max_length=64)),
+                ('action', models.CharField(choices=[('UPSERT', 'Upsert'), ('DELETE', 'Delete')], default='UPSERT', max_length=10)),
+                ('changed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
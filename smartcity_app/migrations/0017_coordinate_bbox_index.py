@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0016_sync_changelog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coordinate',
+            index=models.Index(fields=['lat', 'lng'], name='coordinate_lat_lng_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+def drop_duplicate_predictions(apps, schema_editor):
+    """Keep only the newest prediction per bin and date before adding the constraint"""
+    WastePrediction = apps.get_model('smartcity_app', 'WastePrediction')
+    seen = set()
+    duplicates = []
+    rows = WastePrediction.objects.order_by('waste_bin_id', 'prediction_date', '-created_at')
+    for pk, waste_bin_id, prediction_date in rows.values_list('pk', 'waste_bin_id', 'prediction_date').iterator():
+        key = (waste_bin_id, prediction_date)
+        if key in seen:
+            duplicates.append(pk)
+        else:
+            seen.add(key)
+    for start in range(0, len(duplicates), 500):
+        WastePrediction.objects.filter(pk__in=duplicates[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0017_coordinate_bbox_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_predictions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='wasteprediction',
+            constraint=models.UniqueConstraint(fields=('waste_bin', 'prediction_date'), name='unique_prediction_per_bin_date'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0018_waste_prediction_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wastebin',
+            name='fill_observed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='wastebin',
+            name='fill_observed_level',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='wastebin',
+            name='fill_rate_samples',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='WasteBinFillObservation',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('fill_level', models.PositiveSmallIntegerField()),
+                ('source', models.CharField(choices=[('CCTV', 'CCTV'), ('BOT', 'Telegram bot'), ('MANUAL', 'Manual'), ('COLLECTION', 'Collection')], max_length=10)),
+                ('observed_at', models.DateTimeField(db_index=True)),
+                ('waste_bin', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='fill_observations', to='smartcity_app.wastebin')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['waste_bin', 'observed_at'], name='fill_observation_bin_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0019_fill_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounters',
+            fields=[
+                ('scope', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('total_bins', models.PositiveIntegerField(default=0)),
+                ('full_bins', models.PositiveIntegerField(default=0)),
+                ('average_fill_level', models.FloatField(default=0)),
+                ('total_trucks', models.PositiveIntegerField(default=0)),
+                ('busy_trucks', models.PositiveIntegerField(default=0)),
+                ('tasks_total', models.PositiveIntegerField(default=0)),
+                ('tasks_completed', models.PositiveIntegerField(default=0)),
+                ('tasks_pending', models.PositiveIntegerField(default=0)),
+                ('tasks_in_progress', models.PositiveIntegerField(default=0)),
+                ('by_hudud', models.JSONField(default=dict)),
+                ('total_facilities', models.PositiveIntegerField(default=0)),
+                ('total_rooms', models.PositiveIntegerField(default=0)),
+                ('total_boilers', models.PositiveIntegerField(default=0)),
+                ('average_temperature', models.FloatField(default=0)),
+                ('average_humidity', models.FloatField(default=0)),
+                ('critical_rooms', models.PositiveIntegerField(default=0)),
+                ('warning_rooms', models.PositiveIntegerField(default=0)),
+                ('optimal_rooms', models.PositiveIntegerField(default=0)),
+                ('by_facility_type', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
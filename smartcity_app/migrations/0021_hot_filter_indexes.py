@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0020_dashboard_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bus',
+            index=models.Index(fields=['status'], name='bus_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='callrequest',
+            index=models.Index(fields=['status', 'timestamp'], name='call_request_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ecoviolation',
+            index=models.Index(fields=['timestamp'], name='eco_violation_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read', False)), fields=['user', 'timestamp'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='truck',
+            index=models.Index(fields=['toza_hudud', 'status'], name='truck_hudud_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wastebin',
+            index=models.Index(fields=['toza_hudud', 'is_full'], name='waste_bin_hudud_full_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wastebin',
+            index=models.Index(condition=models.Q(('is_full', True)), fields=['organization', 'toza_hudud'], name='waste_bin_full_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wastetask',
+            index=models.Index(fields=['status', 'created_at'], name='waste_task_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wastetask',
+            index=models.Index(fields=['-created_at'], name='waste_task_created_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:28
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def normalize_device_ids(apps, schema_editor):
+    """
+    Store every device_id in its normalized form before adding the constraint
+
+    When several devices normalize to the same id (e.g. "esp-a1" and
+    "ESP-A1"), the most recently seen one gets the id; the others are
+    renamed to "<id>-DUP-<n>", deactivated and reported, so their readings
+    are kept for a manual merge.
+    """
+    IoTDevice = apps.get_model('smartcity_app', 'IoTDevice')
+    groups = {}
+    devices = IoTDevice.objects.order_by(models.F('last_seen').desc(nulls_last=True), 'created_at')
+    for pk, device_id in devices.values_list('pk', 'device_id'):
+        groups.setdefault(str(device_id).strip().upper(), []).append((pk, device_id))
+
+    taken = set(groups)
+    for normalized, devices in groups.items():
+        (keeper_pk, keeper_id), duplicates = devices[0], devices[1:]
+        if duplicates:
+            print(f"\n⚠️ device_id collision on {normalized}: kept {keeper_id!r} (most recently seen)")
+        # Duplicates first: one of them may hold the normalized spelling already
+        for n, (pk, device_id) in enumerate(duplicates, start=1):
+            renamed = f'{normalized}-DUP-{n}'
+            while renamed in taken:
+                n += len(devices)
+                renamed = f'{normalized}-DUP-{n}'
+            taken.add(renamed)
+            IoTDevice.objects.filter(pk=pk).update(device_id=renamed, is_active=False)
+            print(f"   {device_id!r} ({pk}) renamed to {renamed} and deactivated")
+        if keeper_id != normalized:
+            IoTDevice.objects.filter(pk=keeper_pk).update(device_id=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0021_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_device_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='iotdevice',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('device_id'), name='iot_device_id_lower_unique'),
+        ),
+    ]
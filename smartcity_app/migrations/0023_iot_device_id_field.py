@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:38
+
+from django.db import migrations
+import smartcity_app.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0022_iot_device_id_lower_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='iotdevice',
+            name='device_id',
+            field=smartcity_app.models.DeviceIdField(max_length=100, unique=True),
+        ),
+    ]
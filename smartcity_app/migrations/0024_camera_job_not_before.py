@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0023_iot_device_id_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cameraanalysisjob',
+            name='not_before',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,158 @@
+"""
+Shared GET behaviour of the *ListCreateView APIViews
+
+The list views are plain APIViews, so REST_FRAMEWORK's PageNumberPagination
+never applies to them. They build their queryset as before and hand it to
+ListQueryMixin.list_response(), which adds three opt-in query parameters:
+
+  ?since=<ISO datetime>   only rows modified after that time (models with a
+                          last-modified column, see MODIFIED_FIELDS)
+  ?limit=N, ?cursor=...   keyset pagination on (created_at/timestamp, id);
+                          the response becomes {'results', 'next_cursor'}
+  ?fields=a,b             sparse fieldsets; 'id' is always included
+
+Without them the full list is returned exactly as before. Every response
+carries an X-Server-Time header to pass as ?since= on the next poll.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.response import Response
+
+# Candidate columns, first existing one wins
+CURSOR_FIELDS = ('created_at', 'timestamp')
+MODIFIED_FIELDS = ('updated_at', 'last_updated', 'last_seen', 'last_update')
+
+MAX_LIMIT = getattr(settings, 'LIST_MAX_LIMIT', 1000)
+
+
+class InvalidListQuery(ValueError):
+    """A list query parameter could not be parsed"""
+
+
+def _model_field(model, names, allow_null=True):
+    field_names = {field.name: field for field in model._meta.concrete_fields}
+    for name in names:
+        field = field_names.get(name)
+        if field is not None and (allow_null or not field.null):
+            return name
+    return None
+
+
+def _parse_datetime(value, param):
+    # A '+' in an unencoded query string arrives as a space
+    parsed = parse_datetime(value.strip().replace(' ', '+'))
+    if parsed is None:
+        raise InvalidListQuery(f'{param} must be an ISO 8601 datetime')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else str(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (binascii.Error, ValueError, UnicodeError):
+        raise InvalidListQuery('Invalid cursor')
+    if not isinstance(values, list) or not values:
+        raise InvalidListQuery('Invalid cursor')
+    return values
+
+
+class ListQueryMixin:
+    # Override per view; by default they are detected from the model
+    cursor_field = None
+    since_field = None
+
+    def get_cursor_field(self, model):
+        # Nullable columns can't be compared, those models page on id alone
+        return self.cursor_field or _model_field(model, CURSOR_FIELDS, allow_null=False)
+
+    def get_since_field(self, model):
+        return self.since_field or _model_field(model, MODIFIED_FIELDS)
+
+    def list_response(self, request, queryset, serializer_class, context=None):
+        """Serialize `queryset` honouring ?since=, ?limit=/?cursor= and ?fields="""
+        server_time = timezone.now()
+        try:
+            queryset = self.filter_since(request, queryset)
+            rows, next_cursor, paginated = self.paginate(request, queryset)
+        except InvalidListQuery as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = serializer_class(rows, many=True, context={'request': request, **(context or {})})
+        fields = request.query_params.get('fields')
+        if fields:
+            wanted = {name.strip() for name in fields.split(',') if name.strip()} | {'id'}
+            # Dropped fields are never computed, which matters for nested serializers
+            for name in set(serializer.child.fields) - wanted:
+                serializer.child.fields.pop(name)
+
+        data = {'results': serializer.data, 'next_cursor': next_cursor} if paginated else serializer.data
+        response = Response(data)
+        response['X-Server-Time'] = server_time.isoformat()
+        return response
+
+    def filter_since(self, request, queryset):
+        since = request.query_params.get('since')
+        if not since:
+            return queryset
+        field = self.get_since_field(queryset.model)
+        if field is None:
+            raise InvalidListQuery('since is not supported for this endpoint')
+        return queryset.filter(**{f'{field}__gt': _parse_datetime(since, 'since')})
+
+    def paginate(self, request, queryset):
+        """Returns (rows, next_cursor, paginated)"""
+        limit = request.query_params.get('limit')
+        cursor = request.query_params.get('cursor')
+        if limit is None and cursor is None:
+            return queryset, None, False
+
+        try:
+            limit = min(int(limit), MAX_LIMIT) if limit is not None else MAX_LIMIT
+        except ValueError:
+            raise InvalidListQuery('limit must be an integer')
+        if limit < 1:
+            raise InvalidListQuery('limit must be positive')
+
+        field = self.get_cursor_field(queryset.model)
+        ordering = [field, 'pk'] if field else ['pk']
+        queryset = queryset.order_by(*ordering)
+
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != len(ordering):
+                raise InvalidListQuery('Invalid cursor')
+            if field:
+                after = _parse_datetime(values[0], 'cursor')
+            try:
+                if field:
+                    queryset = queryset.filter(Q(**{f'{field}__gt': after}) | Q(**{field: after, 'pk__gt': values[1]}))
+                else:
+                    queryset = queryset.filter(pk__gt=values[0])
+            except (ValidationError, ValueError, TypeError):
+                # A pk that doesn't fit the field (not a UUID, not a number)
+                raise InvalidListQuery('Invalid cursor')
+
+        # One extra row tells whether there is a next page without a COUNT
+        rows = list(queryset[:limit + 1])
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor([getattr(last, name) for name in ordering])
+        return rows, next_cursor, True
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from uuid import uuid4
@@ -34,6 +35,12 @@ class Coordinate(models.Model):
     def __str__(self):
         return f"({self.lat}, {self.lng})"
 
+    class Meta:
+        indexes = [
+            # Bounding-box prefilter of nearest-truck lookups (spatial.nearest_trucks_db)
+            models.Index(fields=['lat', 'lng'], name='coordinate_lat_lng_idx'),
+        ]
+
 
 class Region(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -97,7 +104,11 @@ class WasteBin(models.Model):
     camera_url = models.URLField(blank=True, null=True)
     google_maps_url = models.URLField(blank=True, null=True)
     fill_level = models.IntegerField(default=0)
-    fill_rate = models.FloatField(default=1.5)
+    fill_rate = models.FloatField(default=1.5)  # percent per day, learned by fill_history.observe()
+    # Fill-rate estimator state: the baseline observation and the number of rate samples so far
+    fill_observed_level = models.PositiveSmallIntegerField(null=True, blank=True)
+    fill_observed_at = models.DateTimeField(null=True, blank=True)
+    fill_rate_samples = models.PositiveIntegerField(default=0)
     last_analysis = models.CharField(max_length=200, default='Yangi qo\'shildi')
     image_url = models.URLField(blank=True, null=True)
     image_source = models.CharField(max_length=20, default='CCTV')
@@ -105,11 +116,121 @@ class WasteBin(models.Model):
     device_health = models.JSONField(default=dict)
     qr_code_url = models.URLField(blank=True, null=True)
     image = models.ImageField(upload_to='waste_bin_images/', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # ?since= polling on list endpoints
+    
+    class Meta:
+        indexes = [
+            # Per-hudud listings and counts
+            models.Index(fields=['toza_hudud', 'is_full'], name='waste_bin_hudud_full_idx'),
+            # Full bins only (assignment, planning); partial because filter(is_full=True)
+            # compiles to a bare boolean term that SQLite can't match against an index column
+            models.Index(fields=['organization', 'toza_hudud'], condition=models.Q(is_full=True), name='waste_bin_full_idx'),
+        ]
+
+
+class WasteBinFillObservation(models.Model):
+    """
+    One observed fill level of a waste bin (append-only history)
+    """
+    SOURCE_CHOICES = [
+        ('CCTV', 'CCTV'),
+        ('BOT', 'Telegram bot'),
+        ('MANUAL', 'Manual'),
+        ('COLLECTION', 'Collection'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    waste_bin = models.ForeignKey(WasteBin, on_delete=models.CASCADE, related_name='fill_observations', db_index=False)
+    fill_level = models.PositiveSmallIntegerField()
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    observed_at = models.DateTimeField(db_index=True)  # Retention pruning
+
+    def __str__(self):
+        return f"{self.waste_bin_id} {self.fill_level}% ({self.source}) at {self.observed_at}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['waste_bin', 'observed_at'], name='fill_observation_bin_time_idx'),
+        ]
+
+
+class CameraFrameCache(models.Model):
+    """
+    Perceptual hash of the last analyzed camera frame of a bin and the AI result it produced
+    """
+    waste_bin = models.OneToOneField(WasteBin, on_delete=models.CASCADE, primary_key=True, related_name='frame_cache')
+    frame_hash = models.CharField(max_length=16)  # 64-bit dHash as hex
+    ai_result = models.JSONField(default=dict)
+    analyzed_at = models.DateTimeField()  # Last vision model call
+    checked_at = models.DateTimeField()  # Last frame seen, including cache hits
+    hits = models.PositiveIntegerField(default=0)
+    misses = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Frame cache for {self.waste_bin_id}"
+
+
+class CameraAnalysisJob(models.Model):
+    """
+    Queued AI analysis of a camera image, processed by the process_camera_jobs command
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    waste_bin = models.ForeignKey(WasteBin, on_delete=models.CASCADE, related_name='camera_jobs')
+    image_url = models.URLField(max_length=1000)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # A failed job is retried no earlier than this (exponential backoff)
+    not_before = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Camera job {self.id} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='camera_job_queue_idx'),
+        ]
+
+
+def normalize_device_id(device_id):
+    """Canonical form of a device_id ("esp-a4c416 " -> "ESP-A4C416")"""
+    return str(device_id).strip().upper()
+
+
+class DeviceIdField(models.CharField):
+    """
+    CharField that stores and looks up device ids in normalized form
+
+    Sensors post their ids in any case. Normalizing in the field covers
+    save(), bulk_create(), update() and filter() alike.
+    """
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if value is not None:
+            value = normalize_device_id(value)
+            setattr(model_instance, self.attname, value)
+        return value
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        return value if value is None else normalize_device_id(value)
 
 
 class IoTDevice(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    device_id = models.CharField(max_length=100, unique=True)  # ESP-A4C416
+    device_id = DeviceIdField(max_length=100, unique=True)  # ESP-A4C416
     device_type = models.CharField(max_length=50, choices=[('TEMPERATURE_SENSOR', 'Temperature Sensor'), ('HUMIDITY_SENSOR', 'Humidity Sensor'), ('BOTH', 'Temperature and Humidity Sensor')])
     room = models.ForeignKey('Room', on_delete=models.CASCADE, null=True, blank=True, related_name='iot_devices')
     boiler = models.ForeignKey('Boiler', on_delete=models.CASCADE, null=True, blank=True, related_name='iot_devices')
@@ -125,6 +246,100 @@ class IoTDevice(models.Model):
     
     def __str__(self):
         return f"{self.device_id} - {self.device_type}"
+    
+    normalize_device_id = staticmethod(normalize_device_id)
+    
+    class Meta:
+        constraints = [
+            # Case-insensitive uniqueness; also the index behind device_registry's Lower() lookup
+            models.UniqueConstraint(Lower('device_id'), name='iot_device_id_lower_unique'),
+        ]
+
+
+class SensorReading(models.Model):
+    """
+    Append-only history of IoT sensor readings, one row per device per timestamp
+    """
+    id = models.BigAutoField(primary_key=True)
+    # Indexed through the (device, timestamp) constraint below
+    device = models.ForeignKey(IoTDevice, on_delete=models.CASCADE, related_name='readings', db_index=False)
+    timestamp = models.DateTimeField()
+    temperature = models.FloatField(null=True, blank=True)
+    humidity = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.device_id} @ {self.timestamp}"
+
+    class Meta:
+        ordering = ['-timestamp']
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'timestamp'], name='sensor_reading_device_ts_uniq'),
+        ]
+        indexes = [
+            # Covering index: range scans per device never touch the table
+            models.Index(fields=['device', 'timestamp', 'temperature', 'humidity'], name='sensor_reading_covering_idx'),
+        ]
+
+
+class PendingSensorReading(models.Model):
+    """
+    Write-behind queue of accepted IoT readings, drained by the flush_iot_queue command
+    """
+    id = models.BigAutoField(primary_key=True)
+    # Registry-normalized device_id; (device_id, timestamp) makes enqueueing idempotent
+    device_id = models.CharField(max_length=100)
+    timestamp = models.DateTimeField()
+    temperature = models.FloatField(null=True, blank=True)
+    humidity = models.FloatField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.device_id} @ {self.timestamp} (queued)"
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['device_id', 'timestamp'], name='pending_reading_device_ts_uniq'),
+        ]
+
+
+class SensorRollup(models.Model):
+    """
+    Downsampled sensor aggregates (1 minute / 1 hour / 1 day buckets),
+    maintained incrementally as readings are recorded
+    """
+    RESOLUTION_CHOICES = [
+        ('1m', '1 minute'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    device = models.ForeignKey(IoTDevice, on_delete=models.CASCADE, related_name='rollups', db_index=False)
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    sample_count = models.IntegerField(default=0)
+    temperature_count = models.IntegerField(default=0)
+    temperature_sum = models.FloatField(default=0)
+    temperature_min = models.FloatField(null=True, blank=True)
+    temperature_max = models.FloatField(null=True, blank=True)
+    humidity_count = models.IntegerField(default=0)
+    humidity_sum = models.FloatField(default=0)
+    humidity_min = models.FloatField(null=True, blank=True)
+    humidity_max = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.device_id} {self.resolution} @ {self.bucket_start}"
+
+    class Meta:
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'resolution', 'bucket_start'], name='sensor_rollup_bucket_uniq'),
+        ]
+        indexes = [
+            # Fleet-wide time window queries (climate statistics)
+            models.Index(fields=['resolution', 'bucket_start'], name='sensor_rollup_window_idx'),
+        ]
 
 
 class Truck(models.Model):
@@ -145,9 +360,16 @@ class Truck(models.Model):
     fuel_level = models.IntegerField(default=100)
     login = models.CharField(max_length=150)
     password = models.CharField(max_length=128)  # In production, use Django's password hashing
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # ?since= polling on list endpoints
     
     def __str__(self):
         return f"Truck {self.plate_number} - {self.driver_name}"
+    
+    class Meta:
+        indexes = [
+            # Trucks of a hudud, optionally by status (nearest idle truck, route planning)
+            models.Index(fields=['toza_hudud', 'status'], name='truck_hudud_status_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
@@ -243,6 +465,7 @@ class AirSensor(models.Model):
     pm25 = models.FloatField()
     co2 = models.FloatField()
     status = models.CharField(max_length=20, choices=MoistureSensor.SENSOR_STATUS_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # ?since= polling on list endpoints
 
     def __str__(self):
         return self.name
@@ -296,6 +519,11 @@ class EcoViolation(models.Model):
 
     def __str__(self):
         return f"Eco Violation at {self.location_name}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp'], name='eco_violation_time_idx'),
+        ]
 
 
 class ConstructionMission(models.Model):
@@ -415,9 +643,15 @@ class Bus(models.Model):
     driver_fatigue_level = models.CharField(max_length=20, choices=DRIVER_FATIGUE_CHOICES)
     next_stop = models.CharField(max_length=100)
     cctv_urls = models.JSONField()  # {"front": url, "driver": url, "cabin": url}
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # ?since= polling on list endpoints
 
     def __str__(self):
         return f"Bus {self.route_number} - {self.plate_number}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='bus_status_idx'),
+        ]
 
 
 class ResponsibleOrg(models.Model):
@@ -468,6 +702,11 @@ class CallRequest(models.Model):
 
     def __str__(self):
         return f"Call Request from {self.citizen_name}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'timestamp'], name='call_request_status_idx'),
+        ]
 
 
 class CallRequestTimeline(models.Model):
@@ -507,6 +746,12 @@ class Notification(models.Model):
 
     def __str__(self):
         return self.title
+    
+    class Meta:
+        indexes = [
+            # Unread notifications only (see WasteBin.Meta for why this is partial)
+            models.Index(fields=['user', 'timestamp'], condition=models.Q(read=False), name='notification_unread_idx'),
+        ]
 
 
 class ReportEntry(models.Model):
@@ -592,6 +837,12 @@ class WasteTask(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Status counts over a time window (dashboard counters) and open-task lookups
+            models.Index(fields=['status', 'created_at'], name='waste_task_status_time_idx'),
+            # Default ordering and the task list
+            models.Index(fields=['-created_at'], name='waste_task_created_idx'),
+        ]
 
 
 class RouteOptimization(models.Model):
@@ -752,6 +1003,10 @@ class WastePrediction(models.Model):
     
     class Meta:
         ordering = ['-prediction_date']
+        constraints = [
+            # Forecasts are upserted per bin and day (forecasting.upsert_predictions)
+            models.UniqueConstraint(fields=['waste_bin', 'prediction_date'], name='unique_prediction_per_bin_date'),
+        ]
 
 
 class MaintenanceSchedule(models.Model):
@@ -807,4 +1062,101 @@ class DriverPerformance(models.Model):
     
     class Meta:
         ordering = ['-date']
-        unique_together = ['truck', 'date']
\ No newline at end of file
+        unique_together = ['truck', 'date']
+
+class SchedulerLease(models.Model):
+    """
+    Named lease held by one scheduler process at a time (leader election and per-task overlap protection)
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    owner = models.CharField(max_length=200)
+    expires_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.name} -> {self.owner} (until {self.expires_at})"
+
+
+class ScheduledTaskRun(models.Model):
+    """
+    History of periodic task runs started by the run_scheduler command
+    """
+    STATUS_CHOICES = [
+        ('RUNNING', 'Running'),
+        ('SUCCESS', 'Success'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    task = models.CharField(max_length=100)
+    owner = models.CharField(max_length=200)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='RUNNING')
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    
+    def __str__(self):
+        return f"{self.task} @ {self.started_at} ({self.status})"
+    
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['task', '-started_at'], name='scheduled_run_task_idx'),
+        ]
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only log of map entity changes; the id is the sync version served by /api/sync/
+    """
+    ACTION_CHOICES = [
+        ('UPSERT', 'Upsert'),
+        ('DELETE', 'Delete'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=30)
+    object_id = models.CharField(max_length=64)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default='UPSERT')
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"#{self.id} {self.action} {self.entity} {self.object_id}"
+    
+    class Meta:
+        ordering = ['id']
+
+
+class DashboardCounters(models.Model):
+    """
+    Materialized counters behind the dashboard and statistics endpoints (see dashboard.py)
+    """
+    GLOBAL_SCOPE = 'all'
+    
+    # Organization id, or GLOBAL_SCOPE for superadmins
+    scope = models.CharField(max_length=64, primary_key=True)
+    total_bins = models.PositiveIntegerField(default=0)
+    full_bins = models.PositiveIntegerField(default=0)
+    average_fill_level = models.FloatField(default=0)
+    total_trucks = models.PositiveIntegerField(default=0)
+    busy_trucks = models.PositiveIntegerField(default=0)
+    # Tasks created in the last dashboard.TASK_WINDOW_DAYS days
+    tasks_total = models.PositiveIntegerField(default=0)
+    tasks_completed = models.PositiveIntegerField(default=0)
+    tasks_pending = models.PositiveIntegerField(default=0)
+    tasks_in_progress = models.PositiveIntegerField(default=0)
+    by_hudud = models.JSONField(default=dict)
+    # Climate counters are not organization-scoped
+    total_facilities = models.PositiveIntegerField(default=0)
+    total_rooms = models.PositiveIntegerField(default=0)
+    total_boilers = models.PositiveIntegerField(default=0)
+    average_temperature = models.FloatField(default=0)
+    average_humidity = models.FloatField(default=0)
+    critical_rooms = models.PositiveIntegerField(default=0)
+    warning_rooms = models.PositiveIntegerField(default=0)
+    optimal_rooms = models.PositiveIntegerField(default=0)
+    by_facility_type = models.JSONField(default=dict)
+    computed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Dashboard counters ({self.scope}) @ {self.computed_at}"
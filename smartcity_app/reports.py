@@ -0,0 +1,78 @@
+"""
+Energy report generation
+
+Used by the generate_energy_report endpoint and by the scheduler, which
+produces the daily report of every facility.
+"""
+from datetime import datetime, time as dt_time, timedelta
+
+from django.utils import timezone
+
+from .models import EnergyReport, Facility
+from .telemetry import facility_devices, rollup_summary
+
+REPORT_PERIOD_DAYS = {
+    'DAILY': 1,
+    'WEEKLY': 7,
+    'MONTHLY': 30,
+    'YEARLY': 365,
+}
+
+PRICE_PER_KWH = 500
+
+
+def report_period(report_type, end=None):
+    """(start, end) dates of a report ending on `end` (today by default)"""
+    end = end or timezone.localdate()
+    return end - timedelta(days=REPORT_PERIOD_DAYS.get(report_type, 365)), end
+
+
+def generate_energy_report(facility, report_type='MONTHLY', start=None, end=None):
+    """Create an EnergyReport for a facility over [start, end]"""
+    if start is None or end is None:
+        start, end = report_period(report_type)
+
+    # Calculate metrics (energy is still estimated from the facility's usage figure)
+    total_energy = facility.energy_usage * (end - start).days
+    total_cost = total_energy * PRICE_PER_KWH
+
+    # Climate averages come from the daily sensor rollups of the facility's devices
+    climate = rollup_summary(
+        '1d',
+        since=timezone.make_aware(datetime.combine(start, dt_time.min)),
+        until=timezone.make_aware(datetime.combine(end + timedelta(days=1), dt_time.min)),
+        devices=facility_devices(facility)
+    ) or {}
+    avg_temp = climate.get('average_temperature')
+    avg_humidity = climate.get('average_humidity')
+    if avg_temp is None:
+        avg_temp = 21.5  # No sensor history for this period
+    if avg_humidity is None:
+        avg_humidity = 50.0
+
+    return EnergyReport.objects.create(
+        facility=facility,
+        report_type=report_type,
+        start_date=start,
+        end_date=end,
+        total_energy_kwh=total_energy,
+        total_cost=total_cost,
+        average_temperature=avg_temp,
+        average_humidity=avg_humidity,
+        efficiency_score=facility.efficiency_score,
+        cost_savings=0,
+        recommendations="Kechki soatlarda haroratni 2 darajaga pasaytiring. Energiya tejash: ~15%"
+    )
+
+
+def generate_daily_reports():
+    """Daily report for every facility that doesn't have one for today yet; returns the count"""
+    start, end = report_period('DAILY')
+    done = set(
+        EnergyReport.objects.filter(report_type='DAILY', end_date=end).values_list('facility_id', flat=True)
+    )
+    created = 0
+    for facility in Facility.objects.exclude(id__in=done):
+        generate_energy_report(facility, 'DAILY', start, end)
+        created += 1
+    return created
@@ -0,0 +1,187 @@
+"""
+Fleet-wide daily route planning (`manage.py plan_routes`)
+
+For the planning date (tomorrow by default) every bin whose predicted fill
+level reaches the threshold and that has no open task is collected. The
+predicted level comes from that day's WastePrediction row, or from the
+fill_rate model (fill_level + fill_rate * days) for bins without one.
+
+The bins of each toza hudud are split across all its trucks that aren't
+OFFLINE and the routes are optimized with routing.py. Hududs are independent,
+so they are solved in parallel in a process pool; the workers only do
+numpy work (plus reading the distance cache) and hand the routes back. The
+parent writes every RouteOptimization and WasteTask in one transaction,
+skipping bins that got an open task while the routes were being solved.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import distance_cache, routing
+from .assignment import OPEN_TASK_STATUSES, distance_matrix, lock_trucks
+from .forecasting import FULL_THRESHOLD
+from .models import RouteOptimization, Truck, WasteBin, WastePrediction, WasteTask
+
+WORKERS = getattr(settings, 'ROUTE_PLANNING_WORKERS', None) or os.cpu_count() or 1
+
+
+def predicted_levels(bins, date, today=None):
+    """{bin id: predicted fill level on `date`} from WastePrediction, else the fill_rate model"""
+    today = today or timezone.localdate()
+    days = max((date - today).days, 0)
+    predicted = dict(
+        # Ordered oldest first, so the newest prediction of a bin wins
+        WastePrediction.objects.filter(prediction_date=date, waste_bin_id__in=[b['id'] for b in bins])
+        .order_by('created_at').values_list('waste_bin_id', 'predicted_fill_level')
+    )
+    return {
+        b['id']: predicted.get(b['id'], min(100, b['fill_level'] + b['fill_rate'] * days))
+        for b in bins
+    }
+
+
+def build_jobs(date, threshold=FULL_THRESHOLD, hududs=None, capacity=None, time_budget=routing.TIME_BUDGET):
+    """One job per toza hudud with bins to collect: plain data, so it can be sent to a worker process"""
+    bins = WasteBin.objects.exclude(tasks__status__in=OPEN_TASK_STATUSES)
+    trucks = Truck.objects.exclude(status='OFFLINE')
+    if hududs:
+        bins = bins.filter(toza_hudud__in=hududs)
+        trucks = trucks.filter(toza_hudud__in=hududs)
+    bins = list(bins.values('id', 'toza_hudud', 'fill_level', 'fill_rate', 'location__lat', 'location__lng').distinct())
+    levels = predicted_levels(bins, date)
+
+    trucks_by_hudud = {}
+    for truck in trucks.order_by('pk').values('id', 'toza_hudud', 'location__lat', 'location__lng'):
+        trucks_by_hudud.setdefault(truck['toza_hudud'], []).append(
+            {'id': str(truck['id']), 'lat': truck['location__lat'], 'lng': truck['location__lng']}
+        )
+    bins_by_hudud = {}
+    for b in bins:
+        level = levels[b['id']]
+        if level >= threshold:
+            bins_by_hudud.setdefault(b['toza_hudud'], []).append({
+                'id': str(b['id']), 'lat': b['location__lat'], 'lng': b['location__lng'], 'fill_level': int(level),
+            })
+
+    return [
+        {
+            'hudud': hudud,
+            'trucks': trucks_by_hudud.get(hudud, []),
+            'bins': hudud_bins,
+            'capacity': capacity,
+            'time_budget': time_budget,
+        }
+        for hudud, hudud_bins in sorted(bins_by_hudud.items())
+    ]
+
+
+def plan_hudud(job):
+    """Optimize the routes of one hudud (runs in a worker process)"""
+    started = time.perf_counter()
+    trucks, bins = job['trucks'], job['bins']
+    if not trucks:
+        return {'hudud': job['hudud'], 'routes': [], 'unserved': [b['id'] for b in bins],
+                'quality': routing.quality([]), 'elapsed_ms': 0.0, 'pid': os.getpid()}
+
+    plan = routing.plan_routes(
+        trucks, bins,
+        capacities=[job['capacity']] * len(trucks),
+        time_budget=job['time_budget'],
+        bin_distances=distance_cache.bin_distances(
+            job['hudud'], [b['id'] for b in bins], [b['lat'] for b in bins], [b['lng'] for b in bins]
+        ),
+    )
+    return {
+        'hudud': job['hudud'],
+        'routes': [
+            {'truck_id': truck['id'], 'start': truck, 'stops': [bins[i] for i in stops], 'distance': distance}
+            for truck, stops, distance in zip(trucks, plan.routes, plan.distances) if stops
+        ],
+        'unserved': [bins[i]['id'] for i in plan.unserved],
+        'quality': plan.quality(),
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+        'pid': os.getpid(),
+    }
+
+
+def _init_worker():
+    django.setup()  # No-op after fork; needed with the spawn start method
+
+
+def solve_all(jobs, workers=WORKERS):
+    """Results of plan_hudud for every job, in job order"""
+    if workers <= 1 or len(jobs) <= 1:
+        return [plan_hudud(job) for job in jobs]
+    # Forked children must not share the parent's database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_init_worker) as pool:
+        return list(pool.map(plan_hudud, jobs))
+
+
+def path_length(points):
+    """Length in km of the path through `points` (dicts with 'lat'/'lng'), in order"""
+    if len(points) < 2:
+        return 0.0
+    lat = [p['lat'] for p in points]
+    lng = [p['lng'] for p in points]
+    return float(np.diag(distance_matrix(lat[:-1], lng[:-1], lat[1:], lng[1:])).sum())
+
+
+def save_plans(results, date):
+    """
+    Bulk-create the routes and their tasks in one transaction; returns (routes, tasks, taken)
+
+    Planning reads the bins long before this runs, so a bin may have got an
+    open task meanwhile (auto_assign_task, batch assignment). Under the same
+    lock as assignment.py such bins are dropped from their routes (routes left
+    empty are not saved) and returned in `taken`.
+    """
+    now = timezone.now()
+    routes, tasks = [], []
+    planned = [route for result in results for route in result['routes']]
+    with transaction.atomic():
+        list(lock_trucks(Truck.objects.filter(pk__in={route['truck_id'] for route in planned})))
+        taken = {
+            str(pk) for pk in WasteTask.objects.filter(
+                waste_bin_id__in=[b['id'] for route in planned for b in route['stops']],
+                status__in=OPEN_TASK_STATUSES,
+            ).values_list('waste_bin_id', flat=True)
+        }
+        for route in planned:
+            stops = [b for b in route['stops'] if b['id'] not in taken]
+            if not stops:
+                continue
+            distance = route['distance'] if len(stops) == len(route['stops']) else path_length([route['start']] + stops)
+            estimated_time, fuel_estimate = routing.estimates(distance)
+            routes.append(RouteOptimization(
+                truck_id=route['truck_id'],
+                waypoints=[b['id'] for b in stops],
+                total_distance=round(distance, 2),
+                estimated_time=estimated_time,
+                fuel_estimate=round(fuel_estimate, 2),
+            ))
+            tasks += [
+                WasteTask(
+                    waste_bin_id=b['id'],
+                    assigned_truck_id=route['truck_id'],
+                    status='ASSIGNED',
+                    assigned_at=now,
+                    priority='HIGH' if b['fill_level'] > 90 else 'MEDIUM',
+                    notes=f'Route plan for {date.isoformat()} (stop {stop})',
+                )
+                for stop, b in enumerate(stops, start=1)
+            ]
+        RouteOptimization.objects.bulk_create(routes, batch_size=500)
+        WasteTask.objects.bulk_create(tasks, batch_size=500)
+    return routes, tasks, sorted(taken)
+
+
+def default_date():
+    return timezone.localdate() + timedelta(days=1)
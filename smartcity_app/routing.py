@@ -0,0 +1,287 @@
+"""
+Collection route optimizer behind /api/routes/optimize/
+
+Routes are open paths: a truck starts at its current position, visits its
+bins and the route ends at the last bin (the same as the previous greedy
+planner, so distances stay comparable).
+
+solve() works on a haversine distance matrix over the truck start points
+(nodes 0..T-1) and the bins (nodes T..T+B-1):
+
+  1. Priority: when the bins' load (fill_level / 100, in full-bin
+     equivalents) exceeds the trucks' total capacity, the fullest bins are
+     served and the rest are reported as unserved.
+  2. Construction: parallel nearest neighbour - repeatedly extend the truck
+     whose route end is closest to an unvisited bin that still fits.
+  3. Improvement until no move helps or the time budget runs out:
+     2-opt (reverse a stretch of a route) and Or-opt (move a run of 1-3 bins,
+     in either direction, to another position in any route with room).
+     Both evaluate all candidate positions with one numpy expression.
+"""
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.conf import settings
+
+from .assignment import distance_matrix
+
+EPSILON = 1e-9
+MAX_SEGMENT = 3  # Or-opt moves runs of up to this many bins
+
+TIME_BUDGET = getattr(settings, 'ROUTE_OPTIMIZATION_TIME_BUDGET', 1.0)
+# Upper limit for a time_budget requested through the API
+MAX_TIME_BUDGET = getattr(settings, 'ROUTE_OPTIMIZATION_MAX_TIME_BUDGET', 10.0)
+AVG_SPEED_KMH = 30  # city driving
+FUEL_LITERS_PER_KM = 0.15
+
+
+def default_capacity():
+    capacity = getattr(settings, 'ROUTE_TRUCK_CAPACITY', None)
+    return float(capacity) if capacity else None
+
+
+@dataclass
+class RoutePlan:
+    routes: list  # per truck: bin indices (0-based into the bins passed to plan_routes) in visiting order
+    distances: list  # km per route
+    unserved: list  # bin indices left out for lack of capacity
+    construction_km: float = 0.0
+    two_opt_moves: int = 0
+    or_opt_moves: int = 0
+    timed_out: bool = False
+    compute_ms: float = 0.0
+    stats: dict = field(default_factory=dict)
+
+    @property
+    def total_km(self):
+        return sum(self.distances)
+
+    def quality(self):
+        return quality([self])
+
+
+def quality(plans):
+    """Solution quality and compute time of one or more plans (e.g. one per toza hudud)"""
+    total = sum(plan.total_km for plan in plans)
+    construction = sum(plan.construction_km for plan in plans)
+    report = {
+        'total_distance_km': round(total, 3),
+        'nearest_neighbour_km': round(construction, 3),
+        'improvement_pct': round((1 - total / construction) * 100, 2) if construction else 0.0,
+        'two_opt_moves': sum(plan.two_opt_moves for plan in plans),
+        'or_opt_moves': sum(plan.or_opt_moves for plan in plans),
+        'timed_out': any(plan.timed_out for plan in plans),
+        'compute_ms': round(sum(plan.compute_ms for plan in plans), 2),
+    }
+    for plan in plans:
+        for key, value in plan.stats.items():
+            report[key] = round(report.get(key, 0) + value, 2)
+    return report
+
+
+def route_length(dist, start, stops):
+    if not stops:
+        return 0.0
+    path = np.asarray([start] + stops)
+    return float(dist[path[:-1], path[1:]].sum())
+
+
+def select_bins(loads, capacities):
+    """Bins to serve (fullest first) when the load doesn't fit; capacities of None mean unlimited"""
+    order = sorted(range(len(loads)), key=lambda i: -loads[i])
+    if any(capacity is None for capacity in capacities):
+        return order, []
+    room = sum(capacities)
+    served, unserved = [], []
+    for i in order:
+        if loads[i] <= room + EPSILON:
+            served.append(i)
+            room -= loads[i]
+        else:
+            unserved.append(i)
+    return served, unserved
+
+
+def nearest_neighbour(dist, n_trucks, bins, loads, capacities):
+    """Parallel nearest-neighbour construction; returns (routes of node ids, bins that fit nowhere)"""
+    routes = [[] for _ in range(n_trucks)]
+    ends = np.arange(n_trucks)
+    room = np.array([np.inf if c is None else c for c in capacities], dtype=float)
+    unvisited = np.asarray(bins, dtype=int)
+    bin_loads = np.asarray([loads[node - n_trucks] for node in unvisited], dtype=float)
+
+    while len(unvisited):
+        options = dist[np.ix_(ends, unvisited)].copy()
+        options[bin_loads[None, :] > room[:, None] + EPSILON] = np.inf
+        truck, k = np.unravel_index(int(np.argmin(options)), options.shape)
+        if not np.isfinite(options[truck, k]):
+            break
+        node = int(unvisited[k])
+        routes[truck].append(node)
+        ends[truck] = node
+        room[truck] -= bin_loads[k]
+        unvisited = np.delete(unvisited, k)
+        bin_loads = np.delete(bin_loads, k)
+    return routes, [int(node) for node in unvisited]
+
+
+def two_opt(dist, start, stops, deadline):
+    """Reverse stretches of an open route while that shortens it; returns the number of moves"""
+    moves = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        path = np.asarray([start] + stops)
+        n = len(path) - 1  # index of the last stop
+        for i in range(1, n):
+            a, b = path[i - 1], path[i]
+            js = np.arange(i + 1, n + 1)
+            c = path[js]
+            delta = dist[a, c] - dist[a, b]
+            # The stretch i..j is reversed; the edge after j (if any) changes too
+            inner = js < n
+            after = path[js[inner] + 1]
+            delta[inner] += dist[b, after] - dist[c[inner], after]
+            k = int(np.argmin(delta))
+            if delta[k] < -EPSILON:
+                j = int(js[k])
+                path[i:j + 1] = path[i:j + 1][::-1].copy()
+                moves += 1
+                improved = True
+        stops[:] = [int(node) for node in path[1:]]
+    return moves
+
+
+def _insertion_costs(dist, path, first, last):
+    """Cost of inserting first..last after each node of `path` (the last position appends)"""
+    cost = dist[path, first].copy()
+    cost[:-1] += dist[last, path[1:]] - dist[path[:-1], path[1:]]
+    return cost
+
+
+def or_opt(dist, starts, routes, loads, capacities, n_trucks, deadline):
+    """
+    Move runs of 1..MAX_SEGMENT bins to their best position in any route
+    (reversed if that is shorter); returns the number of moves.
+    """
+    def load(route):
+        return sum(loads[node - n_trucks] for node in route)
+
+    def orientations(segment):
+        if len(segment) == 1:
+            return ((segment[0], segment[0], False),)
+        return ((segment[0], segment[-1], False), (segment[-1], segment[0], True))
+
+    moves = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for a, route in enumerate(routes):
+            i = 0
+            while i < len(route) and time.perf_counter() < deadline:
+                best = None
+                for length in range(1, min(MAX_SEGMENT, len(route) - i) + 1):
+                    segment = route[i:i + length]
+                    previous = starts[a] if i == 0 else route[i - 1]
+                    following = route[i + length] if i + length < len(route) else None
+                    gain = dist[previous, segment[0]]
+                    if following is not None:
+                        gain += dist[segment[-1], following] - dist[previous, following]
+                    segment_load = load(segment)
+
+                    for b, target in enumerate(routes):
+                        if b == a:
+                            target = route[:i] + route[i + length:]
+                        elif capacities[b] is not None and load(target) + segment_load > capacities[b] + EPSILON:
+                            continue
+                        path = np.asarray([starts[b]] + target)
+                        for first, last, reverse in orientations(segment):
+                            cost = _insertion_costs(dist, path, first, last)
+                            k = int(np.argmin(cost))
+                            delta = cost[k] - gain
+                            if delta < -EPSILON and (best is None or delta < best[0]):
+                                best = (delta, length, b, k, reverse)
+
+                if best is None:
+                    i += 1
+                    continue
+                _, length, b, k, reverse = best
+                segment = route[i:i + length]
+                del route[i:i + length]
+                if reverse:
+                    segment = segment[::-1]
+                routes[b][k:k] = segment  # k-th path node is start (0) or stop k-1: insert after it
+                moves += 1
+                improved = True
+    return moves
+
+
+def solve(dist, n_trucks, loads, capacities, time_budget=TIME_BUDGET):
+    """Optimize routes over a precomputed distance matrix (see module docstring)"""
+    started = time.perf_counter()
+    deadline = started + time_budget
+    starts = list(range(n_trucks))
+
+    served, unserved = select_bins(loads, capacities)
+    routes, stranded = nearest_neighbour(dist, n_trucks, [n_trucks + i for i in served], loads, capacities)
+    unserved += [node - n_trucks for node in stranded]
+    construction_km = sum(route_length(dist, starts[t], routes[t]) for t in range(n_trucks))
+
+    two_opt_moves = or_opt_moves = 0
+    while time.perf_counter() < deadline:
+        moved = sum(two_opt(dist, starts[t], routes[t], deadline) for t in range(n_trucks))
+        relocated = or_opt(dist, starts, routes, loads, capacities, n_trucks, deadline)
+        two_opt_moves += moved
+        or_opt_moves += relocated
+        if not moved and not relocated:
+            break
+    timed_out = time.perf_counter() >= deadline
+
+    return RoutePlan(
+        routes=[[node - n_trucks for node in route] for route in routes],
+        distances=[route_length(dist, starts[t], routes[t]) for t in range(n_trucks)],
+        unserved=sorted(unserved),
+        construction_km=construction_km,
+        two_opt_moves=two_opt_moves,
+        or_opt_moves=or_opt_moves,
+        timed_out=timed_out,
+        compute_ms=(time.perf_counter() - started) * 1000,
+    )
+
+
+def plan_routes(trucks, bins, capacities=None, time_budget=TIME_BUDGET, bin_distances=None):
+    """
+    Routes for `trucks` (dicts with 'lat'/'lng') over `bins` (dicts with
+    'lat'/'lng'/'fill_level'); capacities per truck in full-bin equivalents
+    (None: unlimited). `bin_distances` is an optional precomputed bin-to-bin
+    matrix (distance_cache.py); only the truck rows are computed then.
+    Returns a RoutePlan.
+    """
+    started = time.perf_counter()
+    if capacities is None:
+        capacities = [default_capacity()] * len(trucks)
+    points = list(trucks) + list(bins)
+    lat = [p['lat'] for p in points]
+    lng = [p['lng'] for p in points]
+    if bin_distances is None:
+        dist = distance_matrix(lat, lng, lat, lng)
+    else:
+        n_trucks = len(trucks)
+        truck_rows = distance_matrix(lat[:n_trucks], lng[:n_trucks], lat, lng)
+        dist = np.empty((len(points), len(points)))
+        dist[:n_trucks, :] = truck_rows
+        dist[:, :n_trucks] = truck_rows.T
+        dist[n_trucks:, n_trucks:] = bin_distances
+    matrix_ms = (time.perf_counter() - started) * 1000
+
+    loads = [max(b['fill_level'], 0) / 100 for b in bins]
+    plan = solve(dist, len(trucks), loads, capacities, time_budget)
+    plan.stats['matrix_ms'] = round(matrix_ms, 2)
+    plan.compute_ms += matrix_ms
+    return plan
+
+
+def estimates(distance_km):
+    """(estimated minutes, fuel liters) for a route length"""
+    return int((distance_km / AVG_SPEED_KMH) * 60), distance_km * FUEL_LITERS_PER_KM
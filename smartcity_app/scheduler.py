@@ -0,0 +1,202 @@
+"""
+Single-leader periodic task scheduler
+
+Run with `python manage.py run_scheduler` next to the web workers (any number
+of copies: only the holder of the 'scheduler' lease runs tasks). Leases are
+rows in SchedulerLease taken with conditional UPDATEs, so they work across
+processes and hosts sharing the database:
+
+  scheduler     - leader lease, renewed by a heartbeat thread
+  task:<name>   - held while a task runs, so a new leader can't start the
+                  same task while the previous leader is still finishing it
+
+Every run is recorded in ScheduledTaskRun with its duration and error.
+The next run of a task is due `interval` (plus random jitter) after the
+start of its last recorded run.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import SchedulerLease, ScheduledTaskRun
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE = 'scheduler'
+LEASE_TTL = getattr(settings, 'SCHEDULER_LEASE_TTL', 60)
+
+
+def _analyze_waste_bins():
+    call_command('analyze_waste_bins')
+
+
+def _refresh_predictions():
+    from .forecasting import refresh_predictions
+    refresh_predictions()
+
+
+def _generate_reports():
+    from .reports import generate_daily_reports
+    generate_daily_reports()
+
+
+def _prune_changelog():
+    from .sync import prune
+    prune()
+
+
+def _prune_fill_history():
+    from .fill_history import prune
+    prune()
+
+
+def _send_alerts():
+    from .alerts import send_pending_alerts
+    sent, failed = send_pending_alerts()
+    if sent or failed:
+        logger.info(f"📨 Alerts: {sent} sent, {failed} failed")
+
+
+class Task:
+    def __init__(self, name, func, interval, jitter=0):
+        self.name = name
+        self.func = func
+        self.interval = interval  # seconds
+        self.jitter = jitter  # seconds, added randomly to every interval
+
+
+TASKS = {
+    task.name: task for task in [
+        Task('analyze_waste_bins', _analyze_waste_bins,
+             getattr(settings, 'SCHEDULER_ANALYSIS_INTERVAL', 30 * 60), jitter=60),
+        Task('refresh_predictions', _refresh_predictions,
+             getattr(settings, 'SCHEDULER_PREDICTION_INTERVAL', 6 * 60 * 60), jitter=5 * 60),
+        Task('generate_reports', _generate_reports,
+             getattr(settings, 'SCHEDULER_REPORT_INTERVAL', 24 * 60 * 60), jitter=10 * 60),
+        Task('prune_changelog', _prune_changelog,
+             getattr(settings, 'SCHEDULER_SYNC_PRUNE_INTERVAL', 24 * 60 * 60), jitter=10 * 60),
+        Task('prune_fill_history', _prune_fill_history,
+             getattr(settings, 'SCHEDULER_FILL_HISTORY_PRUNE_INTERVAL', 24 * 60 * 60), jitter=10 * 60),
+        Task('send_alerts', _send_alerts, getattr(settings, 'SCHEDULER_ALERT_INTERVAL', 60)),
+    ]
+}
+
+
+def make_owner_id():
+    """Identifies this scheduler process in leases and run history"""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def acquire_lease(name, owner, ttl=LEASE_TTL):
+    """Take or renew a lease; returns True if `owner` holds it afterwards"""
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+    taken = SchedulerLease.objects.filter(
+        Q(expires_at__lt=now) | Q(owner=owner), name=name
+    ).update(owner=owner, expires_at=expires_at)
+    if taken:
+        return True
+    try:
+        with transaction.atomic():
+            SchedulerLease.objects.create(name=name, owner=owner, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        return False  # Someone else holds it
+
+
+def release_lease(name, owner):
+    SchedulerLease.objects.filter(name=name, owner=owner).delete()
+
+
+class Heartbeat:
+    """Renews a set of leases in a background thread while tasks run"""
+
+    def __init__(self, owner, ttl=LEASE_TTL):
+        self.owner = owner
+        self.ttl = ttl
+        self.leases = {LEADER_LEASE}
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='scheduler-heartbeat', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.ttl / 3):
+                for name in list(self.leases):
+                    if not acquire_lease(name, self.owner, self.ttl):
+                        logger.warning(f"⚠️ Scheduler lost lease {name}")
+                        self.lost.set()
+        finally:
+            connection.close()
+
+
+class Scheduler:
+    def __init__(self, tasks=None, owner=None, ttl=LEASE_TTL):
+        self.tasks = tasks or TASKS
+        self.owner = owner or make_owner_id()
+        self.ttl = ttl
+        self.next_run = {}
+
+    def load_schedule(self):
+        """Next due time of every task, from the run history"""
+        last_runs = dict(
+            ScheduledTaskRun.objects.filter(task__in=list(self.tasks))
+            .values('task').annotate(last=Max('started_at')).values_list('task', 'last')
+        )
+        now = timezone.now()
+        for name, task in self.tasks.items():
+            last = last_runs.get(name)
+            self.next_run[name] = self._after(last, task) if last else now
+
+    def _after(self, moment, task):
+        return moment + timedelta(seconds=task.interval + random.uniform(0, task.jitter))
+
+    def due_tasks(self):
+        now = timezone.now()
+        return [self.tasks[name] for name, due in sorted(self.next_run.items(), key=lambda item: item[1]) if due <= now]
+
+    def run_task(self, task, heartbeat=None):
+        """Run one task under its lease and record it; returns the ScheduledTaskRun (None if skipped)"""
+        lease = f'task:{task.name}'
+        if not acquire_lease(lease, self.owner, self.ttl):
+            logger.info(f"⏭️ {task.name} is still running elsewhere - skipping")
+            return None
+        if heartbeat:
+            heartbeat.leases.add(lease)
+
+        started = timezone.now()
+        run = ScheduledTaskRun.objects.create(task=task.name, owner=self.owner, started_at=started)
+        self.next_run[task.name] = self._after(started, task)
+        try:
+            task.func()
+            run.status = 'SUCCESS'
+        except Exception:
+            run.status = 'FAILED'
+            run.error = traceback.format_exc()[-4000:]
+            logger.error(f"❌ Scheduled task {task.name} failed", exc_info=True)
+        finally:
+            if heartbeat:
+                heartbeat.leases.discard(lease)
+            release_lease(lease, self.owner)
+            run.finished_at = timezone.now()
+            run.duration_seconds = (run.finished_at - started).total_seconds()
+            run.save(update_fields=['status', 'error', 'finished_at', 'duration_seconds'])
+        return run
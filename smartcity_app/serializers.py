@@ -7,7 +7,8 @@ from .models import (
     LightPole, Bus, ResponsibleOrg, CallRequest, CallRequestTimeline, 
     Notification, ReportEntry, UtilityNode, DeviceHealth, IoTDevice,
     WasteTask, RouteOptimization, AlertNotification, ClimateSchedule,
-    EnergyReport, WastePrediction, MaintenanceSchedule, DriverPerformance
+    EnergyReport, WastePrediction, MaintenanceSchedule, DriverPerformance,
+    CameraAnalysisJob
 )
 
 
@@ -47,8 +48,9 @@ class OrganizationSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         data = super().to_representation(instance)
         # Add the IDs as separate fields to match frontend expectations
-        data['regionId'] = str(instance.region.id) if instance.region else None
-        data['districtId'] = str(instance.district.id) if instance.district else None
+        # *_id avoids loading the region/district rows just for their keys
+        data['regionId'] = str(instance.region_id) if instance.region_id else None
+        data['districtId'] = str(instance.district_id) if instance.district_id else None
         return data
     
     def to_internal_value(self, data):
@@ -121,9 +123,15 @@ class OrganizationSerializer(serializers.ModelSerializer):
 
 
 class WasteBinSerializer(serializers.ModelSerializer):
+    """
+    Pass context={'lean': True} to embed the organization as its id only.
+    Otherwise each organization is serialized once per response and shared
+    by all of its bins; list querysets should select_related
+    ('location', 'organization__center').
+    """
     location = CoordinateSerializer(required=False)
     organization_id = serializers.CharField(write_only=True)
-    organization = OrganizationSerializer(read_only=True)
+    organization = serializers.SerializerMethodField()
 
     class Meta:
         model = WasteBin
@@ -135,6 +143,15 @@ class WasteBinSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['organization']
 
+    def get_organization(self, instance):
+        if self.context.get('lean'):
+            return str(instance.organization_id)
+        # The context is shared by every bin of a many=True serializer
+        cache = self.context.setdefault('_organizations', {})
+        if instance.organization_id not in cache:
+            cache[instance.organization_id] = OrganizationSerializer(instance.organization).data
+        return cache[instance.organization_id]
+
     def create(self, validated_data):
         # Extract location data and organization ID
         location_data = validated_data.pop('location')
@@ -686,6 +703,10 @@ class IoTDeviceSerializer(serializers.ModelSerializer):
         model = IoTDevice
         fields = '__all__'
     
+    def validate_device_id(self, value):
+        # Stored normalized (DeviceIdField); the unique validator's lookup is normalized the same way
+        return IoTDevice.normalize_device_id(value)
+    
     def create(self, validated_data):
         # Extract location data
         location_data = validated_data.pop('location')
@@ -815,4 +836,11 @@ class DriverPerformanceSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = DriverPerformance
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class CameraAnalysisJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CameraAnalysisJob
+        fields = ['id', 'waste_bin', 'image_url', 'status', 'attempts', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
@@ -3,11 +3,14 @@ Django signals for automatic operations on model save
 """
 import os
 import qrcode
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.backends.signals import connection_created
 from django.dispatch import receiver
 from django.conf import settings
 from django.db import transaction
-from .models import WasteBin
+from django.utils import timezone
+from .models import Bus, Coordinate, IoTDevice, Truck, WasteBin, WasteTask
+from . import device_registry, fill_history, sync
 
 
 @receiver(post_save, sender=WasteBin)
@@ -48,10 +51,85 @@ def generate_qr_code_on_create(sender, instance, created, raw, **kwargs):
         
         # Update the bin object with the QR code URL
         # Use update() to avoid triggering signal again
-        WasteBin.objects.filter(pk=instance.pk).update(qr_code_url=qr_url)
+        WasteBin.objects.filter(pk=instance.pk).update(qr_code_url=qr_url, updated_at=timezone.now())
+        sync.record(WasteBin, [instance.pk])
         
         print(f'✅ QR code auto-generated for waste bin {instance.id}')
         print(f'   QR URL: {qr_url}')
     
     # Execute after transaction commits to ensure DB consistency
     transaction.on_commit(create_qr_code)
+
+
+@receiver(post_save, sender=IoTDevice)
+@receiver(post_delete, sender=IoTDevice)
+def invalidate_device_registry(sender, instance, **kwargs):
+    """
+    Drop cached device lookups when an IoTDevice changes.
+
+    The whole registry is cleared because a renamed device_id would leave
+    its old key behind; telemetry writes use bulk_update and don't fire this.
+    """
+    device_registry.invalidate()
+
+
+def record_sync_upsert(sender, instance, **kwargs):
+    """Append the saved map entity to the /api/sync/ change log"""
+    sync.record(sender, [instance.pk])
+
+
+def record_sync_delete(sender, instance, **kwargs):
+    sync.record(sender, [instance.pk], action='DELETE')
+
+
+# Bulk writes (telemetry, camera analysis) record their changes themselves
+for tracked_model in sync.TRACKED:
+    post_save.connect(record_sync_upsert, sender=tracked_model, dispatch_uid=f'sync_upsert_{tracked_model.__name__}')
+    post_delete.connect(record_sync_delete, sender=tracked_model, dispatch_uid=f'sync_delete_{tracked_model.__name__}')
+
+
+@receiver(post_save, sender=Coordinate)
+def record_vehicle_move(sender, instance, created, **kwargs):
+    """
+    Trucks and buses move by saving their Coordinate, not themselves; log the
+    owner so /api/sync/, the event stream and the truck index see the move.
+    """
+    if created:
+        return  # A new coordinate belongs to an object that is about to be created
+    for model in (Truck, Bus):
+        owners = list(model.objects.filter(location_id=instance.pk).values_list('pk', flat=True))
+        if owners:
+            sync.record(model, owners)
+            return
+
+
+@receiver(connection_created)
+def configure_sqlite_journal(sender, connection, **kwargs):
+    """
+    Put SQLite into WAL mode so API reads aren't blocked while the IoT queue
+    flusher writes; writes are still serialized (one writer at a time)
+    """
+    journal_mode = getattr(settings, 'SQLITE_JOURNAL_MODE', None)
+    if connection.vendor != 'sqlite' or not journal_mode:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+        if journal_mode.upper() == 'WAL':
+            cursor.execute('PRAGMA synchronous=NORMAL')
+
+
+@receiver(pre_save, sender=WasteTask)
+def stamp_task_completion(sender, instance, raw, **kwargs):
+    """Set completed_at when a task is saved as COMPLETED for the first time"""
+    if raw or instance.status != 'COMPLETED' or instance.completed_at:
+        return
+    instance.completed_at = timezone.now()
+    instance._just_completed = True
+
+
+@receiver(post_save, sender=WasteTask)
+def record_collection(sender, instance, **kwargs):
+    """A completed task emptied its bin: start a new fill cycle in the bin's fill history"""
+    if getattr(instance, '_just_completed', False):
+        instance._just_completed = False
+        fill_history.record_by_id(instance.waste_bin_id, 0, 'COLLECTION', instance.completed_at)
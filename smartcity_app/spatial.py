@@ -0,0 +1,210 @@
+"""
+Nearest-truck lookups for task assignment
+
+TruckIndex keeps every truck's position in a uniform lat/lng grid
+(SPATIAL_GRID_CELL_KM cells) in process memory. k-nearest queries search
+rings of cells around the point and stop as soon as no unsearched ring can
+hold anything closer, so a lookup touches a handful of cells instead of
+every truck.
+
+The index follows truck changes through the sync change log (sync.py): every
+lookup reads the 'trucks' entries written since the last one (by any process)
+and reloads just those trucks. Truck saves are logged by the post_save
+receivers; position changes, which save the truck's Coordinate, are logged
+by the Coordinate receiver in signals.py. A full rebuild happens every
+SPATIAL_INDEX_REBUILD seconds as a safety net.
+
+nearest_trucks_db() is the database path (SPATIAL_INDEX_ENABLED=False): a
+bounding-box prefilter on Coordinate.lat/lng that grows until it has enough
+candidates.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+
+from . import sync
+from .models import ChangeLogEntry, Truck
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 111.32
+
+CELL_KM = getattr(settings, 'SPATIAL_GRID_CELL_KM', 1.0)
+REBUILD_INTERVAL = getattr(settings, 'SPATIAL_INDEX_REBUILD', 600)
+# Rings searched before giving up on finding k trucks nearby (then every cell is scanned)
+MAX_RINGS = getattr(settings, 'SPATIAL_MAX_RINGS', 50)
+
+TRUCK_FIELDS = ('id', 'status', 'toza_hudud', 'organization_id', 'location__lat', 'location__lng')
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _matches(truck, status, toza_hudud):
+    return (status is None or truck['status'] == status) and (toza_hudud is None or truck['toza_hudud'] == toza_hudud)
+
+
+class TruckIndex:
+    """Uniform-grid index of truck positions"""
+
+    def __init__(self, cell_km=CELL_KM):
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.cell_km = cell_km
+        self._lock = threading.Lock()
+        self._trucks = {}  # str(pk) -> row dict
+        self._cells = {}  # (row, col) -> set of str(pk)
+        self._version = None
+        self._built_at = 0.0
+
+    def _cell(self, lat, lng):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg))
+
+    def _remove(self, pk):
+        truck = self._trucks.pop(pk, None)
+        if truck is not None:
+            cell = self._cells.get(truck['cell'])
+            if cell is not None:
+                cell.discard(pk)
+                if not cell:
+                    del self._cells[truck['cell']]
+
+    def _put(self, row):
+        pk = str(row['id'])
+        self._remove(pk)
+        truck = {
+            'id': pk,
+            'status': row['status'],
+            'toza_hudud': row['toza_hudud'],
+            'organization_id': row['organization_id'],
+            'lat': row['location__lat'],
+            'lng': row['location__lng'],
+        }
+        truck['cell'] = self._cell(truck['lat'], truck['lng'])
+        self._trucks[pk] = truck
+        self._cells.setdefault(truck['cell'], set()).add(pk)
+
+    def rebuild(self):
+        version = sync.current_version()  # Taken first: later changes are replayed on the next refresh
+        rows = list(Truck.objects.values(*TRUCK_FIELDS))
+        with self._lock:
+            self._trucks, self._cells = {}, {}
+            for row in rows:
+                self._put(row)
+            self._version = version
+            self._built_at = time.monotonic()
+
+    def refresh(self):
+        """Apply truck changes logged since the last refresh (one query when nothing changed)"""
+        if self._version is None or time.monotonic() - self._built_at > REBUILD_INTERVAL:
+            self.rebuild()
+            return
+        changes = list(
+            ChangeLogEntry.objects.filter(id__gt=self._version, entity=sync.TRACKED[Truck])
+            .values_list('id', 'object_id')
+        )
+        if not changes:
+            return
+        changed = {object_id for _, object_id in changes}
+        rows = {str(row['id']): row for row in Truck.objects.filter(pk__in=changed).values(*TRUCK_FIELDS)}
+        with self._lock:
+            for pk in changed:
+                if pk in rows:
+                    self._put(rows[pk])
+                else:
+                    self._remove(pk)
+            self._version = max(self._version, max(entry_id for entry_id, _ in changes))
+
+    def nearest(self, lat, lng, k=1, status='IDLE', toza_hudud=None):
+        """Up to k (distance_km, truck_id) pairs, closest first"""
+        with self._lock:
+            if not self._trucks:
+                return []
+            center_row, center_col = self._cell(lat, lng)
+            # Cells are narrower than cell_km away from the equator; 0.99 covers the
+            # difference between KM_PER_DEGREE and the haversine earth radius
+            ring_km = 0.99 * self.cell_km * max(math.cos(math.radians(min(abs(lat) + 1, 89))), 0.01)
+            found = []
+            for ring in range(MAX_RINGS + 1):
+                for cell in self._ring_cells(center_row, center_col, ring):
+                    for pk in self._cells.get(cell, ()):
+                        truck = self._trucks[pk]
+                        if _matches(truck, status, toza_hudud):
+                            found.append((haversine_km(lat, lng, truck['lat'], truck['lng']), pk))
+                found.sort()
+                # Anything outside this ring is at least ring * ring_km away
+                if len(found) >= k and found[k - 1][0] <= ring * ring_km:
+                    return found[:k]
+
+            # Sparse area: fall back to every matching truck
+            found = sorted(
+                (haversine_km(lat, lng, truck['lat'], truck['lng']), pk)
+                for pk, truck in self._trucks.items() if _matches(truck, status, toza_hudud)
+            )
+            return found[:k]
+
+    @staticmethod
+    def _ring_cells(row, col, ring):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
+
+
+def nearest_trucks_db(lat, lng, k=1, status='IDLE', toza_hudud=None, radius_km=2.0, max_radius_km=50.0):
+    """Database path: grow a lat/lng bounding box until it holds k trucks"""
+    trucks = Truck.objects.all()
+    if status is not None:
+        trucks = trucks.filter(status=status)
+    if toza_hudud is not None:
+        trucks = trucks.filter(toza_hudud=toza_hudud)
+
+    while True:
+        bounded = radius_km <= max_radius_km
+        candidates = trucks
+        if bounded:
+            dlat = radius_km / KM_PER_DEGREE
+            dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+            candidates = trucks.filter(
+                location__lat__range=(lat - dlat, lat + dlat), location__lng__range=(lng - dlng, lng + dlng)
+            )
+        found = sorted(
+            (haversine_km(lat, lng, row['location__lat'], row['location__lng']), str(row['id']))
+            for row in candidates.values('id', 'location__lat', 'location__lng')
+        )
+        # Only trucks inside the inscribed circle are guaranteed to be the nearest
+        within = [match for match in found if not bounded or match[0] <= radius_km]
+        if len(within) >= k or not bounded:
+            return within[:k]
+        radius_km *= 2
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_truck_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = TruckIndex()
+    return _index
+
+
+def nearest_trucks(lat, lng, k=1, status='IDLE', toza_hudud=None):
+    """k nearest trucks as (distance_km, truck_id) pairs, from the index or the database"""
+    if not getattr(settings, 'SPATIAL_INDEX_ENABLED', True):
+        return nearest_trucks_db(lat, lng, k, status, toza_hudud)
+    index = get_truck_index()
+    index.refresh()
+    return index.nearest(lat, lng, k, status, toza_hudud)
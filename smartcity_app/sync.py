@@ -0,0 +1,181 @@
+"""
+Change log behind the /api/sync/ delta endpoint
+
+Every save or delete of a map entity (bins, trucks, buses, IoT devices,
+rooms, boilers) appends a ChangeLogEntry: post_save/post_delete receivers in
+signals.py cover ordinary saves, and the bulk write paths (telemetry, camera
+analysis) call record() themselves because bulk_update and update() don't
+send signals.
+
+The entry id is a monotonic version. A client loads the full lists once,
+then polls /api/sync/?since=<version> and gets only the objects changed
+after that version: the rows to upsert and the ids to drop. Entries older
+than SYNC_CHANGELOG_RETENTION_DAYS are pruned by the scheduler; a client
+whose version is older than that is told to reset (reload the full lists).
+
+Inside a transaction, record() only collects the entries, one per object
+(the last action wins), and writes them when the transaction commits. So a
+telemetry batch that touches a room twice logs it once, and entries get
+their ids in commit order: a poller that has seen version N never misses
+an entry below N that was still uncommitted. Writes are serialized for
+this (SQLite has a single writer; PostgreSQL locks the table for the
+insert). An entry lost to a crash between the commit and its write only
+leaves the clients stale until their next full reload.
+
+The collection is per thread (Django connections are too) and is emptied
+when it is written. Entries recorded in a block that is rolled back stay in
+it and are written with the next commit; the payload is built from the
+current rows (an existing object is always sent as an upsert), so such an
+entry only makes clients refetch the object.
+"""
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Boiler, Bus, ChangeLogEntry, IoTDevice, Room, Truck, WasteBin
+from .serializers import (
+    BoilerSerializer, BusSerializer, IoTDeviceSerializer, RoomSerializer, TruckSerializer, WasteBinSerializer
+)
+
+MAX_CHANGES = getattr(settings, 'SYNC_MAX_CHANGES', 1000)
+RETENTION = timedelta(days=getattr(settings, 'SYNC_CHANGELOG_RETENTION_DAYS', 7))
+
+# model -> entity key used in the log and in the payload
+TRACKED = {
+    WasteBin: 'waste_bins',
+    Truck: 'trucks',
+    Bus: 'buses',
+    IoTDevice: 'iot_devices',
+    Room: 'rooms',
+    Boiler: 'boilers',
+}
+
+
+class _PendingEntries(threading.local):
+    """(entity, object_id) -> action collected in the transaction of this thread's connection"""
+
+    def __init__(self):
+        self.entries = {}
+
+
+_pending = _PendingEntries()
+
+
+def _querysets():
+    # Same related loading as the list views
+    return {
+        'waste_bins': (WasteBin.objects.select_related('location', 'organization__center'), WasteBinSerializer),
+        'trucks': (Truck.objects.select_related('location'), TruckSerializer),
+        'buses': (Bus.objects.select_related('location'), BusSerializer),
+        'iot_devices': (IoTDevice.objects.select_related('location', 'room', 'boiler'), IoTDeviceSerializer),
+        'rooms': (Room.objects.all(), RoomSerializer),
+        'boilers': (Boiler.objects.prefetch_related('connected_rooms', 'device_health'), BoilerSerializer),
+    }
+
+
+def _write(entries):
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Sequence values are handed out before commit; one writer at a time keeps them in commit order
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LOCK TABLE {connection.ops.quote_name(ChangeLogEntry._meta.db_table)} IN SHARE ROW EXCLUSIVE MODE'
+                )
+        ChangeLogEntry.objects.bulk_create([
+            ChangeLogEntry(entity=entity, object_id=object_id, action=action)
+            for (entity, object_id), action in entries.items()
+        ], batch_size=500)
+
+
+def _write_pending():
+    """on_commit callback: write the collected entries; the other callbacks of the commit find none left"""
+    entries, _pending.entries = _pending.entries, {}
+    if entries:
+        _write(entries)
+
+
+def record(model, pks, action='UPSERT'):
+    """Log a change of the given objects of a tracked model (at commit when in a transaction)"""
+    entity = TRACKED.get(model)
+    if entity is None or not pks:
+        return
+    entries = {(entity, str(pk)): action for pk in pks}
+    if connection.in_atomic_block:
+        _pending.entries.update(entries)
+        # Registered on every call: a callback registered in a block that was
+        # rolled back is dropped, the later ones still run at commit
+        transaction.on_commit(_write_pending)
+    else:
+        _write(entries)
+
+
+def current_version():
+    return ChangeLogEntry.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def is_stale(version):
+    """True if entries after `version` were pruned (or the version is from another database)"""
+    bounds = ChangeLogEntry.objects.aggregate(oldest=Min('id'), newest=Max('id'))
+    if bounds['newest'] is None:
+        return version != 0
+    return version < bounds['oldest'] - 1 or version > bounds['newest']
+
+
+def changes_since(version, limit=MAX_CHANGES):
+    """
+    Latest action per object among the first `limit` entries after `version`.
+
+    Returns (new_version, {entity: {object_id: action}}, has_more); an object
+    changed many times in the window is reported once.
+    """
+    entries = list(
+        ChangeLogEntry.objects.filter(id__gt=version).order_by('id')
+        .values_list('id', 'entity', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    changes = {}
+    for _, entity, object_id, action in entries:
+        changes.setdefault(entity, {})[object_id] = action
+    return (entries[-1][0] if entries else version), changes, has_more
+
+
+def sync_payload(version, request=None, org_id=None, lean=False, limit=MAX_CHANGES):
+    """Upserts and deletes after `version`, serialized with the list serializers"""
+    if is_stale(version):
+        return {'version': current_version(), 'reset': True, 'has_more': False, 'upserts': {}, 'deletes': {}}
+
+    new_version, changes, has_more = changes_since(version, limit)
+    querysets = _querysets()
+    upserts, deletes = {}, {}
+    for entity, actions in changes.items():
+        queryset, serializer_class = querysets[entity]
+        rows = list(queryset.filter(pk__in=list(actions)))
+        # Whatever no longer exists is a delete, whatever exists an upsert: an UPSERT entry may be
+        # followed by a DELETE past this page, a DELETE entry may come from a rolled back block
+        found = {str(row.pk) for row in rows}
+        deleted = [object_id for object_id in actions if object_id not in found]
+        if org_id and entity in ('waste_bins', 'trucks'):
+            rows = [row for row in rows if str(row.organization_id) == str(org_id)]
+        if rows:
+            upserts[entity] = serializer_class(
+                rows, many=True, context={'request': request, 'lean': lean}
+            ).data
+        if deleted:
+            deletes[entity] = deleted
+
+    return {'version': new_version, 'reset': False, 'has_more': has_more, 'upserts': upserts, 'deletes': deletes}
+
+
+def prune(retention=RETENTION):
+    """Delete entries older than `retention`; returns the number deleted"""
+    # The newest entry is always kept so the version never goes back to 0
+    deleted, _ = ChangeLogEntry.objects.filter(
+        changed_at__lt=timezone.now() - retention
+    ).exclude(id=current_version()).delete()
+    return deleted
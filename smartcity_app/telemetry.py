@@ -0,0 +1,405 @@
+"""
+IoT telemetry ingest helpers
+
+Shared by the sensor data endpoints in views.py. Readings are normalized,
+their devices are resolved through the in-process device registry and the
+resulting changes are written with bulk_update on only the columns that
+actually change.
+
+Every accepted reading is also appended to the SensorReading history and
+folded into the 1m/1h/1d SensorRollup buckets, so statistics can be read
+from aggregates instead of raw rows.
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import device_registry, sync
+from .models import IoTDevice, Room, Boiler, SensorReading, SensorRollup
+
+logger = logging.getLogger(__name__)
+
+# Hard limit for a single bulk request so one gateway can't lock the DB for long
+MAX_BULK_READINGS = getattr(settings, 'IOT_BULK_MAX_READINGS', 1000)
+
+# Devices without an RTC report uptime instead of wall clock time
+EARLIEST_VALID_TIMESTAMP = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+# Hourly buckets kept in Room.trend / Boiler.trend
+TREND_HOURS = 24
+
+ROLLUP_BUCKETS = {
+    '1m': lambda ts: ts.replace(second=0, microsecond=0),
+    '1h': lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    '1d': lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+
+class ReadingError(ValueError):
+    """Raised when a single sensor reading can't be accepted"""
+
+
+def parse_sensor_value(value, name):
+    """Convert a temperature/humidity value to float (None stays None)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ReadingError(f'{name} must be a number')
+    if not isinstance(value, (int, float)):
+        try:
+            value = float(value)
+        except (ValueError, TypeError):
+            raise ReadingError(f'{name} must be a number')
+    return value
+
+
+def _from_unix(seconds):
+    """Unix seconds to an aware datetime; out-of-range values (1e20, NaN, inf) are a ReadingError"""
+    try:
+        return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        raise ReadingError('timestamp is out of range')
+
+
+def parse_timestamp(value):
+    """
+    Parse a reading timestamp. ESP devices send unix seconds, gateways may
+    send ISO 8601 strings. Missing timestamps, and clocks that are clearly
+    wrong (uptime counters, future dates), fall back to server time.
+    """
+    now = timezone.now()
+    if value is None or value == '':
+        return now
+
+    parsed = None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        parsed = _from_unix(value)
+    elif isinstance(value, str):
+        try:
+            seconds = float(value)
+        except ValueError:
+            parsed = parse_datetime(value)
+            if parsed is not None and timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        else:
+            parsed = _from_unix(seconds)
+    if parsed is None:
+        raise ReadingError('timestamp must be unix seconds or an ISO 8601 datetime')
+
+    if parsed < EARLIEST_VALID_TIMESTAMP or parsed > now + MAX_CLOCK_SKEW:
+        return now
+    return parsed
+
+
+def normalize_reading(item):
+    """Validate one raw reading dict and return a normalized copy"""
+    if not isinstance(item, dict):
+        raise ReadingError('reading must be an object')
+
+    device_id = item.get('device_id')
+    if not device_id:
+        raise ReadingError('device_id is required')
+
+    temperature = parse_sensor_value(item.get('temperature'), 'temperature')
+    humidity = parse_sensor_value(item.get('humidity'), 'humidity')
+
+    # Same sanity ranges as the single-reading endpoint: warn, don't reject
+    if temperature is not None and (temperature < -50 or temperature > 100):
+        logger.warning(f"⚠️ Temperature out of normal range: {temperature}°C ({device_id})")
+    if humidity is not None and (humidity < 0 or humidity > 100):
+        logger.warning(f"⚠️ Humidity out of normal range: {humidity}% ({device_id})")
+
+    return {
+        'device_id': str(device_id),
+        'temperature': temperature,
+        'humidity': humidity,
+        'timestamp': parse_timestamp(item.get('timestamp')),
+    }
+
+
+def resolve_devices(device_ids):
+    """
+    Resolve many device_ids through the device registry.
+
+    Returns {requested_device_id: (pk, device_id, room_id, boiler_id)}.
+    Exact matches win over case-insensitive ones, like the single endpoint.
+    """
+    return device_registry.resolve_many(device_ids)
+
+
+def bulk_update_fields(model, rows, batch_size=500):
+    """
+    Write {pk: {field: value}} with bulk_update, touching only the given fields.
+
+    Rows are grouped by their field set so a reading that only carries a
+    temperature never overwrites the stored humidity.
+    """
+    groups = {}
+    for pk, values in rows.items():
+        groups.setdefault(tuple(sorted(values)), []).append(model(pk=pk, **values))
+
+    for fields, objs in groups.items():
+        model.objects.bulk_update(objs, list(fields), batch_size=batch_size)
+
+
+def apply_readings(readings, resolved):
+    """
+    Apply normalized readings to IoTDevice and the linked Room/Boiler.
+
+    `resolved` is the output of resolve_devices(). Readings are applied in
+    timestamp order so an older buffered reading never overwrites a newer one.
+    Returns a list of "Room <id>" / "Boiler <id>" labels that were updated.
+    """
+    now = timezone.now()
+    latest = {}
+    for reading in sorted(readings, key=lambda r: r['timestamp']):
+        pk, _, room_id, boiler_id = resolved[reading['device_id']]
+        state = latest.setdefault(pk, {'room_id': room_id, 'boiler_id': boiler_id})
+        if reading['temperature'] is not None:
+            state['temperature'] = reading['temperature']
+        if reading['humidity'] is not None:
+            state['humidity'] = reading['humidity']
+
+    device_rows, room_rows, boiler_rows = {}, {}, {}
+    for pk, state in latest.items():
+        device_values = {'last_seen': now, 'last_sensor_update': now}
+        target_values = {'last_updated': now}
+        if 'temperature' in state:
+            device_values['current_temperature'] = state['temperature']
+            target_values['temperature'] = state['temperature']
+        if 'humidity' in state:
+            device_values['current_humidity'] = state['humidity']
+            target_values['humidity'] = state['humidity']
+        device_rows[pk] = device_values
+
+        # A device updates its room if linked, otherwise its boiler
+        if state['room_id'] is not None:
+            room_rows[state['room_id']] = target_values
+        elif state['boiler_id'] is not None:
+            boiler_rows[state['boiler_id']] = target_values
+
+    with transaction.atomic():
+        bulk_update_fields(IoTDevice, device_rows)
+        bulk_update_fields(Room, room_rows)
+        bulk_update_fields(Boiler, boiler_rows)
+        for model, rows in ((IoTDevice, device_rows), (Room, room_rows), (Boiler, boiler_rows)):
+            sync.record(model, list(rows))
+
+    return [f"Room {pk}" for pk in room_rows] + [f"Boiler {pk}" for pk in boiler_rows]
+
+
+def record_readings(readings, resolved):
+    """
+    Append readings to the SensorReading history and update the rollups.
+
+    Inserts are batched; (device, timestamp) pairs that are already stored
+    are skipped, so retried uploads never double count in the rollups.
+    Concurrent batches for the same devices (the queue flusher and a direct
+    POST) are serialized by _lock_devices(), so the duplicate check, the
+    inserts and the rollup read-modify-write of one batch see everything an
+    earlier batch committed. Returns the number of new readings.
+    """
+    rows = {}
+    for reading in readings:
+        if reading['temperature'] is None and reading['humidity'] is None:
+            continue
+        pk = resolved[reading['device_id']][0]
+        rows[(pk, reading['timestamp'])] = reading
+    if not rows:
+        return 0
+
+    device_pks = {pk for pk, _ in rows}
+    with transaction.atomic():
+        live = _lock_devices(device_pks)
+        if live != device_pks:
+            # Deleted in another process after this one cached it: evict it and drop its readings
+            gone = device_pks - live
+            for device_id, row in resolved.items():
+                if row[0] in gone:
+                    device_registry.invalidate(device_id)
+            logger.warning(f"⚠️ Dropped readings of {len(gone)} deleted IoT devices")
+            rows = {key: reading for key, reading in rows.items() if key[0] in live}
+            if not rows:
+                return 0
+            device_pks = live
+        timestamps = [ts for _, ts in rows]
+        existing = set(
+            SensorReading.objects
+            .filter(device_id__in=device_pks, timestamp__gte=min(timestamps), timestamp__lte=max(timestamps))
+            .values_list('device_id', 'timestamp')
+        )
+        new_rows = {key: reading for key, reading in rows.items() if key not in existing}
+        if not new_rows:
+            return 0
+
+        SensorReading.objects.bulk_create([
+            SensorReading(device_id=pk, timestamp=ts, temperature=r['temperature'], humidity=r['humidity'])
+            for (pk, ts), r in new_rows.items()
+        ], batch_size=500)
+        _update_rollups(new_rows)
+        _refresh_trends({resolved[r['device_id']] for r in new_rows.values()})
+
+    return len(new_rows)
+
+
+def _lock_devices(device_pks):
+    """
+    Lock the devices of a batch until the end of the transaction; returns the pks that still exist
+
+    Rollup buckets belong to one device, so holding the device rows also
+    covers their rollups, including buckets that don't exist yet. The pks
+    come from the device registry, which other processes only invalidate
+    when its TTL expires, so a device may have been deleted meanwhile.
+    """
+    devices = IoTDevice.objects.filter(pk__in=device_pks).order_by('pk')
+    if connection.vendor == 'sqlite':
+        # No row locks: take the database write lock before reading (any UPDATE does, even
+        # one matching no rows), so a concurrent batch waits on the busy timeout instead
+        # of checking for duplicates against a snapshot that is about to be stale
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {connection.ops.quote_name(IoTDevice._meta.db_table)} SET id = id WHERE 0')
+    else:
+        devices = devices.select_for_update()
+    return set(devices.values_list('pk', flat=True))
+
+
+def _update_rollups(new_rows):
+    """Fold new readings into their 1m/1h/1d buckets (read-modify-write; the caller holds _lock_devices)"""
+    deltas = {}
+    for (pk, ts), reading in new_rows.items():
+        ts = ts.astimezone(dt_timezone.utc)
+        for resolution, bucket in ROLLUP_BUCKETS.items():
+            delta = deltas.setdefault((pk, resolution, bucket(ts)), SensorRollup(
+                device_id=pk, resolution=resolution, bucket_start=bucket(ts)
+            ))
+            _fold(delta, reading['temperature'], reading['humidity'])
+
+    buckets = Q()
+    for resolution in ROLLUP_BUCKETS:
+        starts = {key[2] for key in deltas if key[1] == resolution}
+        buckets |= Q(resolution=resolution, bucket_start__in=starts)
+    stored = {
+        (rollup.device_id, rollup.resolution, rollup.bucket_start): rollup
+        for rollup in SensorRollup.objects.filter(buckets, device_id__in={key[0] for key in deltas})
+    }
+
+    to_create, to_update = [], []
+    for key, delta in deltas.items():
+        rollup = stored.get(key)
+        if rollup is None:
+            to_create.append(delta)
+            continue
+        rollup.sample_count += delta.sample_count
+        for prefix in ('temperature', 'humidity'):
+            count = getattr(delta, f'{prefix}_count')
+            if not count:
+                continue
+            setattr(rollup, f'{prefix}_count', getattr(rollup, f'{prefix}_count') + count)
+            setattr(rollup, f'{prefix}_sum', getattr(rollup, f'{prefix}_sum') + getattr(delta, f'{prefix}_sum'))
+            setattr(rollup, f'{prefix}_min', _min(getattr(rollup, f'{prefix}_min'), getattr(delta, f'{prefix}_min')))
+            setattr(rollup, f'{prefix}_max', _max(getattr(rollup, f'{prefix}_max'), getattr(delta, f'{prefix}_max')))
+        to_update.append(rollup)
+
+    SensorRollup.objects.bulk_create(to_create, batch_size=500)
+    SensorRollup.objects.bulk_update(to_update, [
+        'sample_count',
+        'temperature_count', 'temperature_sum', 'temperature_min', 'temperature_max',
+        'humidity_count', 'humidity_sum', 'humidity_min', 'humidity_max',
+    ], batch_size=500)
+
+
+def _fold(rollup, temperature, humidity):
+    rollup.sample_count += 1
+    if temperature is not None:
+        rollup.temperature_count += 1
+        rollup.temperature_sum += temperature
+        rollup.temperature_min = _min(rollup.temperature_min, temperature)
+        rollup.temperature_max = _max(rollup.temperature_max, temperature)
+    if humidity is not None:
+        rollup.humidity_count += 1
+        rollup.humidity_sum += humidity
+        rollup.humidity_min = _min(rollup.humidity_min, humidity)
+        rollup.humidity_max = _max(rollup.humidity_max, humidity)
+
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _refresh_trends(entries):
+    """
+    Rebuild Room.trend / Boiler.trend (hourly average humidity) for the
+    rooms and boilers touched by a batch, from the 1h rollups of all their devices.
+    """
+    room_ids = {room_id for _, _, room_id, _ in entries if room_id is not None}
+    boiler_ids = {boiler_id for _, _, room_id, boiler_id in entries if room_id is None and boiler_id is not None}
+    since = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=TREND_HOURS - 1)
+
+    for model, link, ids in ((Room, 'device__room_id', room_ids), (Boiler, 'device__boiler_id', boiler_ids)):
+        if not ids:
+            continue
+        buckets = (
+            SensorRollup.objects
+            .filter(**{f'{link}__in': ids}, resolution='1h', bucket_start__gte=since, humidity_count__gt=0)
+            .values(link, 'bucket_start')
+            .annotate(total=Sum('humidity_sum'), count=Sum('humidity_count'))
+            .order_by(link, 'bucket_start')
+        )
+        trends = {}
+        for row in buckets:
+            trends.setdefault(row[link], []).append(round(row['total'] / row['count'], 1))
+        bulk_update_fields(model, {pk: {'trend': trend} for pk, trend in trends.items()})
+        sync.record(model, list(trends))
+
+
+def rollup_summary(resolution, since, until=None, devices=None):
+    """
+    Aggregate rollups in [since, until) into averages and extremes.
+
+    `devices` is an optional IoTDevice filter (Q object). Returns None when
+    no readings fall into the window.
+    """
+    rollups = SensorRollup.objects.filter(resolution=resolution, bucket_start__gte=since)
+    if until is not None:
+        rollups = rollups.filter(bucket_start__lt=until)
+    if devices is not None:
+        rollups = rollups.filter(device__in=IoTDevice.objects.filter(devices))
+
+    totals = rollups.aggregate(
+        samples=Sum('sample_count'),
+        temperature_sum=Sum('temperature_sum'), temperature_count=Sum('temperature_count'),
+        temperature_min=Min('temperature_min'), temperature_max=Max('temperature_max'),
+        humidity_sum=Sum('humidity_sum'), humidity_count=Sum('humidity_count'),
+        humidity_min=Min('humidity_min'), humidity_max=Max('humidity_max'),
+    )
+    if not totals['samples']:
+        return None
+
+    def average(prefix):
+        count = totals[f'{prefix}_count']
+        return round(totals[f'{prefix}_sum'] / count, 2) if count else None
+
+    return {
+        'samples': totals['samples'],
+        'average_temperature': average('temperature'),
+        'min_temperature': totals['temperature_min'],
+        'max_temperature': totals['temperature_max'],
+        'average_humidity': average('humidity'),
+        'min_humidity': totals['humidity_min'],
+        'max_humidity': totals['humidity_max'],
+    }
+
+
+def facility_devices(facility):
+    """IoTDevice filter for every sensor in a facility's rooms and boilers"""
+    return Q(room__facility=facility) | Q(boiler__facilities=facility)
@@ -0,0 +1,80 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .management.commands.explain_hot_queries import hot_queries, index_names, plan_indexes
+from .models import Coordinate, District, Organization, Region, WasteBin
+
+
+def create_organization():
+    center = Coordinate.objects.create(lat=40.38, lng=71.78)
+    region = Region.objects.create(name='Farg\'ona', center=center)
+    district = District.objects.create(name='Farg\'ona shahri', region=region, center=center)
+    return Organization.objects.create(
+        name='Toza Hudud', type='HOKIMIYAT', login='toza', password='x', region=region, district=district, center=center
+    )
+
+
+def create_bins(organization, count):
+    for i in range(count):
+        WasteBin.objects.create(
+            organization=organization,
+            address=f'Manzil {i}',
+            location=Coordinate.objects.create(lat=40.38 + i * 0.001, lng=71.78),
+            fill_level=i % 100,
+            is_full=i % 100 >= 80,
+            toza_hudud='1-sonli Toza Hudud',
+        )
+
+
+class WasteBinListQueryCountTests(TestCase):
+    """The waste bin list must not issue queries per bin (N+1)"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.organization = create_organization()
+
+    def list_bins(self):
+        response = self.client.get('/api/waste-bins/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_does_not_grow_with_bins(self):
+        create_bins(self.organization, 5)
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(len(self.list_bins()), 5)
+
+        create_bins(self.organization, 30)
+        with self.assertNumQueries(len(few)):
+            self.assertEqual(len(self.list_bins()), 35)
+
+
+class HotQueryPlanTests(TestCase):
+    """The hot filters of the list and dashboard endpoints are served by their indexes (migration 0021)"""
+
+    # Hot query label -> index it must use; the others are served by unique constraints
+    EXPECTED_INDEXES = {
+        'bins by hudud': 'waste_bin_hudud_full_idx',
+        'full bins of hudud': 'waste_bin_hudud_full_idx',
+        'full bins': 'waste_bin_full_idx',
+        'full bins of organization': 'waste_bin_full_idx',
+        'idle trucks of hudud': 'truck_hudud_status_idx',
+        'buses by status': 'bus_status_idx',
+        'call requests by status': 'call_request_status_idx',
+        'eco violations since': 'eco_violation_time_idx',
+        'unread notifications': 'notification_unread_idx',
+        'unread notifications of user': 'notification_unread_idx',
+        'tasks by status in window': 'waste_task_status_time_idx',
+        'recent tasks': 'waste_task_created_idx',
+    }
+
+    def test_hot_queries_use_their_indexes(self):
+        for label, queryset, columns in hot_queries():
+            with self.subTest(label):
+                plan = queryset.explain()
+                used = plan_indexes(plan)
+                if label in self.EXPECTED_INDEXES:
+                    self.assertIn(self.EXPECTED_INDEXES[label], used, plan)
+                else:
+                    self.assertTrue(used & index_names(queryset.model._meta.db_table, columns), plan)
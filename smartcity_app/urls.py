@@ -6,17 +6,25 @@ urlpatterns = [
     path('auth/login/', views.login_view, name='login'),
     path('auth/validate/', views.validate_token, name='validate_token'),
     
+    # Delta sync for map dashboards
+    path('sync/', views.sync_changes, name='sync-changes'),
+    path('events/stream/', views.event_stream, name='event-stream'),
+    
     # Waste Bin URLs
     path('waste-bins/', views.WasteBinListCreateView.as_view(), name='waste-bin-list-create'),
     path('waste-bins/<str:pk>/', views.WasteBinDetailView.as_view(), name='waste-bin-detail'),
     path('waste-bins/<str:pk>/update-image/', views.WasteBinImageUpdateView.as_view(), name='waste-bin-image-update'),
     path('waste-bins/<str:pk>/update-image-file/', views.WasteBinImageFileUpdateView.as_view(), name='waste-bin-image-file-update'),
     path('waste-bins/<str:pk>/update-camera-image/', views.update_bin_with_camera_image, name='waste-bin-camera-image-update'),
+    path('waste-bins/<str:pk>/analyze-camera-image/', views.analyze_camera_image_async, name='waste-bin-camera-image-analyze'),
+    path('waste-bins/camera-jobs/<uuid:job_id>/', views.camera_analysis_job_status, name='waste-bin-camera-job-status'),
     path('waste-bins/hudud/<str:toza_hudud>/', views.get_waste_bins_by_hudud, name='waste-bins-by-hudud'),
     
     # IoT Device endpoints
     path('iot-devices/', views.IoTDeviceListCreateView.as_view(), name='iot-device-list-create'),
     path('iot-devices/data/update/', views.update_iot_sensor_data, name='iot-device-data-update'),
+    path('iot-devices/data/bulk-update/', views.bulk_update_iot_sensor_data, name='iot-device-data-bulk-update'),
+    path('iot-devices/queue/stats/', views.iot_queue_stats, name='iot-queue-stats'),
     path('iot-devices/link-to-boiler/', views.link_iot_device_to_boiler, name='link-iot-device-to-boiler'),
     path('iot-devices/link-to-room/', views.link_iot_device_to_room, name='link-iot-device-to-room'),
     path('iot-devices/link-test/', views.iot_link_test, name='iot-link-test'),
@@ -137,14 +145,16 @@ urlpatterns = [
     
     # Waste Task Management
     path('waste-tasks/', views.WasteTaskListCreateView.as_view(), name='waste-task-list-create'),
-    path('waste-tasks/<str:pk>/', views.WasteTaskDetailView.as_view(), name='waste-task-detail'),
     path('waste-tasks/auto-assign/', views.auto_assign_task, name='auto-assign-task'),
+    path('waste-tasks/batch-assign/', views.batch_assign_tasks, name='batch-assign-tasks'),
+    path('waste-tasks/<str:pk>/', views.WasteTaskDetailView.as_view(), name='waste-task-detail'),
     
     # Route Optimization
     path('routes/optimize/', views.RouteOptimizationView.as_view(), name='route-optimization'),
     
     # Alert Notifications
     path('alerts/', views.AlertNotificationListCreateView.as_view(), name='alert-list-create'),
+    path('alerts/send/', views.send_alert_async, name='alert-send'),
     
     # Climate Schedules
     path('climate-schedules/', views.ClimateScheduleListCreateView.as_view(), name='climate-schedule-list-create'),
@@ -40,6 +40,9 @@ from .serializers import (
     ClimateScheduleSerializer, EnergyReportSerializer, WastePredictionSerializer,
     MaintenanceScheduleSerializer, DriverPerformanceSerializer
 )
+from . import dashboard, device_registry, fill_history
+from .mixins import ListQueryMixin
+import asyncio
 import json
 import uuid
 import requests
@@ -209,7 +212,7 @@ def validate_token(request):
 
 # Class-based views for all models
 @method_decorator(csrf_exempt, name='dispatch')
-class WasteBinListCreateView(APIView):
+class WasteBinListCreateView(ListQueryMixin, APIView):
     permission_classes = []  # Allow unauthenticated access for GET requests (frontend uses token)
     
     def get(self, request):
@@ -217,32 +220,15 @@ class WasteBinListCreateView(APIView):
             # Get the user's organization if available
             org_id = request.session.get('organization_id')
             
+            # WasteBin.id is the primary key, so the rows are unique without distinct()/dedup
+            bins = WasteBin.objects.select_related('location', 'organization__center')
             if org_id:
                 # For organization users, return only bins belonging to their organization
-                bins = WasteBin.objects.filter(organization_id=org_id).select_related('location', 'organization').distinct()
-            else:
-                # For superadmin, return all bins
-                bins = WasteBin.objects.all().select_related('location', 'organization').distinct()
-            
-            # CRITICAL: Remove duplicates by ID only
-            # Address-based deduplication is too aggressive and removes valid bins
-            # If there are truly duplicate bins in database, they should be cleaned using management command
-            unique_bins_by_id = {}
-            
-            for bin in bins:
-                # Deduplicate by ID (primary key) - always keep unique IDs
-                # If same ID appears multiple times, keep the last one (most recent)
-                unique_bins_by_id[bin.id] = bin
-            
-            # Convert back to list
-            unique_bins_list = list(unique_bins_by_id.values())
+                bins = bins.filter(organization_id=org_id)
             
-            # Log if duplicates were found
-            if len(bins) != len(unique_bins_list):
-                logger.warning(f"⚠️ Duplicate bins detected in database: {len(bins)} total, {len(unique_bins_list)} unique. Removed {len(bins) - len(unique_bins_list)} duplicates.")
-            
-            serializer = WasteBinSerializer(unique_bins_list, many=True, context={'request': request})
-            return Response(serializer.data)
+            # ?lean=1 embeds the organization as its id only
+            lean = request.query_params.get('lean') in ('1', 'true')
+            return self.list_response(request, bins, WasteBinSerializer, context={'lean': lean})
         except Exception as e:
             logger.error(f"❌ Error in WasteBinListCreateView.get: {str(e)}", exc_info=True)
             return Response({
@@ -371,6 +357,8 @@ class WasteBinDetailView(APIView):
         serializer = WasteBinSerializer(bin, data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save()
+            if 'fill_level' in request.data:
+                fill_history.record(bin, bin.fill_level, 'MANUAL')
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -386,6 +374,8 @@ class WasteBinDetailView(APIView):
         serializer = WasteBinSerializer(bin, data=request.data, context={'request': request}, partial=True)
         if serializer.is_valid():
             serializer.save()
+            if 'fill_level' in request.data:
+                fill_history.record(bin, bin.fill_level, 'MANUAL')
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -437,6 +427,8 @@ class WasteBinImageUpdateView(APIView):
                 setattr(bin, field, value)
         
         bin.save()
+        if 'fill_level' in update_data:
+            fill_history.record(bin, bin.fill_level, fill_history.source_for(bin.image_source))
         
         # Return the updated bin
         serializer = WasteBinSerializer(bin)
@@ -470,6 +462,8 @@ class WasteBinImageFileUpdateView(APIView):
                 bin.last_analysis = request.data['last_analysis']
             
             bin.save()
+            if 'fill_level' in request.data:
+                fill_history.record(bin, bin.fill_level, fill_history.source_for(bin.image_source))
             
             serializer = WasteBinSerializer(bin)
             return Response(serializer.data)
@@ -477,28 +471,19 @@ class WasteBinImageFileUpdateView(APIView):
             return Response({'error': 'No image file provided'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TruckListCreateView(APIView):
+class TruckListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         # Get the user's organization if available
         org_id = request.session.get('organization_id')
         
         if org_id:
             # For organization users, return only trucks belonging to their organization
-            trucks = Truck.objects.filter(organization_id=org_id).distinct()
+            trucks = Truck.objects.filter(organization_id=org_id)
         else:
             # For superadmin, return all trucks
-            trucks = Truck.objects.all().distinct()
-        
-        # Remove duplicates by ID
-        unique_trucks = {}
-        for truck in trucks:
-            if truck.id not in unique_trucks:
-                unique_trucks[truck.id] = truck
+            trucks = Truck.objects.all()
         
-        unique_trucks_list = list(unique_trucks.values())
-        
-        serializer = TruckSerializer(unique_trucks_list, many=True, context={'request': request})
-        return Response(serializer.data)
+        return self.list_response(request, trucks, TruckSerializer)
     
     def post(self, request):
         # Add organization context based on user session
@@ -553,11 +538,10 @@ class TruckDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RegionListCreateView(APIView):
+class RegionListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         regions = Region.objects.all()
-        serializer = RegionSerializer(regions, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, regions, RegionSerializer)
     
     def post(self, request):
         serializer = RegionSerializer(data=request.data)
@@ -587,11 +571,10 @@ class RegionDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class DistrictListCreateView(APIView):
+class DistrictListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         districts = District.objects.all()
-        serializer = DistrictSerializer(districts, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, districts, DistrictSerializer)
     
     def post(self, request):
         serializer = DistrictSerializer(data=request.data)
@@ -621,11 +604,10 @@ class DistrictDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class OrganizationListCreateView(APIView):
+class OrganizationListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         organizations = Organization.objects.all()
-        serializer = OrganizationSerializer(organizations, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, organizations, OrganizationSerializer)
     
     def post(self, request):
         serializer = OrganizationSerializer(data=request.data)
@@ -758,11 +740,10 @@ class OrganizationDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class MoistureSensorListCreateView(APIView):
+class MoistureSensorListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         sensors = MoistureSensor.objects.all()
-        serializer = MoistureSensorSerializer(sensors, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, sensors, MoistureSensorSerializer)
     
     def post(self, request):
         serializer = MoistureSensorSerializer(data=request.data)
@@ -792,20 +773,10 @@ class MoistureSensorDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RoomListCreateView(APIView):
+class RoomListCreateView(ListQueryMixin, APIView):
     def get(self, request):
-        rooms = Room.objects.all().distinct()
-        
-        # Remove duplicates by ID
-        unique_rooms = {}
-        for room in rooms:
-            if room.id not in unique_rooms:
-                unique_rooms[room.id] = room
-        
-        unique_rooms_list = list(unique_rooms.values())
-        
-        serializer = RoomSerializer(unique_rooms_list, many=True)
-        return Response(serializer.data)
+        rooms = Room.objects.all()
+        return self.list_response(request, rooms, RoomSerializer)
     
     def post(self, request):
         serializer = RoomSerializer(data=request.data)
@@ -835,20 +806,10 @@ class RoomDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class BoilerListCreateView(APIView):
+class BoilerListCreateView(ListQueryMixin, APIView):
     def get(self, request):
-        boilers = Boiler.objects.all().distinct()
-        
-        # Remove duplicates by ID
-        unique_boilers = {}
-        for boiler in boilers:
-            if boiler.id not in unique_boilers:
-                unique_boilers[boiler.id] = boiler
-        
-        unique_boilers_list = list(unique_boilers.values())
-        
-        serializer = BoilerSerializer(unique_boilers_list, many=True)
-        return Response(serializer.data)
+        boilers = Boiler.objects.all()
+        return self.list_response(request, boilers, BoilerSerializer)
     
     def post(self, request):
         serializer = BoilerSerializer(data=request.data)
@@ -878,23 +839,13 @@ class BoilerDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class FacilityListCreateView(APIView):
+class FacilityListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         from django.db.models import Prefetch
         # Prefetch boilers and their connected rooms for efficient querying
         boilers_prefetch = Prefetch('boilers', Boiler.objects.prefetch_related('connected_rooms', 'device_health'))
-        facilities = Facility.objects.prefetch_related(boilers_prefetch).all().distinct()
-        
-        # Remove duplicates by ID
-        unique_facilities = {}
-        for facility in facilities:
-            if facility.id not in unique_facilities:
-                unique_facilities[facility.id] = facility
-        
-        unique_facilities_list = list(unique_facilities.values())
-        
-        serializer = FacilitySerializer(unique_facilities_list, many=True)
-        return Response(serializer.data)
+        facilities = Facility.objects.prefetch_related(boilers_prefetch).all()
+        return self.list_response(request, facilities, FacilitySerializer)
     
     def post(self, request):
         serializer = FacilitySerializer(data=request.data)
@@ -927,14 +878,13 @@ class FacilityDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class AirSensorListCreateView(APIView):
+class AirSensorListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         # AirSensor model doesn't have organization field, so return all sensors
         # In the future, if organization support is needed, add organization ForeignKey to the model
         sensors = AirSensor.objects.all()
         
-        serializer = AirSensorSerializer(sensors, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, sensors, AirSensorSerializer)
     
     def post(self, request):
         # Add organization context based on user session
@@ -971,14 +921,13 @@ class AirSensorDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class SOSColumnListCreateView(APIView):
+class SOSColumnListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         # SOSColumn model doesn't have organization field, so return all columns
         # In the future, if organization support is needed, add organization ForeignKey to the model
         columns = SOSColumn.objects.all()
         
-        serializer = SOSColumnSerializer(columns, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, columns, SOSColumnSerializer)
     
     def post(self, request):
         # Add organization context based on user session
@@ -1015,14 +964,13 @@ class SOSColumnDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class EcoViolationListCreateView(APIView):
+class EcoViolationListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         # EcoViolation model doesn't have organization field, so return all violations
         # In the future, if organization support is needed, add organization ForeignKey to the model
         violations = EcoViolation.objects.all()
         
-        serializer = EcoViolationSerializer(violations, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, violations, EcoViolationSerializer)
     
     def post(self, request):
         # Add organization context based on user session
@@ -1059,14 +1007,13 @@ class EcoViolationDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ConstructionSiteListCreateView(APIView):
+class ConstructionSiteListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         # ConstructionSite model doesn't have organization field, so return all sites
         # In the future, if organization support is needed, add organization ForeignKey to the model
         sites = ConstructionSite.objects.all()
         
-        serializer = ConstructionSiteSerializer(sites, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, sites, ConstructionSiteSerializer)
     
     def post(self, request):
         # Add organization context based on user session
@@ -1103,14 +1050,13 @@ class ConstructionSiteDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class LightPoleListCreateView(APIView):
+class LightPoleListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         # LightPole model doesn't have organization field, so return all poles
         # In the future, if organization support is needed, add organization ForeignKey to the model
         poles = LightPole.objects.all()
         
-        serializer = LightPoleSerializer(poles, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, poles, LightPoleSerializer)
     
     def post(self, request):
         # Add organization context based on user session
@@ -1147,14 +1093,13 @@ class LightPoleDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class BusListCreateView(APIView):
+class BusListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         # Bus model doesn't have organization field, so return all buses
         # In the future, if organization support is needed, add organization ForeignKey to the model
         buses = Bus.objects.all()
         
-        serializer = BusSerializer(buses, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, buses, BusSerializer)
     
     def post(self, request):
         # Add organization context based on user session
@@ -1191,11 +1136,10 @@ class BusDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class CallRequestListCreateView(APIView):
+class CallRequestListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         requests = CallRequest.objects.all()
-        serializer = CallRequestSerializer(requests, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, requests, CallRequestSerializer)
     
     def post(self, request):
         serializer = CallRequestSerializer(data=request.data)
@@ -1233,7 +1177,7 @@ def get_waste_bins_by_hudud(request, toza_hudud):
     """
     Get waste bins by toza hudud
     """
-    bins = WasteBin.objects.filter(toza_hudud=toza_hudud)
+    bins = WasteBin.objects.filter(toza_hudud=toza_hudud).select_related('location', 'organization__center')
     serializer = WasteBinSerializer(bins, many=True)
     return Response(serializer.data)
 
@@ -1446,27 +1390,16 @@ def dashboard_stats(request):
     """
     Get dashboard statistics
     """
-    # Get the user's organization if available
-    org_id = request.session.get('organization_id')
-    
-    if org_id:
-        # For organization users, count only their entities
-        total_bins = WasteBin.objects.filter(organization_id=org_id).count()
-        active_bins = WasteBin.objects.filter(organization_id=org_id, is_full=False).count()
-        total_trucks = Truck.objects.filter(organization_id=org_id).count()
-        busy_trucks = Truck.objects.filter(organization_id=org_id, status='BUSY').count()
-    else:
-        # For superadmin, count all entities
-        total_bins = WasteBin.objects.count()
-        active_bins = WasteBin.objects.filter(is_full=False).count()
-        total_trucks = Truck.objects.count()
-        busy_trucks = Truck.objects.filter(status='BUSY').count()
+    # Counters of the user's organization, or of all entities for superadmin
+    counters = dashboard.get_counters(request.session.get('organization_id'))
+    total_bins = counters.total_bins
+    active_bins = total_bins - counters.full_bins
     
     return Response({
         'total_bins': total_bins,
         'active_bins': active_bins,
-        'total_trucks': total_trucks,
-        'busy_trucks': busy_trucks,
+        'total_trucks': counters.total_trucks,
+        'busy_trucks': counters.busy_trucks,
         'fill_rate': (total_bins - active_bins) / total_bins * 100 if total_bins > 0 else 0
     })
 
@@ -1491,11 +1424,10 @@ def get_user_organizations(request):
         return Response(serializer.data)
 
 
-class ConstructionMissionListCreateView(APIView):
+class ConstructionMissionListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         missions = ConstructionMission.objects.all()
-        serializer = ConstructionMissionSerializer(missions, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, missions, ConstructionMissionSerializer)
     
     def post(self, request):
         serializer = ConstructionMissionSerializer(data=request.data)
@@ -1525,11 +1457,10 @@ class ConstructionMissionDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class LightROIListCreateView(APIView):
+class LightROIListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         rois = LightROI.objects.all()
-        serializer = LightROISerializer(rois, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, rois, LightROISerializer)
     
     def post(self, request):
         serializer = LightROISerializer(data=request.data)
@@ -1559,11 +1490,10 @@ class LightROIDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ResponsibleOrgListCreateView(APIView):
+class ResponsibleOrgListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         orgs = ResponsibleOrg.objects.all()
-        serializer = ResponsibleOrgSerializer(orgs, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, orgs, ResponsibleOrgSerializer)
     
     def post(self, request):
         serializer = ResponsibleOrgSerializer(data=request.data)
@@ -1593,11 +1523,10 @@ class ResponsibleOrgDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class CallRequestTimelineListCreateView(APIView):
+class CallRequestTimelineListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         timelines = CallRequestTimeline.objects.all()
-        serializer = CallRequestTimelineSerializer(timelines, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, timelines, CallRequestTimelineSerializer)
     
     def post(self, request):
         serializer = CallRequestTimelineSerializer(data=request.data)
@@ -1627,11 +1556,10 @@ class CallRequestTimelineDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class NotificationListCreateView(APIView):
+class NotificationListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         notifications = Notification.objects.all()
-        serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, notifications, NotificationSerializer)
     
     def post(self, request):
         serializer = NotificationSerializer(data=request.data)
@@ -1661,11 +1589,10 @@ class NotificationDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ReportEntryListCreateView(APIView):
+class ReportEntryListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         entries = ReportEntry.objects.all()
-        serializer = ReportEntrySerializer(entries, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, entries, ReportEntrySerializer)
     
     def post(self, request):
         serializer = ReportEntrySerializer(data=request.data)
@@ -1695,14 +1622,13 @@ class ReportEntryDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class UtilityNodeListCreateView(APIView):
+class UtilityNodeListCreateView(ListQueryMixin, APIView):
     def get(self, request):
         # UtilityNode model doesn't have organization field, so return all nodes
         # In the future, if organization support is needed, add organization ForeignKey to the model
         nodes = UtilityNode.objects.all()
         
-        serializer = UtilityNodeSerializer(nodes, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, nodes, UtilityNodeSerializer)
     
     def post(self, request):
         # Add organization context based on user session
@@ -1743,7 +1669,11 @@ class UtilityNodeDetailView(APIView):
 @permission_classes([IsAuthenticated])
 def update_bin_with_camera_image(request, pk):
     """
-    API endpoint to update waste bin with camera image and AI analysis
+    API endpoint to update waste bin with a camera image.
+
+    The image reference is stored right away and the AI analysis is queued
+    as a CameraAnalysisJob (see camera_jobs.py); the response is 202 with the
+    job id, which can be polled at /api/waste-bins/camera-jobs/<job_id>/.
     """
     bin = get_object_or_404(WasteBin, pk=pk)
     
@@ -1757,180 +1687,45 @@ def update_bin_with_camera_image(request, pk):
     image_source = request.data.get('image_source', 'CCTV')
     last_analysis = request.data.get('last_analysis', f'Kamera tahlili {timezone.now().strftime("%Y-%m-%d %H:%M:%S")}')
     
-    if image_data:
-        # Update the bin with the new image and information
-        bin.image_url = image_data
-        bin.image_source = image_source
-        bin.last_analysis = last_analysis
-        
-        # For camera images, we'll update the fill level based on the image if possible
-        # In a real system, this would call an AI service to analyze the image
-        # For now, we'll keep the existing fill level and is_full status
-        # But we can enhance this to use AI analysis
-        try:
-            # Attempt to download and analyze the image with AI
-            import requests as req
-            import base64
-            from io import BytesIO
-            
-            # Download image from URL
-            response = req.get(image_data)
-            if response.status_code == 200:
-                # Convert image to base64 for AI analysis
-                image_bytes = BytesIO(response.content).read()
-                image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-                
-                # Call backend AI service to analyze the image
-                ai_result = analyze_bin_image_backend(image_base64)
-                
-                # Update bin status based on AI analysis
-                bin.fill_level = ai_result['fillLevel']
-                bin.is_full = ai_result['isFull']
-                
-                # Update last analysis with AI results
-                bin.last_analysis = f"AI tahlili: {ai_result['notes']}, IsFull: {ai_result['isFull']}, FillLevel: {ai_result['fillLevel']}%, Conf: {ai_result['confidence']}%"
-                
-        except Exception as e:
-            # If AI analysis fails, log the error but continue with existing values
-            print(f"AI analysis failed: {e}")
-            # Optionally, you could use a default analysis or keep the existing values
-            
-        bin.save()
+    if not image_data:
+        serializer = WasteBinSerializer(bin)
+        return Response(serializer.data)
+    
+    if not str(image_data).lower().startswith(('http://', 'https://')):
+        return Response({'error': 'image_url must be an http(s) URL'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Update the bin with the new image and information; fill level follows once the job ran
+    bin.image_url = image_data
+    bin.image_source = image_source
+    bin.last_analysis = last_analysis
+    bin.save(update_fields=['image_url', 'image_source', 'last_analysis', 'updated_at'])
+    
+    from .camera_jobs import enqueue
+    job = enqueue(bin, image_data)
     
     serializer = WasteBinSerializer(bin)
-    return Response(serializer.data)
+    return Response({
+        'job_id': str(job.id),
+        'status': job.status,
+        'status_url': f'/api/waste-bins/camera-jobs/{job.id}/',
+        'bin': serializer.data
+    }, status=status.HTTP_202_ACCEPTED)
 
-def analyze_bin_image_backend(base64_image):
-    """
-    Backend function to analyze waste bin image using Google AI API
-    """
-    import os
-    import requests
-    import json
-    
-    # Get API key from environment
-    api_key = os.getenv('GEMINI_API_KEY', 'YOUR_API_KEY_HERE')
-    if api_key == 'YOUR_API_KEY_HERE':
-        # CRITICAL: If no API key, return error instead of fake data
-        logger.error("❌ GEMINI_API_KEY not set - cannot perform REAL AI analysis")
-        return {
-            'isFull': False,
-            'fillLevel': 0,
-            'confidence': 0,
-            'notes': '❌ XATOLIK: GEMINI_API_KEY sozlanmagan. Real AI tahlil qilish uchun API kaliti kerak. Iltimos, GEMINI_API_KEY environment variable\'ni sozlang.'
-        }
-    
-    # Prepare the request to Google AI
-    ai_url = f'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro-vision:generateContent?key={api_key}'
-    
-    # Create detailed prompt for AI with enhanced analysis
-    prompt = '''Siz tajriboli atrof-muhitni kuzatuv tizimi ekspertisiz. Rasmni tahlil qiling va quyidagilarni aniqlang:
-    1. Rasmda chiqindi konteyneri bormi? Javob: HA yoki YO'Q.
-    2. Agar HA bo'lsa, konteyner to'la bo'limi? Javob: HA yoki YO'Q.
-    3. Agar HA bo'lsa, to'ldirish darajasini % (0-100) ko'rsating.
-    4. Rasm sifatini baholang (yaxshi, o'rtacha, yomon).
-
-    Javobni quyidagi JSON formatda bering:
-    {
-        "isFull": boolean,
-        "fillLevel": number (0 dan 100 gacha foiz),
-        "confidence": number (O'z qaroringga ishonch darajasi 0-100),
-        "notes": string (Qisqa izoh o'zbek tilida: Masalan "Konteyner toshib ketgan" yoki "Yarmi bo'sh")
-    }
-    '''
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def camera_analysis_job_status(request, job_id):
+    """Status (and result once done) of a queued camera analysis"""
+    from .models import CameraAnalysisJob
+    from .serializers import CameraAnalysisJobSerializer
     
-    ai_headers = {
-        'Content-Type': 'application/json',
-    }
+    job = get_object_or_404(CameraAnalysisJob.objects.select_related('waste_bin'), pk=job_id)
     
-    ai_payload = {
-        'contents': [{
-            'parts': [
-                {'text': prompt},
-                {
-                    'inlineData': {
-                        'mimeType': 'image/jpeg',
-                        'data': base64_image
-                    }
-                }
-            ]
-        }]
-    }
+    org_id = request.session.get('organization_id')
+    if org_id and str(job.waste_bin.organization_id) != org_id:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        response = requests.post(ai_url, headers=ai_headers, data=json.dumps(ai_payload))
-        
-        if response.status_code == 200:
-            result = response.json()
-            
-            # Extract the AI response
-            if 'candidates' in result and len(result['candidates']) > 0:
-                candidate = result['candidates'][0]
-                if 'content' in candidate and 'parts' in candidate['content']:
-                    content_parts = candidate['content']['parts']
-                    for part in content_parts:
-                        if 'text' in part:
-                            # Try to parse the JSON response
-                            text_content = part['text'].strip()
-                            
-                            # Remove any markdown code block markers
-                            if text_content.startswith('```'):
-                                # Find the JSON part in the response
-                                import re
-                                json_match = re.search(r'\{.*\}', text_content, re.DOTALL)
-                                if json_match:
-                                    text_content = json_match.group()
-                                else:
-                                    # If no JSON found, return default values
-                                    return {
-                                        'isFull': True,
-                                        'fillLevel': 80,
-                                        'confidence': 60,
-                                        'notes': 'Tahlil natijasini tahlil qilishda xatolik yuz berdi'
-                                    }
-                            
-                            try:
-                                ai_result = json.loads(text_content)
-                                return {
-                                    'isFull': ai_result.get('isFull', False),
-                                    'fillLevel': ai_result.get('fillLevel', 50),
-                                    'confidence': ai_result.get('confidence', 50),
-                                    'notes': ai_result.get('notes', 'AI tahlili tugadi')
-                                }
-                            except json.JSONDecodeError:
-                                # If JSON parsing fails, return default values
-                                return {
-                                    'isFull': True,
-                                    'fillLevel': 75,
-                                    'confidence': 50,
-                                    'notes': 'JSON javobini tahlil qilishda xatolik yuz berdi'
-                                }
-            
-            # If no candidates found, return default values
-            return {
-                'isFull': True,
-                'fillLevel': 70,
-                'confidence': 40,
-                'notes': 'AI javob topilmadi'
-            }
-        else:
-            # If API call fails, return default values
-            print(f"AI API request failed: {response.status_code}, {response.text}")
-            return {
-                'isFull': True,
-                'fillLevel': 60,
-                'confidence': 30,
-                'notes': f'AI tahlilida xatolik: {response.status_code}'
-            }
-    except Exception as e:
-        # If any error occurs, return default values
-        print(f"AI analysis error: {e}")
-        return {
-            'isFull': True,
-            'fillLevel': 50,
-            'confidence': 25,
-            'notes': f'AI tahlilida xatolik yuz berdi: {str(e)}'
-        }
+    return Response(CameraAnalysisJobSerializer(job).data)
 
 @csrf_exempt
 @api_view(['POST', 'OPTIONS'])
@@ -1944,92 +1739,71 @@ def update_iot_sensor_data(request):
         logger.info(f"📡 IoT sensor data received: {request.data}")
         logger.info(f"📡 Request from IP: {request.META.get('REMOTE_ADDR', 'Unknown')}")
         
+        from django.db import transaction
+        from .telemetry import ReadingError, normalize_reading, parse_timestamp, apply_readings, record_readings
+        
         device_id = request.data.get('device_id')
-        temperature = request.data.get('temperature')
-        humidity = request.data.get('humidity')
-        sleep_seconds = request.data.get('sleep_seconds', 2000)
         timestamp = request.data.get('timestamp', int(timezone.now().timestamp()))
         
         if not device_id:
             logger.error("❌ device_id is missing in request")
             return Response({'error': 'device_id is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Find the IoT device by device_id (case-insensitive search)
-        try:
-            # Try exact match first
-            try:
-                iot_device = IoTDevice.objects.get(device_id=device_id)
-            except IoTDevice.DoesNotExist:
-                # Try case-insensitive search
-                iot_device = IoTDevice.objects.filter(device_id__iexact=device_id).first()
-                if not iot_device:
-                    raise IoTDevice.DoesNotExist
-            
-            logger.info(f"✅ Found IoT device: {device_id} (actual: {iot_device.device_id})")
-        except IoTDevice.DoesNotExist:
+        # Resolve the device through the in-process registry (case-insensitive)
+        resolved = device_registry.resolve(device_id)
+        if resolved is None:
             logger.error(f"❌ Device with ID {device_id} not found in database")
-            # List available devices for debugging
-            available_devices = list(IoTDevice.objects.values_list('device_id', flat=True))
-            logger.info(f"📋 Available devices ({len(available_devices)} total): {available_devices}")
             return Response({
                 'error': f'Device with ID "{device_id}" not found',
-                'available_devices': available_devices,
                 'hint': 'Check device_id spelling and case sensitivity'
             }, status=status.HTTP_404_NOT_FOUND)
+        logger.info(f"✅ Found IoT device: {device_id} (actual: {resolved[1]})")
         
-        # Validate temperature and humidity ranges
-        if temperature is not None:
-            if not isinstance(temperature, (int, float)):
-                try:
-                    temperature = float(temperature)
-                except (ValueError, TypeError):
-                    logger.error(f"❌ Invalid temperature value: {temperature}")
-                    return Response({'error': 'temperature must be a number'}, status=status.HTTP_400_BAD_REQUEST)
-            # Temperature should be between -50 and 100 degrees Celsius
-            if temperature < -50 or temperature > 100:
-                logger.warning(f"⚠️ Temperature out of normal range: {temperature}°C")
-        
-        if humidity is not None:
-            if not isinstance(humidity, (int, float)):
-                try:
-                    humidity = float(humidity)
-                except (ValueError, TypeError):
-                    logger.error(f"❌ Invalid humidity value: {humidity}")
-                    return Response({'error': 'humidity must be a number'}, status=status.HTTP_400_BAD_REQUEST)
-            # Humidity should be between 0 and 100 percent
-            if humidity < 0 or humidity > 100:
-                logger.warning(f"⚠️ Humidity out of normal range: {humidity}%")
-        
-        # Update device's last seen time and sensor readings
-        iot_device.last_seen = timezone.now()
-        if temperature is not None:
-            iot_device.current_temperature = temperature
-        if humidity is not None:
-            iot_device.current_humidity = humidity
-        iot_device.last_sensor_update = timezone.now()
-        iot_device.save()
-        logger.info(f"✅ Updated IoT device {device_id}: temp={temperature}°C, humidity={humidity}%")
-        
-        # Update associated room or boiler if available
-        updated_entities = []
-        if iot_device.room:
-            if temperature is not None:
-                iot_device.room.temperature = temperature
-            if humidity is not None:
-                iot_device.room.humidity = humidity
-            iot_device.room.last_updated = timezone.now()
-            iot_device.room.save()
-            updated_entities.append(f"Room {iot_device.room.id}")
-            logger.info(f"✅ Updated room {iot_device.room.id}")
-        elif iot_device.boiler:
-            if temperature is not None:
-                iot_device.boiler.temperature = temperature
-            if humidity is not None:
-                iot_device.boiler.humidity = humidity
-            iot_device.boiler.last_updated = timezone.now()
-            iot_device.boiler.save()
-            updated_entities.append(f"Boiler {iot_device.boiler.id}")
-            logger.info(f"✅ Updated boiler {iot_device.boiler.id}")
+        # Validate temperature and humidity (out-of-range values only warn)
+        try:
+            reading = normalize_reading({
+                'device_id': device_id,
+                'temperature': request.data.get('temperature'),
+                'humidity': request.data.get('humidity'),
+            })
+        except ReadingError as e:
+            logger.error(f"❌ Invalid sensor value from {device_id}: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            reading['timestamp'] = parse_timestamp(request.data.get('timestamp'))
+        except ReadingError:
+            pass  # Unparseable device clock: keep server time
+        temperature = reading['temperature']
+        humidity = reading['humidity']
+        
+        # Accept-and-enqueue mode (IOT_INGEST_ASYNC or ?async=1): flush_iot_queue applies it later
+        async_mode = request.query_params.get('async', str(getattr(settings, 'IOT_INGEST_ASYNC', False)))
+        if async_mode.lower() in ('1', 'true', 'yes'):
+            from .ingest_queue import QueueFull, RETRY_AFTER, enqueue
+            try:
+                enqueue([reading])
+            except QueueFull as e:
+                logger.warning(f"⚠️ IoT queue full, rejecting reading from {device_id}")
+                response = Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+                response['Retry-After'] = str(RETRY_AFTER)
+                return response
+            return Response({
+                'message': 'Sensor data queued',
+                'device_id': device_id,
+                'temperature': temperature,
+                'humidity': humidity,
+                'timestamp': timestamp,
+                'queued': True
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        # Update the device and its linked room or boiler, then append to history
+        # One transaction, so the sync log gets one entry per touched object
+        # Keyed like the reading: normalize_reading() turns a numeric device_id into a string
+        with transaction.atomic():
+            updated_entities = apply_readings([reading], {reading['device_id']: resolved})
+            record_readings([reading], {reading['device_id']: resolved})
+        if updated_entities:
+            logger.info(f"✅ Updated IoT device {device_id} and {', '.join(updated_entities)}: temp={temperature}°C, humidity={humidity}%")
         else:
             logger.warning(f"⚠️ IoT device {device_id} is not linked to any room or boiler")
         
@@ -2047,6 +1821,264 @@ def update_iot_sensor_data(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@csrf_exempt
+@api_view(['POST', 'OPTIONS'])
+@permission_classes([])  # Allow unauthenticated access for IoT gateways
+def bulk_update_iot_sensor_data(request):
+    """
+    Batched variant of update_iot_sensor_data for gateways that buffer readings.
+
+    Accepts a JSON array (or {"readings": [...]}) of
+    {device_id, temperature, humidity, timestamp} objects. All devices are
+    resolved in one query and written with bulk_update; the response carries
+    a result for every item in the same order.
+    """
+    from django.db import transaction
+    from .telemetry import (
+        MAX_BULK_READINGS, ReadingError, normalize_reading, resolve_devices, apply_readings, record_readings
+    )
+
+    items = request.data
+    if isinstance(items, dict):
+        items = items.get('readings')
+    if not isinstance(items, list):
+        return Response({'error': 'Expected a list of readings'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > MAX_BULK_READINGS:
+        return Response({
+            'error': f'Too many readings in one request ({len(items)}), max is {MAX_BULK_READINGS}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, normalize_reading(item)))
+        except ReadingError as e:
+            device_id = item.get('device_id') if isinstance(item, dict) else None
+            results[index] = {'index': index, 'device_id': device_id, 'status': 'invalid', 'error': str(e)}
+
+    try:
+        resolved = resolve_devices(reading['device_id'] for _, reading in valid)
+
+        accepted = []
+        for index, reading in valid:
+            if reading['device_id'] not in resolved:
+                results[index] = {
+                    'index': index,
+                    'device_id': reading['device_id'],
+                    'status': 'not_found',
+                    'error': f'Device with ID "{reading["device_id"]}" not found'
+                }
+                continue
+            accepted.append(reading)
+            results[index] = {'index': index, 'device_id': reading['device_id'], 'status': 'updated'}
+
+        with transaction.atomic():
+            updated_entities = apply_readings(accepted, resolved) if accepted else []
+            recorded = record_readings(accepted, resolved) if accepted else 0
+    except Exception as e:
+        logger.error(f"❌ Error in bulk IoT sensor update: {str(e)}", exc_info=True)
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    logger.info(f"✅ Bulk IoT update: {len(accepted)}/{len(items)} readings applied, {len(updated_entities)} rooms/boilers updated")
+    return Response({
+        'message': 'Bulk sensor data processed',
+        'received': len(items),
+        'updated': len(accepted),
+        'failed': len(items) - len(accepted),
+        'recorded': recorded,
+        'updated_entities': updated_entities,
+        'results': results
+    })
+
+
+@api_view(['GET'])
+def iot_queue_stats(request):
+    """Backlog and backpressure metrics of the IoT write-behind queue"""
+    from .ingest_queue import stats
+    return Response(stats())
+
+
+@api_view(['GET'])
+def sync_changes(request):
+    """
+    Map entities changed since a version: ?since=<version from the previous call>.
+
+    Returns {version, reset, has_more, upserts: {entity: [...]}, deletes: {entity: [ids]}}.
+    With reset=true the client reloads the full lists and continues from `version`.
+    """
+    from .sync import sync_payload
+    try:
+        version = int(request.query_params.get('since', 0))
+    except ValueError:
+        return Response({'error': 'since must be a version number'}, status=status.HTTP_400_BAD_REQUEST)
+    if version < 0:
+        return Response({'error': 'since must be a version number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    lean = request.query_params.get('lean') in ('1', 'true')
+    return Response(sync_payload(
+        version, request=request, org_id=request.session.get('organization_id'), lean=lean
+    ))
+
+
+def _request_auth(request):
+    """(authenticated, organization_id) from a token (header or ?token=, EventSource can't set headers) or the session"""
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    token_key = auth_header.split('Token ')[1] if auth_header.startswith('Token ') else request.GET.get('token')
+    org_id = request.session.get('organization_id')
+    if token_key:
+        return Token.objects.filter(key=token_key).exists(), org_id
+    return request.user.is_authenticated, org_id
+
+
+async def event_stream(request):
+    """
+    Server-Sent Events stream of live truck/bus/bin changes and IoT readings (ASGI only).
+
+    ?types=truck,bus,waste_bin,iot_reading (default: all) and ?organization=<id>;
+    organization users are always limited to their own organization.
+    """
+    from asgiref.sync import sync_to_async
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from . import events
+
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would pin a worker (and its event loop) for MAX_STREAM_SECONDS
+        return JsonResponse({'error': 'The event stream is only served by the ASGI application'}, status=501)
+
+    authenticated, org_id = await sync_to_async(_request_auth)(request)
+    if not authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    types = [t for t in request.GET.get('types', '').split(',') if t] or list(events.EVENT_TYPES)
+    unknown = set(types) - set(events.EVENT_TYPES)
+    if unknown:
+        return JsonResponse({'error': f"Unknown event types: {', '.join(sorted(unknown))}"}, status=400)
+
+    try:
+        subscription = events.get_broker().subscribe(types, org_id or request.GET.get('organization'))
+    except events.TooManySubscribers as e:
+        response = JsonResponse({'error': str(e)}, status=503)
+        response['Retry-After'] = '30'
+        return response
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + events.MAX_STREAM_SECONDS
+        try:
+            yield 'retry: 3000\n\n'
+            while loop.time() < deadline:
+                batch, dropped = await subscription.get(events.KEEPALIVE)
+                if dropped:
+                    yield events.format_sse('overflow', {'dropped': dropped, 'resync': '/api/sync/'})
+                for event in batch:
+                    yield events.format_sse(event['type'], event['data'], event['id'])
+                if not batch and not dropped:
+                    yield ': keepalive\n\n'
+        finally:
+            events.get_broker().unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
+
+
+# ==================== ASYNC VIEWS FOR I/O-BOUND ENDPOINTS (ASGI) ====================
+# These wait on external services without holding a worker; ORM access goes through sync_to_async.
+# (No csrf_exempt: it doesn't support async views in Django 4.2, and CsrfViewMiddleware is off.)
+
+def _json_body(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+
+
+async def analyze_camera_image_async(request, pk):
+    """
+    Download a bin's camera frame and analyze it right away (POST, optional {"image_url": ...}).
+
+    Returns the AI result once it is stored; the queued update-camera-image
+    endpoint remains the choice for sync workers.
+    """
+    import base64
+    import httpx
+    from asgiref.sync import sync_to_async
+    from . import async_http
+    from .camera_jobs import DOWNLOAD_TIMEOUT, MAX_IMAGE_BYTES, store_result
+    from .vision import VisionBackendUnavailable, VisionError, get_backend
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    authenticated, org_id = await sync_to_async(_request_auth)(request)
+    if not authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    bin = await WasteBin.objects.filter(pk=pk).only('id', 'organization_id', 'camera_url').afirst()
+    if bin is None:
+        return JsonResponse({'error': 'Waste bin not found'}, status=404)
+    if org_id and str(bin.organization_id) != org_id:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    image_url = data.get('image_url') or bin.camera_url
+    if not image_url or not str(image_url).lower().startswith(('http://', 'https://')):
+        return JsonResponse({'error': 'image_url must be an http(s) URL'}, status=400)
+
+    try:
+        content = await async_http.fetch_bytes(
+            image_url, MAX_IMAGE_BYTES,
+            timeout=httpx.Timeout(DOWNLOAD_TIMEOUT[1], connect=DOWNLOAD_TIMEOUT[0]),
+        )
+    except Exception as e:
+        return JsonResponse({'error': f'Image download failed: {e}'}, status=502)
+
+    try:
+        ai_result = await get_backend().analyze_async(base64.b64encode(content).decode('utf-8'))
+    except VisionBackendUnavailable as e:
+        response = JsonResponse({'error': str(e)}, status=503)
+        response['Retry-After'] = '30'
+        return response
+    except VisionError as e:
+        return JsonResponse({'error': str(e)}, status=502)
+
+    await sync_to_async(store_result)(bin.pk, ai_result)
+    return JsonResponse({'bin_id': str(bin.pk), 'image_url': image_url, 'result': ai_result})
+
+
+async def send_alert_async(request):
+    """Create an alert and deliver it over its channel without blocking a worker (POST)"""
+    from asgiref.sync import sync_to_async
+    from .alerts import send_alert
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    authenticated, _ = await sync_to_async(_request_auth)(request)
+    if not authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    def create():
+        serializer = AlertNotificationSerializer(data=data)
+        if not serializer.is_valid():
+            return None, serializer.errors
+        return serializer.save(), None
+
+    alert, errors = await sync_to_async(create)()
+    if errors:
+        return JsonResponse(errors, status=400)
+    await send_alert(alert)
+    payload = await sync_to_async(lambda: AlertNotificationSerializer(alert).data)()
+    return JsonResponse(payload, status=201)
+
+
 @csrf_exempt
 @api_view(['POST', 'OPTIONS'])
 @permission_classes([])  # Temporarily allow unauthenticated for diagnostic tests
@@ -2072,7 +2104,7 @@ def link_iot_device_to_boiler(request):
         
         # Find the IoT device and boiler
         try:
-            iot_device = IoTDevice.objects.get(device_id=device_id)
+            iot_device = IoTDevice.objects.get(device_id=IoTDevice.normalize_device_id(device_id))
         except IoTDevice.DoesNotExist:
             return Response({'error': f'Device with ID {device_id} not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -2085,6 +2117,7 @@ def link_iot_device_to_boiler(request):
         iot_device.boiler = boiler
         iot_device.room = None  # Clear room if previously linked
         iot_device.save()
+        device_registry.invalidate(iot_device.device_id)  # Cached room_id/boiler_id are stale now
         
         # Update boiler with current device readings if available
         if iot_device.current_temperature is not None:
@@ -2144,7 +2177,7 @@ def link_iot_device_to_room(request):
         
         # Find the IoT device and room
         try:
-            iot_device = IoTDevice.objects.get(device_id=device_id)
+            iot_device = IoTDevice.objects.get(device_id=IoTDevice.normalize_device_id(device_id))
         except IoTDevice.DoesNotExist:
             return Response({'error': f'Device with ID {device_id} not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -2157,6 +2190,7 @@ def link_iot_device_to_room(request):
         iot_device.room = room
         iot_device.boiler = None  # Clear boiler if previously linked
         iot_device.save()
+        device_registry.invalidate(iot_device.device_id)  # Cached boiler_id/room_id are stale now
         
         # Update room with current device readings if available
         if iot_device.current_temperature is not None:
@@ -2180,24 +2214,14 @@ def link_iot_device_to_room(request):
 
 # IoT Device Views
 @method_decorator(csrf_exempt, name='dispatch')
-class IoTDeviceListCreateView(APIView):
+class IoTDeviceListCreateView(ListQueryMixin, APIView):
     permission_classes = []  # Allow unauthenticated access for IoT devices
     
     def get(self, request):
         # IoTDevice model doesn't have organization field, so return all devices
         # IoT devices are linked to rooms or boilers which are linked to facilities
-        devices = IoTDevice.objects.select_related('location', 'room', 'boiler').all().distinct()
-        
-        # Remove duplicates by ID
-        unique_devices = {}
-        for device in devices:
-            if device.id not in unique_devices:
-                unique_devices[device.id] = device
-        
-        unique_devices_list = list(unique_devices.values())
-        
-        serializer = IoTDeviceSerializer(unique_devices_list, many=True, context={'request': request})
-        return Response(serializer.data)
+        devices = IoTDevice.objects.select_related('location', 'room', 'boiler').all()
+        return self.list_response(request, devices, IoTDeviceSerializer)
     
     def post(self, request):
         # Add organization context based on user session if needed
@@ -2242,7 +2266,7 @@ class IoTDeviceDetailView(APIView):
 
 # ==================== NEW VIEWS FOR ENHANCED FUNCTIONALITY ====================
 
-class WasteTaskListCreateView(APIView):
+class WasteTaskListCreateView(ListQueryMixin, APIView):
     """Waste collection task management"""
     def get(self, request):
         org_id = request.session.get('organization_id')
@@ -2250,8 +2274,7 @@ class WasteTaskListCreateView(APIView):
             tasks = WasteTask.objects.filter(waste_bin__organization_id=org_id)
         else:
             tasks = WasteTask.objects.all()
-        serializer = WasteTaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, tasks, WasteTaskSerializer)
     
     def post(self, request):
         serializer = WasteTaskSerializer(data=request.data)
@@ -2285,132 +2308,183 @@ class WasteTaskDetailView(APIView):
 @api_view(['POST'])
 def auto_assign_task(request):
     """Automatically assign task to nearest available truck"""
+    from django.db import transaction
+    from . import spatial, sync
+
     bin_id = request.data.get('bin_id')
     if not bin_id:
         return Response({'error': 'bin_id required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    waste_bin = get_object_or_404(WasteBin, pk=bin_id)
-    
-    # Find nearest idle truck in same toza hudud
-    from math import radians, sin, cos, sqrt, atan2
+    waste_bin = get_object_or_404(WasteBin.objects.select_related('location'), pk=bin_id)
     
-    def calculate_distance(lat1, lon1, lat2, lon2):
-        R = 6371  # Earth radius in km
-        dlat = radians(lat2 - lat1)
-        dlon = radians(lon2 - lon1)
-        a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        return R * c
-    
-    idle_trucks = Truck.objects.filter(
-        status='IDLE',
-        toza_hudud=waste_bin.toza_hudud
+    # Nearest idle trucks in the same toza hudud (spatial.py grid index)
+    candidates = spatial.nearest_trucks(
+        waste_bin.location.lat, waste_bin.location.lng,
+        k=5, status='IDLE', toza_hudud=waste_bin.toza_hudud
     )
     
-    if not idle_trucks.exists():
-        return Response({'error': 'No available trucks'}, status=status.HTTP_404_NOT_FOUND)
-    
-    # Find closest truck
-    closest_truck = None
-    min_distance = float('inf')
-    
-    for truck in idle_trucks:
-        distance = calculate_distance(
-            waste_bin.location.lat, waste_bin.location.lng,
-            truck.location.lat, truck.location.lng
+    # Claim the closest one still idle; a concurrent request may have taken it.
+    # Claim, sync entry and task commit together, so a failure never leaves
+    # a truck BUSY without its task
+    with transaction.atomic():
+        for distance, truck_id in candidates:
+            claimed = Truck.objects.filter(pk=truck_id, status='IDLE').update(status='BUSY', updated_at=timezone.now())
+            if claimed:
+                break
+        else:
+            return Response({'error': 'No available trucks'}, status=status.HTTP_404_NOT_FOUND)
+        sync.record(Truck, [truck_id])
+
+        task = WasteTask.objects.create(
+            waste_bin=waste_bin,
+            assigned_truck_id=truck_id,
+            status='ASSIGNED',
+            assigned_at=timezone.now(),
+            priority='HIGH' if waste_bin.fill_level > 90 else 'MEDIUM'
         )
-        if distance < min_distance:
-            min_distance = distance
-            closest_truck = truck
-    
-    # Create task
-    task = WasteTask.objects.create(
-        waste_bin=waste_bin,
-        assigned_truck=closest_truck,
-        status='ASSIGNED',
-        assigned_at=timezone.now(),
-        priority='HIGH' if waste_bin.fill_level > 90 else 'MEDIUM'
-    )
-    
-    # Update truck status
-    closest_truck.status = 'BUSY'
-    closest_truck.save()
     
     return Response({
         'task': WasteTaskSerializer(task).data,
-        'distance': round(min_distance, 2)
+        'distance': round(distance, 2)
     })
 
 
+@api_view(['POST'])
+def batch_assign_tasks(request):
+    """
+    Assign many bins to idle trucks at once (minimum total distance)
+
+    Body (all optional): bin_ids (default: every full bin without an open
+    task), method (auto/hungarian/greedy), capacity (bins per truck),
+    dry_run. See assignment.py.
+    """
+    from django.core.exceptions import ValidationError
+    from rest_framework import serializers
+    from . import assignment
+
+    bin_ids = request.data.get('bin_ids') or None
+    if bin_ids is not None and not isinstance(bin_ids, list):
+        return Response({'error': 'bin_ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # bool('false') is True; parse "false"/"0"/"no" (form data, query-style JSON) properly
+        dry_run = serializers.BooleanField().to_internal_value(request.data.get('dry_run', False))
+    except serializers.ValidationError:
+        return Response({'error': 'dry_run must be a boolean'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        capacity = int(request.data.get('capacity', assignment.DEFAULT_CAPACITY))
+        report = assignment.assign_bins(
+            bin_ids=bin_ids,
+            organization_id=request.session.get('organization_id'),
+            capacity=capacity,
+            method=request.data.get('method', 'auto'),
+            dry_run=dry_run,
+        )
+    except ValidationError as e:
+        # Malformed bin ids (not UUIDs) fail the lookup with Django's ValidationError
+        return Response({'error': ' '.join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except assignment.AssignmentConflict as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+    logger.info(
+        f"🚛 Batch assignment: {len(report['assigned'])} tasks, {len(report['unassigned_bin_ids'])} bins unassigned, "
+        f"{report['total_distance_km']} km total, solver {report['solver']} {report['solver_ms']} ms"
+    )
+    return Response(report)
+
+
 class RouteOptimizationView(APIView):
-    """Generate optimized route for truck"""
+    """
+    Generate optimized routes for one truck (truck_id) or several (truck_ids)
+
+    Optional: capacity (full-bin equivalents per truck), time_budget
+    (seconds). Bins are only routed to trucks of their toza hudud. See
+    routing.py for the algorithm.
+    """
     def post(self, request):
+        from . import distance_cache, routing
+
+        truck_ids = request.data.get('truck_ids') or []
         truck_id = request.data.get('truck_id')
         bin_ids = request.data.get('bin_ids', [])
         
-        if not truck_id:
+        if not truck_id and not truck_ids:
             return Response({'error': 'truck_id required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(truck_ids, list) or not isinstance(bin_ids, list):
+            return Response({'error': 'truck_ids and bin_ids must be lists'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            capacity = request.data.get('capacity')
+            capacity = float(capacity) if capacity is not None else routing.default_capacity()
+            time_budget = min(max(float(request.data.get('time_budget', routing.TIME_BUDGET)), 0.0), routing.MAX_TIME_BUDGET)
+        except (TypeError, ValueError):
+            return Response({'error': 'capacity and time_budget must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if truck_id:
+            trucks = [get_object_or_404(Truck.objects.select_related('location'), pk=truck_id)]
+        else:
+            trucks = list(Truck.objects.select_related('location').filter(pk__in=truck_ids).order_by('pk'))
+            if not trucks:
+                return Response({'error': 'No trucks found'}, status=status.HTTP_404_NOT_FOUND)
         
-        truck = get_object_or_404(Truck, pk=truck_id)
-        
-        # Simple greedy algorithm for route optimization
-        # In production, use Google Maps Directions API
-        from math import radians, sin, cos, sqrt, atan2
-        
-        def calculate_distance(lat1, lon1, lat2, lon2):
-            R = 6371
-            dlat = radians(lat2 - lat1)
-            dlon = radians(lon2 - lon1)
-            a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1-a))
-            return R * c
-        
-        bins = WasteBin.objects.filter(id__in=bin_ids, toza_hudud=truck.toza_hudud)
-        if not bins.exists():
+        bins = list(
+            WasteBin.objects.filter(id__in=bin_ids, toza_hudud__in={truck.toza_hudud for truck in trucks})
+            .values('id', 'toza_hudud', 'fill_level', 'location__lat', 'location__lng')
+        )
+        if not bins:
             return Response({'error': 'No bins found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Greedy nearest neighbor algorithm
-        unvisited = list(bins)
-        route = []
-        current_location = truck.location
-        total_distance = 0
-        
-        while unvisited:
-            nearest = None
-            min_dist = float('inf')
-            
-            for bin in unvisited:
-                dist = calculate_distance(
-                    current_location.lat, current_location.lng,
-                    bin.location.lat, bin.location.lng
-                )
-                if dist < min_dist:
-                    min_dist = dist
-                    nearest = bin
-            
-            route.append(str(nearest.id))
-            total_distance += min_dist
-            current_location = nearest.location
-            unvisited.remove(nearest)
-        
-        # Estimate time and fuel
-        avg_speed = 30  # km/h in city
-        estimated_time = int((total_distance / avg_speed) * 60)  # minutes
-        fuel_estimate = total_distance * 0.15  # liters (assuming 15L/100km)
-        
-        # Save route
-        route_opt = RouteOptimization.objects.create(
-            truck=truck,
-            waypoints=route,
-            total_distance=round(total_distance, 2),
-            estimated_time=estimated_time,
-            fuel_estimate=round(fuel_estimate, 2)
+        plans, unserved, routes = [], [], []
+        for hudud in sorted({truck.toza_hudud for truck in trucks}):
+            hudud_trucks = [truck for truck in trucks if truck.toza_hudud == hudud]
+            hudud_bins = [b for b in bins if b['toza_hudud'] == hudud]
+            if not hudud_bins:
+                continue
+            plan = routing.plan_routes(
+                [{'lat': truck.location.lat, 'lng': truck.location.lng} for truck in hudud_trucks],
+                [{'lat': b['location__lat'], 'lng': b['location__lng'], 'fill_level': b['fill_level']} for b in hudud_bins],
+                capacities=[capacity] * len(hudud_trucks),
+                time_budget=time_budget,
+                bin_distances=distance_cache.bin_distances(
+                    hudud,
+                    [b['id'] for b in hudud_bins],
+                    [b['location__lat'] for b in hudud_bins],
+                    [b['location__lng'] for b in hudud_bins],
+                ),
+            )
+            plans.append(plan)
+            unserved += [str(hudud_bins[i]['id']) for i in plan.unserved]
+            for truck, stops, distance in zip(hudud_trucks, plan.routes, plan.distances):
+                if not stops:
+                    continue
+                estimated_time, fuel_estimate = routing.estimates(distance)
+                routes.append(RouteOptimization(
+                    truck=truck,
+                    waypoints=[str(hudud_bins[i]['id']) for i in stops],
+                    total_distance=round(distance, 2),
+                    estimated_time=estimated_time,
+                    fuel_estimate=round(fuel_estimate, 2)
+                ))
+        
+        # Save routes
+        RouteOptimization.objects.bulk_create(routes)
+        optimization = routing.quality(plans)
+        logger.info(
+            f"🗺️ Routes for {len(trucks)} trucks / {len(bins)} bins: {optimization['total_distance_km']} km "
+            f"({optimization['improvement_pct']}% below nearest neighbour) in {optimization['compute_ms']} ms"
         )
         
-        return Response(RouteOptimizationSerializer(route_opt).data)
+        if truck_id:
+            data = RouteOptimizationSerializer(routes[0]).data if routes else {'waypoints': [], 'total_distance': 0}
+            return Response({**data, 'unserved_bin_ids': unserved, 'optimization': optimization})
+        return Response({
+            'routes': RouteOptimizationSerializer(routes, many=True).data,
+            'unserved_bin_ids': unserved,
+            'optimization': optimization,
+        })
 
 
-class AlertNotificationListCreateView(APIView):
+class AlertNotificationListCreateView(ListQueryMixin, APIView):
     """Alert notification management"""
     def get(self, request):
         org_id = request.session.get('organization_id')
@@ -2422,31 +2496,24 @@ class AlertNotificationListCreateView(APIView):
             )
         else:
             alerts = AlertNotification.objects.all()
-        serializer = AlertNotificationSerializer(alerts, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, alerts, AlertNotificationSerializer)
     
     def post(self, request):
         serializer = AlertNotificationSerializer(data=request.data)
         if serializer.is_valid():
-            alert = serializer.save()
-            
-            # Trigger actual notification sending (SMS/Telegram/Email)
-            # This would integrate with external services
-            # For now, just mark as sent
-            alert.is_sent = True
-            alert.sent_at = timezone.now()
-            alert.save()
-            
+            # Stored unsent: the scheduler's send_alerts task delivers it over its channel
+            # (SMS/Telegram/Email...), so the worker never waits on the upstream; the async
+            # /api/alerts/send/ delivers within the request instead
+            serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ClimateScheduleListCreateView(APIView):
+class ClimateScheduleListCreateView(ListQueryMixin, APIView):
     """Climate control schedules"""
     def get(self, request):
         schedules = ClimateSchedule.objects.all()
-        serializer = ClimateScheduleSerializer(schedules, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, schedules, ClimateScheduleSerializer)
     
     def post(self, request):
         serializer = ClimateScheduleSerializer(data=request.data)
@@ -2490,77 +2557,66 @@ def generate_energy_report(request):
     
     facility = get_object_or_404(Facility, pk=facility_id)
     
-    from datetime import datetime, timedelta
-    if not start_date or not end_date:
-        end = datetime.now().date()
-        if report_type == 'DAILY':
-            start = end - timedelta(days=1)
-        elif report_type == 'WEEKLY':
-            start = end - timedelta(days=7)
-        elif report_type == 'MONTHLY':
-            start = end - timedelta(days=30)
-        else:  # YEARLY
-            start = end - timedelta(days=365)
-    else:
+    from .reports import generate_energy_report as build_report
+    start = end = None
+    if start_date and end_date:
         from django.utils.dateparse import parse_date
         start = parse_date(start_date)
         end = parse_date(end_date)
-    
-    # Calculate metrics (simplified - in production, this would query actual sensor data)
-    total_energy = facility.energy_usage * (end - start).days
-    total_cost = total_energy * 500  # Price per kWh
-    avg_temp = 21.5  # Would come from sensor data
-    avg_humidity = 50.0
-    
-    report = EnergyReport.objects.create(
-        facility=facility,
-        report_type=report_type,
-        start_date=start,
-        end_date=end,
-        total_energy_kwh=total_energy,
-        total_cost=total_cost,
-        average_temperature=avg_temp,
-        average_humidity=avg_humidity,
-        efficiency_score=facility.efficiency_score,
-        cost_savings=0,
-        recommendations="Kechki soatlarda haroratni 2 darajaga pasaytiring. Energiya tejash: ~15%"
-    )
+    report = build_report(facility, report_type, start, end)
     
     return Response(EnergyReportSerializer(report).data)
 
 
 @api_view(['POST'])
 def generate_waste_prediction(request):
-    """Generate AI prediction for waste bin fill level"""
+    """
+    Generate AI prediction for waste bin fill level
+
+    bin_id returns that bin's predictions; bin_ids or all=true forecast many
+    bins in one pass and return a summary.
+    """
+    from django.core.exceptions import ValidationError
+    from .forecasting import MAX_DAYS_AHEAD, predict_bin, predict_bins
+    import time
+
     bin_id = request.data.get('bin_id')
-    days_ahead = request.data.get('days_ahead', 7)
+    bin_ids = request.data.get('bin_ids')
+    if bin_ids is not None and not isinstance(bin_ids, list):
+        return Response({'error': 'bin_ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        days_ahead = int(request.data.get('days_ahead', 7))
+    except (TypeError, ValueError):
+        return Response({'error': 'days_ahead must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days_ahead <= MAX_DAYS_AHEAD:
+        return Response({'error': f'days_ahead must be between 1 and {MAX_DAYS_AHEAD}'}, status=status.HTTP_400_BAD_REQUEST)
     
-    if not bin_id:
+    if not bin_id and not bin_ids and not request.data.get('all'):
         return Response({'error': 'bin_id required'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    waste_bin = get_object_or_404(WasteBin, pk=bin_id)
-    
-    # Simple linear prediction based on fill_rate
-    # In production, use ML model with historical data
-    from datetime import datetime, timedelta
-    predictions = []
-    
-    for day in range(1, days_ahead + 1):
-        prediction_date = (datetime.now() + timedelta(days=day)).date()
-        predicted_level = min(100, waste_bin.fill_level + (waste_bin.fill_rate * day))
-        
-        prediction = WastePrediction.objects.create(
-            waste_bin=waste_bin,
-            prediction_date=prediction_date,
-            predicted_fill_level=int(predicted_level),
-            confidence=85.0,
-            will_be_full=predicted_level >= 80,
-            recommended_collection_date=prediction_date if predicted_level >= 80 else None,
-            based_on_data_points=30
-        )
-        predictions.append(prediction)
-    
-    return Response(WastePredictionSerializer(predictions, many=True).data)
+    try:
+        if bin_id:
+            waste_bin = get_object_or_404(WasteBin, pk=bin_id)
+            predictions = predict_bin(waste_bin, days_ahead)
+            return Response(WastePredictionSerializer(predictions, many=True).data)
+
+        bins = WasteBin.objects.all()
+        if bin_ids:
+            bins = bins.filter(pk__in=bin_ids)
+        org_id = request.session.get('organization_id')
+        if org_id:
+            bins = bins.filter(organization_id=org_id)
+
+        started = time.perf_counter()
+        written = predict_bins(bins, days_ahead)
+    except ValidationError as e:
+        # Malformed bin ids (not UUIDs) fail the lookup with Django's ValidationError
+        return Response({'error': ' '.join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'predictions': written,
+        'bins': written // days_ahead,
+        'days_ahead': days_ahead,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    })
 
 
 @api_view(['GET'])
@@ -2600,76 +2656,48 @@ def get_driver_performance(request, truck_id):
 @api_view(['GET'])
 def get_waste_statistics(request):
     """Get comprehensive waste management statistics"""
-    org_id = request.session.get('organization_id')
-    
-    from datetime import datetime, timedelta
-    from django.db.models import Count, Avg, Sum
-    
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-    
-    if org_id:
-        bins = WasteBin.objects.filter(organization_id=org_id)
-        trucks = Truck.objects.filter(organization_id=org_id)
-        tasks = WasteTask.objects.filter(waste_bin__organization_id=org_id, created_at__gte=start_date)
-    else:
-        bins = WasteBin.objects.all()
-        trucks = Truck.objects.all()
-        tasks = WasteTask.objects.filter(created_at__gte=start_date)
+    counters = dashboard.get_counters(request.session.get('organization_id'))
     
     stats = {
-        'total_bins': bins.count(),
-        'full_bins': bins.filter(is_full=True).count(),
-        'average_fill_level': bins.aggregate(Avg('fill_level'))['fill_level__avg'] or 0,
-        'total_trucks': trucks.count(),
-        'active_trucks': trucks.filter(status='BUSY').count(),
-        'tasks_completed': tasks.filter(status='COMPLETED').count(),
-        'tasks_pending': tasks.filter(status='PENDING').count(),
-        'tasks_in_progress': tasks.filter(status='IN_PROGRESS').count(),
-        'collection_efficiency': round((tasks.filter(status='COMPLETED').count() / tasks.count() * 100) if tasks.count() > 0 else 0, 2),
-        'by_hudud': {}
+        'total_bins': counters.total_bins,
+        'full_bins': counters.full_bins,
+        'average_fill_level': counters.average_fill_level,
+        'total_trucks': counters.total_trucks,
+        'active_trucks': counters.busy_trucks,
+        'tasks_completed': counters.tasks_completed,
+        'tasks_pending': counters.tasks_pending,
+        'tasks_in_progress': counters.tasks_in_progress,
+        'collection_efficiency': round((counters.tasks_completed / counters.tasks_total * 100) if counters.tasks_total > 0 else 0, 2),
+        # Statistics by toza hudud
+        'by_hudud': counters.by_hudud
     }
     
-    # Statistics by toza hudud
-    for hudud in ['1-sonli Toza Hudud', '2-sonli Toza Hudud']:
-        hudud_bins = bins.filter(toza_hudud=hudud)
-        stats['by_hudud'][hudud] = {
-            'total': hudud_bins.count(),
-            'full': hudud_bins.filter(is_full=True).count(),
-            'avg_fill': round(hudud_bins.aggregate(Avg('fill_level'))['fill_level__avg'] or 0, 2)
-        }
-    
     return Response(stats)
 
 
 @api_view(['GET'])
 def get_climate_statistics(request):
     """Get comprehensive climate control statistics"""
-    from django.db.models import Avg, Count
-    from datetime import datetime, timedelta
+    from datetime import timedelta
     
-    facilities = Facility.objects.all()
-    rooms = Room.objects.all()
-    boilers = Boiler.objects.all()
+    counters = dashboard.get_counters()
     
     stats = {
-        'total_facilities': facilities.count(),
-        'total_rooms': rooms.count(),
-        'total_boilers': boilers.count(),
-        'average_temperature': round(rooms.aggregate(Avg('temperature'))['temperature__avg'] or 0, 2),
-        'average_humidity': round(rooms.aggregate(Avg('humidity'))['humidity__avg'] or 0, 2),
-        'critical_rooms': rooms.filter(status='CRITICAL').count(),
-        'warning_rooms': rooms.filter(status='WARNING').count(),
-        'optimal_rooms': rooms.filter(status='OPTIMAL').count(),
-        'by_facility_type': {}
+        'total_facilities': counters.total_facilities,
+        'total_rooms': counters.total_rooms,
+        'total_boilers': counters.total_boilers,
+        'average_temperature': counters.average_temperature,
+        'average_humidity': counters.average_humidity,
+        'critical_rooms': counters.critical_rooms,
+        'warning_rooms': counters.warning_rooms,
+        'optimal_rooms': counters.optimal_rooms,
+        'by_facility_type': counters.by_facility_type
     }
     
-    for ftype in ['SCHOOL', 'KINDERGARTEN', 'HOSPITAL']:
-        type_facilities = facilities.filter(type=ftype)
-        stats['by_facility_type'][ftype] = {
-            'count': type_facilities.count(),
-            'avg_efficiency': round(type_facilities.aggregate(Avg('efficiency_score'))['efficiency_score__avg'] or 0, 2)
-        }
+    # Sensor aggregates over the last 24 hours, read from the hourly rollups
+    from .telemetry import rollup_summary
+    since = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
+    stats['last_24h'] = rollup_summary('1h', since=since)
     
     return Response(stats)
 
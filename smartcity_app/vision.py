@@ -0,0 +1,370 @@
+"""
+Vision-analysis backends for waste bin images
+
+The camera pipeline and the camera jobs go through get_backend(), which
+returns the backend selected by VISION_BACKEND:
+
+  gemini  - Google Gemini over a pooled HTTP session with timeouts, guarded
+            by a circuit breaker that fails fast while the upstream is down
+  local   - deterministic offline stand-in (dark-pixel ratio of the frame)
+            for tests and benchmarks
+
+Either way the backend is wrapped in CoalescingBackend, so concurrent
+requests for the same image share a single call.
+
+analyze_async() is the non-blocking variant for the ASGI views: Gemini is
+called through the pooled httpx client (async_http.py), the local backend
+runs in a worker thread.
+
+Backends return the usual {'isFull', 'fillLevel', 'confidence', 'notes'}
+dict and raise VisionError subclasses instead of inventing a result.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from io import BytesIO
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from . import async_http
+
+logger = logging.getLogger(__name__)
+
+GEMINI_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro-vision:generateContent'
+
+PROMPT = '''Siz tajriboli atrof-muhitni kuzatuv tizimi ekspertisiz. Rasmni tahlil qiling va quyidagilarni aniqlang:
+    1. Rasmda chiqindi konteyneri bormi? Javob: HA yoki YO'Q.
+    2. Agar HA bo'lsa, konteyner to'la bo'limi? Javob: HA yoki YO'Q.
+    3. Agar HA bo'lsa, to'ldirish darajasini % (0-100) ko'rsating.
+    4. Rasm sifatini baholang (yaxshi, o'rtacha, yomon).
+
+    Javobni quyidagi JSON formatda bering:
+    {
+        "isFull": boolean,
+        "fillLevel": number (0 dan 100 gacha foiz),
+        "confidence": number (O'z qaroringga ishonch darajasi 0-100),
+        "notes": string (Qisqa izoh o'zbek tilida: Masalan "Konteyner toshib ketgan" yoki "Yarmi bo'sh")
+    }
+    '''
+
+
+class VisionError(Exception):
+    """The image could not be analyzed"""
+
+
+class VisionNotConfigured(VisionError):
+    """The backend is missing its credentials"""
+
+
+class VisionBackendUnavailable(VisionError):
+    """The upstream failed or the circuit breaker is open"""
+
+
+class VisionInvalidResponse(VisionError):
+    """The backend answered, but not with a verdict"""
+
+
+class VisionInvalidImage(VisionError):
+    """The image could not be decoded"""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds; then one trial call decides whether it closes.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def before_call(self):
+        """Raise VisionBackendUnavailable unless a call may go through"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                raise VisionBackendUnavailable('Vision backend circuit is open')
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def end_call(self):
+        """Called after every call; a trial that ended without a verdict (e.g. cancelled) frees the slot"""
+        with self._lock:
+            self._trial_running = False
+
+
+class VisionBackend:
+    """Interface: analyze a base64 encoded JPEG"""
+    name = 'base'
+
+    def analyze(self, base64_image):
+        raise NotImplementedError
+
+    async def analyze_async(self, base64_image):
+        return await asyncio.to_thread(self.analyze, base64_image)
+
+
+class GeminiBackend(VisionBackend):
+    name = 'gemini'
+
+    def __init__(self, api_key=None, timeout=(5, 30), breaker=None, pool_size=10):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.headers['Content-Type'] = 'application/json'
+
+    def build_payload(self, base64_image):
+        return {
+            'contents': [{
+                'parts': [
+                    {'text': PROMPT},
+                    {'inlineData': {'mimeType': 'image/jpeg', 'data': base64_image}},
+                ]
+            }]
+        }
+
+    def _api_key(self):
+        api_key = self.api_key or os.getenv('GEMINI_API_KEY')
+        if not api_key or api_key == 'YOUR_API_KEY_HERE':
+            raise VisionNotConfigured('GEMINI_API_KEY not set')
+        return api_key
+
+    def analyze(self, base64_image):
+        api_key = self._api_key()
+        self.breaker.before_call()
+        try:
+            try:
+                response = self.session.post(
+                    GEMINI_URL, params={'key': api_key},
+                    data=json.dumps(self.build_payload(base64_image)), timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                self.breaker.record_failure()
+                raise VisionBackendUnavailable(f'Gemini request failed: {e}') from e
+            return self._handle_response(response.status_code, response.text, response.json)
+        finally:
+            self.breaker.end_call()
+
+    async def analyze_async(self, base64_image):
+        api_key = self._api_key()
+        self.breaker.before_call()
+        try:
+            try:
+                response = await async_http.get_client().post(
+                    GEMINI_URL, params={'key': api_key}, json=self.build_payload(base64_image),
+                    timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                )
+            except httpx.HTTPError as e:
+                self.breaker.record_failure()
+                raise VisionBackendUnavailable(f'Gemini request failed: {e}') from e
+            return self._handle_response(response.status_code, response.text, response.json)
+        finally:
+            # A cancelled request records neither outcome; without this the circuit stays open for good
+            self.breaker.end_call()
+
+    def _handle_response(self, status_code, text, load_json):
+        if status_code >= 500 or status_code == 429:
+            self.breaker.record_failure()
+            raise VisionBackendUnavailable(f'Gemini returned {status_code}')
+        self.breaker.record_success()
+        if status_code != 200:
+            raise VisionError(f'Gemini returned {status_code}: {text[:200]}')
+        try:
+            result = load_json()
+        except ValueError as e:
+            raise VisionInvalidResponse(f'Gemini returned invalid JSON: {text[:200]}') from e
+        return self.parse_response(result)
+
+    def parse_response(self, result):
+        """Extract the JSON verdict from a generateContent response; raises VisionInvalidResponse"""
+        candidates = result.get('candidates') if isinstance(result, dict) else None
+        for candidate in (candidates or [])[:1]:
+            for part in candidate.get('content', {}).get('parts', []):
+                if 'text' not in part:
+                    continue
+                text_content = part['text'].strip()
+
+                # Remove any markdown code block markers
+                if text_content.startswith('```'):
+                    json_match = re.search(r'\{.*\}', text_content, re.DOTALL)
+                    if not json_match:
+                        raise VisionInvalidResponse(f'No JSON in Gemini answer: {text_content[:200]}')
+                    text_content = json_match.group()
+
+                try:
+                    ai_result = json.loads(text_content)
+                except json.JSONDecodeError as e:
+                    raise VisionInvalidResponse(f'Gemini answer is not valid JSON: {text_content[:200]}') from e
+                fill_level = ai_result.get('fillLevel') if isinstance(ai_result, dict) else None
+                # json.loads accepts NaN/Infinity, and bool is an int
+                if not isinstance(ai_result, dict) or not isinstance(ai_result.get('isFull'), bool) \
+                        or isinstance(fill_level, bool) or not isinstance(fill_level, (int, float)) \
+                        or not math.isfinite(fill_level):
+                    raise VisionInvalidResponse(f'Gemini answer has no isFull/fillLevel: {text_content[:200]}')
+                return {
+                    'isFull': ai_result['isFull'],
+                    'fillLevel': min(100, max(0, round(fill_level))),
+                    'confidence': ai_result.get('confidence', 50),
+                    'notes': ai_result.get('notes', 'AI tahlili tugadi')
+                }
+
+        raise VisionInvalidResponse('Gemini response has no answer')
+
+
+class LocalBackend(VisionBackend):
+    """
+    Offline stand-in: the fill level is the share of dark pixels in the
+    frame, so the same image always gives the same answer.
+    """
+    name = 'local'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency  # Simulated inference time for benchmarks
+
+    def analyze(self, base64_image):
+        import base64
+        from PIL import Image
+
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            raw = base64.b64decode(base64_image)
+            with Image.open(BytesIO(raw)) as image:
+                histogram = image.convert('L').resize((64, 64)).histogram()
+        except (OSError, ValueError) as e:
+            raise VisionInvalidImage(f'Image could not be decoded: {e}') from e
+        fill_level = round(100 * sum(histogram[:128]) / sum(histogram))
+        return {
+            'isFull': fill_level >= 80,
+            'fillLevel': fill_level,
+            'confidence': 90,
+            'notes': 'Lokal tahlil (offline)'
+        }
+
+
+class CoalescingBackend(VisionBackend):
+    """Concurrent analyze() calls for the same image share one backend call"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self._lock = threading.Lock()
+        self._in_flight = {}  # image digest -> [done event, result, error]
+        self._async_in_flight = {}  # (event loop, image digest) -> future
+
+    def analyze(self, base64_image):
+        key = hashlib.sha1(base64_image.encode('ascii')).hexdigest()
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = [threading.Event(), None, None]
+
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return dict(call[1])
+
+        try:
+            call[1] = self.backend.analyze(base64_image)
+            return dict(call[1])
+        except Exception as e:
+            call[2] = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call[0].set()
+
+    async def analyze_async(self, base64_image):
+        loop = asyncio.get_running_loop()
+        key = (id(loop), hashlib.sha1(base64_image.encode('ascii')).hexdigest())
+        future = self._async_in_flight.get(key)
+        if future is not None:
+            return dict(await asyncio.shield(future))
+
+        future = self._async_in_flight[key] = loop.create_future()
+        try:
+            result = await self.backend.analyze_async(base64_image)
+            future.set_result(result)
+            return dict(result)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved here so an unshared failure isn't reported as unhandled
+            raise
+        except asyncio.CancelledError:
+            future.cancel()  # Waiting callers get cancelled too instead of hanging
+            raise
+        finally:
+            del self._async_in_flight[key]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def build_backend(name=None):
+    """Create the (coalescing) backend named by `name` or VISION_BACKEND"""
+    name = (name or getattr(settings, 'VISION_BACKEND', 'gemini')).lower()
+    if name == 'local':
+        backend = LocalBackend(latency=getattr(settings, 'VISION_LOCAL_LATENCY', 0.0))
+    elif name == 'gemini':
+        backend = GeminiBackend(
+            timeout=(getattr(settings, 'VISION_CONNECT_TIMEOUT', 5), getattr(settings, 'VISION_READ_TIMEOUT', 30)),
+            breaker=CircuitBreaker(
+                failure_threshold=getattr(settings, 'VISION_BREAKER_THRESHOLD', 5),
+                reset_timeout=getattr(settings, 'VISION_BREAKER_RESET', 30),
+            ),
+        )
+    else:
+        raise ValueError(f'Unknown VISION_BACKEND: {name}')
+    return CoalescingBackend(backend)
+
+
+def get_backend():
+    """Process-wide backend instance"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = build_backend()
+    return _backend
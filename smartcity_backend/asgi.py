@@ -0,0 +1,20 @@
+"""
+ASGI config for smartcity_backend project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+The regular API keeps running under WSGI (wsgi.py); this entry point serves
+the streaming endpoint /api/events/stream/, e.g.
+
+    uvicorn smartcity_backend.asgi:application --host 0.0.0.0 --port 8001
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartcity_backend.settings')
+
+application = get_asgi_application()
@@ -77,6 +77,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'smartcity_backend.wsgi.application'
+ASGI_APPLICATION = 'smartcity_backend.asgi.application'
 
 
 # Database
@@ -206,4 +207,114 @@ CORS_ALLOW_METHODS = [
     'PATCH',
     'POST',
     'PUT',
-]
\ No newline at end of file
+]
+
+# IoT telemetry settings
+# Maximum number of readings accepted by /api/iot-devices/data/bulk-update/
+IOT_BULK_MAX_READINGS = int(os.getenv('IOT_BULK_MAX_READINGS', '1000'))
+# Seconds the in-process device registry caches known / unknown device_ids
+IOT_DEVICE_REGISTRY_TTL = int(os.getenv('IOT_DEVICE_REGISTRY_TTL', '300'))
+IOT_DEVICE_REGISTRY_NEGATIVE_TTL = int(os.getenv('IOT_DEVICE_REGISTRY_NEGATIVE_TTL', '30'))
+# Accept-and-enqueue mode for /api/iot-devices/data/update/ (also per request with ?async=1)
+IOT_INGEST_ASYNC = os.getenv('IOT_INGEST_ASYNC', 'False') == 'True'
+# Readings waiting in the write-behind queue before new ones get 503 + Retry-After
+IOT_QUEUE_MAX_BACKLOG = int(os.getenv('IOT_QUEUE_MAX_BACKLOG', '50000'))
+IOT_QUEUE_RETRY_AFTER = int(os.getenv('IOT_QUEUE_RETRY_AFTER', '30'))
+IOT_QUEUE_FLUSH_BATCH_SIZE = int(os.getenv('IOT_QUEUE_FLUSH_BATCH_SIZE', '500'))
+# SQLite journal mode; WAL lets API reads proceed while the queue flusher writes
+# (SQLite still allows one writer at a time; others wait on the busy timeout)
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+
+# Camera analysis pipeline (analyze_waste_bins / simulate_camera_screenshots)
+CAMERA_ANALYSIS_CONCURRENCY = int(os.getenv('CAMERA_ANALYSIS_CONCURRENCY', '4'))
+# Simultaneous downloads per camera host
+CAMERA_PER_HOST_LIMIT = int(os.getenv('CAMERA_PER_HOST_LIMIT', '2'))
+CAMERA_CONNECT_TIMEOUT = float(os.getenv('CAMERA_CONNECT_TIMEOUT', '5'))
+CAMERA_READ_TIMEOUT = float(os.getenv('CAMERA_READ_TIMEOUT', '15'))
+# Frames within this many bits (perceptual hash) of the last analyzed frame reuse its result
+CAMERA_HASH_THRESHOLD = int(os.getenv('CAMERA_HASH_THRESHOLD', '5'))
+
+# Vision backend for bin image analysis: 'gemini' or 'local' (offline, deterministic)
+VISION_BACKEND = os.getenv('VISION_BACKEND', 'gemini')
+VISION_CONNECT_TIMEOUT = float(os.getenv('VISION_CONNECT_TIMEOUT', '5'))
+VISION_READ_TIMEOUT = float(os.getenv('VISION_READ_TIMEOUT', '30'))
+# Consecutive upstream failures before the circuit opens, and seconds it stays open
+VISION_BREAKER_THRESHOLD = int(os.getenv('VISION_BREAKER_THRESHOLD', '5'))
+VISION_BREAKER_RESET = int(os.getenv('VISION_BREAKER_RESET', '30'))
+# Simulated inference time of the local backend (benchmarks)
+VISION_LOCAL_LATENCY = float(os.getenv('VISION_LOCAL_LATENCY', '0'))
+# Camera analysis jobs (update-camera-image endpoint / process_camera_jobs)
+CAMERA_JOB_MAX_ATTEMPTS = int(os.getenv('CAMERA_JOB_MAX_ATTEMPTS', '3'))
+# Seconds after which a RUNNING job of a crashed worker is picked up again
+CAMERA_JOB_STALE_AFTER = int(os.getenv('CAMERA_JOB_STALE_AFTER', '300'))
+# Seconds before a failed job is retried; doubles with every attempt, capped at one hour
+CAMERA_JOB_RETRY_BACKOFF = int(os.getenv('CAMERA_JOB_RETRY_BACKOFF', '30'))
+
+# Periodic tasks run by `manage.py run_scheduler` (seconds)
+SCHEDULER_LEASE_TTL = int(os.getenv('SCHEDULER_LEASE_TTL', '60'))
+SCHEDULER_ANALYSIS_INTERVAL = int(os.getenv('SCHEDULER_ANALYSIS_INTERVAL', str(30 * 60)))
+SCHEDULER_PREDICTION_INTERVAL = int(os.getenv('SCHEDULER_PREDICTION_INTERVAL', str(6 * 60 * 60)))
+SCHEDULER_REPORT_INTERVAL = int(os.getenv('SCHEDULER_REPORT_INTERVAL', str(24 * 60 * 60)))
+
+# Change log behind /api/sync/ (delta updates for map dashboards)
+SYNC_MAX_CHANGES = int(os.getenv('SYNC_MAX_CHANGES', '1000'))
+SYNC_CHANGELOG_RETENTION_DAYS = int(os.getenv('SYNC_CHANGELOG_RETENTION_DAYS', '7'))
+SCHEDULER_SYNC_PRUNE_INTERVAL = int(os.getenv('SCHEDULER_SYNC_PRUNE_INTERVAL', str(24 * 60 * 60)))
+
+# Live event stream /api/events/stream/ (served by smartcity_backend.asgi)
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', '1'))
+# Events a slow client may fall behind before the oldest are dropped
+EVENTS_CLIENT_BUFFER = int(os.getenv('EVENTS_CLIENT_BUFFER', '100'))
+EVENTS_MAX_CLIENTS = int(os.getenv('EVENTS_MAX_CLIENTS', '500'))
+EVENTS_MAX_STREAM_SECONDS = int(os.getenv('EVENTS_MAX_STREAM_SECONDS', '300'))
+
+# Async HTTP client used by the ASGI views (analyze-camera-image, alerts/send)
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', '200'))
+ASYNC_HTTP_CONNECT_TIMEOUT = float(os.getenv('ASYNC_HTTP_CONNECT_TIMEOUT', '5'))
+ASYNC_HTTP_READ_TIMEOUT = float(os.getenv('ASYNC_HTTP_READ_TIMEOUT', '15'))
+
+# Alert delivery (see smartcity_app/alerts.py); unset gateways leave alerts unsent
+TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
+ALERT_SMS_WEBHOOK_URL = os.getenv('ALERT_SMS_WEBHOOK_URL', '')
+ALERT_PUSH_WEBHOOK_URL = os.getenv('ALERT_PUSH_WEBHOOK_URL', '')
+ALERT_EMAIL_WEBHOOK_URL = os.getenv('ALERT_EMAIL_WEBHOOK_URL', '')
+ALERT_SEND_TIMEOUT = float(os.getenv('ALERT_SEND_TIMEOUT', '10'))
+# Alerts stored by /api/alerts/ are delivered by the scheduler and retried for this many seconds
+ALERT_RETRY_WINDOW = int(os.getenv('ALERT_RETRY_WINDOW', str(60 * 60)))
+SCHEDULER_ALERT_INTERVAL = int(os.getenv('SCHEDULER_ALERT_INTERVAL', '60'))
+
+# Nearest-truck lookups for task assignment (see smartcity_app/spatial.py)
+SPATIAL_INDEX_ENABLED = os.getenv('SPATIAL_INDEX_ENABLED', 'True') == 'True'
+SPATIAL_GRID_CELL_KM = float(os.getenv('SPATIAL_GRID_CELL_KM', '1'))
+SPATIAL_INDEX_REBUILD = int(os.getenv('SPATIAL_INDEX_REBUILD', '600'))
+
+# Batch bin -> truck assignment (see smartcity_app/assignment.py)
+ASSIGNMENT_TRUCK_CAPACITY = int(os.getenv('ASSIGNMENT_TRUCK_CAPACITY', '1'))
+ASSIGNMENT_HUNGARIAN_MAX_BINS = int(os.getenv('ASSIGNMENT_HUNGARIAN_MAX_BINS', '500'))
+
+# Route optimizer behind /api/routes/optimize/ (see smartcity_app/routing.py)
+ROUTE_OPTIMIZATION_TIME_BUDGET = float(os.getenv('ROUTE_OPTIMIZATION_TIME_BUDGET', '1'))
+ROUTE_OPTIMIZATION_MAX_TIME_BUDGET = float(os.getenv('ROUTE_OPTIMIZATION_MAX_TIME_BUDGET', '10'))
+# Truck capacity in full-bin equivalents (fill_level / 100 per bin); unset means unlimited
+ROUTE_TRUCK_CAPACITY = os.getenv('ROUTE_TRUCK_CAPACITY', '')
+# Memory-mapped bin-to-bin distance matrices per toza hudud (see smartcity_app/distance_cache.py)
+DISTANCE_CACHE_ENABLED = os.getenv('DISTANCE_CACHE_ENABLED', 'True') == 'True'
+DISTANCE_CACHE_DIR = os.getenv('DISTANCE_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'distances'))
+DISTANCE_CACHE_MAX_BINS = int(os.getenv('DISTANCE_CACHE_MAX_BINS', '5000'))
+# Worker processes of `manage.py plan_routes` (0: one per CPU)
+ROUTE_PLANNING_WORKERS = int(os.getenv('ROUTE_PLANNING_WORKERS', '0'))
+
+# Waste fill-level forecasts (see smartcity_app/forecasting.py)
+WASTE_PREDICTION_MAX_DAYS = int(os.getenv('WASTE_PREDICTION_MAX_DAYS', '30'))
+# Predictions for dates further in the past than this are pruned by the scheduler's refresh
+WASTE_PREDICTION_RETENTION_DAYS = int(os.getenv('WASTE_PREDICTION_RETENTION_DAYS', '30'))
+
+# Fill history and the online fill-rate estimator (see smartcity_app/fill_history.py)
+FILL_RATE_HALF_LIFE_DAYS = float(os.getenv('FILL_RATE_HALF_LIFE_DAYS', '3'))
+# A drop of this many percentage points between observations counts as a collection
+FILL_RESET_DROP = int(os.getenv('FILL_RESET_DROP', '20'))
+FILL_HISTORY_RETENTION_DAYS = int(os.getenv('FILL_HISTORY_RETENTION_DAYS', '90'))
+SCHEDULER_FILL_HISTORY_PRUNE_INTERVAL = int(os.getenv('SCHEDULER_FILL_HISTORY_PRUNE_INTERVAL', str(24 * 60 * 60)))
+
+# Materialized dashboard counters (see smartcity_app/dashboard.py): seconds before a row is recomputed
+DASHBOARD_COUNTERS_TTL = int(os.getenv('DASHBOARD_COUNTERS_TTL', '30'))